@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 import json
 from typing import Any, Callable, Dict, Tuple
 
@@ -12,6 +13,14 @@ from sol.super_slice import super_slice
 from sol.utils import get_function_signature, parse_function_signature
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=8)
+def _load_oneshot_example_context(sol_file: str):
+    """Compile the example file once, its functions are sliced for every rule"""
+    _, ctx = init_sol_audit_context(sol_file)
+    return ctx
+
+
 class ErcChecker(ABC):
     
     @abstractmethod
@@ -32,14 +41,14 @@ class LLMErcChecker(ErcChecker):
     
     def check(self, rule: ErcRule, code:str) -> Tuple[bool, str]:
         audit_msg = self.get_prompt(rule, code)
-        res = self._llm.ask([{"content": audit_msg, "role":"user"}], temperature=0, n=1)[0]
+        res = self._llm.ask([{"content": audit_msg, "role":"user"}], temperature=0, n=1, log_label=f"check_{rule['type']}")[0]
         return self.is_passed(rule, res), res
     
     def _get_random_oneshot_example_from_files(self, rule: ErcRule):
         erc_file = "local/10k/BABYAPE-0xc03735F8.sol"
         fi = parse_function_signature(rule['interface'])
         sig = get_function_signature(fi['name'], [ft['type'] for ft in fi['arg_types']], fi.get('return_type',{}).get('type', None))
-        ctx = init_sol_audit_context(erc_file, ".cache")
+        ctx = _load_oneshot_example_context(erc_file)
         for contract in ctx.metadata.contracts:
             if sig not in contract.func2str:
                 continue
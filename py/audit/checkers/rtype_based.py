@@ -48,7 +48,7 @@ Code:\"\"\"
     
     def check(self, rule: ErcRule, code: str) -> Tuple[bool, str]:
         audit_msg = self.get_prompt(rule, code)
-        res = self._llm.ask([{"content": audit_msg, "role":"user"}], temperature=0, n=1)[0]
+        res = self._llm.ask([{"content": audit_msg, "role":"user"}], temperature=0, n=1, log_label=f"check_{rule['type']}")[0]
         res = json.loads(trim_json_markers(res))
         return self.is_passed(rule, res), res
             
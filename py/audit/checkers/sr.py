@@ -21,10 +21,11 @@ class SRLLMErcChecker(LLMErcChecker):
             Tuple[bool, str]: compliant and debug information.
         """
 
+        label = label if label else f"check_{rule['type']}"
         # if compound rule, handle compound rule 
         if "if" in rule and rule['if']:
             cp_check = self.get_compound_check_prompt(rule['if'], code)
-            res = self._llm.ask([{"content": cp_check, "role":"user"}], temperature=0, n=1)[0]
+            res = self._llm.ask([{"content": cp_check, "role":"user"}], temperature=0, n=1, log_label=f"{label}_if")[0]
             try:
                 res_json = json.loads(trim_json_markers(res))
             except Exception as ex:
@@ -37,7 +38,7 @@ class SRLLMErcChecker(LLMErcChecker):
                     {"content": cp_check, "role":"user"}, 
                     {"content": res, "role":"assistant"},
                     {"content": followup, "role":"user"}
-                ], temperature=0, n=1)[0]
+                ], temperature=0, n=1, log_label=label)[0]
                 res_json = json.loads(trim_json_markers(res))
                 return self.is_passed(rule, res_json), res
             else:
@@ -45,7 +46,7 @@ class SRLLMErcChecker(LLMErcChecker):
             
 
         audit_msg = self.get_prompt(rule, code)
-        res = self._llm.ask([{"content": audit_msg, "role":"user"}], temperature=0, n=1)[0]
+        res = self._llm.ask([{"content": audit_msg, "role":"user"}], temperature=0, n=1, log_label=label)[0]
         try:
             res_json = json.loads(trim_json_markers(res))
             return self.is_passed(rule, res_json), res
@@ -6,9 +6,12 @@ import json
 import logging
 import os
 from audit.context import init_sol_audit_context
+from audit.pack import PackedContext, pack_context
 from erc.utils import iterate_rules
 from llm.adapters import LLMAdapter
-from sol.utils import get_erc, get_event_interface, get_event_interface_with_pname
+from llm.metrics import erc_scope
+from llm.utils import estimate_tokens
+from sol.utils import compile, get_erc, get_event_interface, get_event_interface_with_pname
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +28,36 @@ class LLMERCAuditor(ERCAuditor):
 
 
 class FullLLMERCAuditor(LLMERCAuditor):
-    def __init__(self, llm: LLMAdapter, erc_dir:str = "./erc"):
+    def __init__(self, llm: LLMAdapter, erc_dir:str = "./erc", token_budget:int = None):
+        """Audit the whole solidity file against the ERC document
+
+        Args:
+            llm (LLMAdapter): llm adapter
+            erc_dir (str, optional): directory of the raw ERC documents. Defaults to "./erc".
+            token_budget (int, optional): max tokens of the prompt, the code is packed
+                by its relevance to the ERC if the whole file does not fit. Defaults to None(no limit).
+        """
         super().__init__(llm)
         self._erc_dir = erc_dir
+        self._token_budget = token_budget
+
+    def get_prompt(self, sol:str, erc:str, erc_doc:str) -> str:
+        return f"""By given the following solidity code:\"\"\"
+{sol}
+\"\"\"
+Please check if the code is ERC-{erc} compliant. The ERC-{erc} standard is defined as follows:\"\"\"
+{erc_doc}
+\"\"\"
+"""
+
+    def pack(self, sol_file:str, sol:str, erc:str, erc_doc:str) -> PackedContext:
+        code_budget = self._token_budget - estimate_tokens(self.get_prompt("", erc, erc_doc))
+        sol_tokens = estimate_tokens(sol)
+        if sol_tokens <= code_budget:
+            return PackedContext(text=sol, budget=code_budget, original_tokens=sol_tokens, packed_tokens=sol_tokens)
+        _, cu = compile(sol_file)
+        return pack_context(cu, sol.splitlines(True), erc, max(code_budget, 0))
+
     def process(self, sol_file:str, output_dir:str, **kwargs):
         skip_if_exists = kwargs.get("skip_if_exists", False)
         erc = kwargs.get("erc", None)
@@ -43,13 +73,22 @@ class FullLLMERCAuditor(LLMERCAuditor):
         with open(erc_doc_path, "r") as f:
             erc_doc = f.read()
 
-        result = self._llm.single(f"""By given the following solidity code:\"\"\"
-{sol}
-\"\"\"
-Please check if the code is ERC-{erc} compliant. The ERC-{erc} standard is defined as follows:\"\"\"
-{erc_doc}
-\"\"\"
-""", temperature=0, n=1)[0]
+        if self._token_budget is not None:
+            packed = self.pack(sol_file, sol, erc, erc_doc)
+            logger.info(f"{sol_file}: packed {packed.original_tokens} => {packed.packed_tokens} tokens, saved {packed.saved_tokens}")
+            with open(os.path.join(output_dir, f"{os.path.basename(sol_file).split('.')[0]}.pack.json"), "w") as f:
+                json.dump({
+                    "sol_file": sol_file,
+                    "budget": packed.budget,
+                    "original_tokens": packed.original_tokens,
+                    "packed_tokens": packed.packed_tokens,
+                    "saved_tokens": packed.saved_tokens,
+                    "functions": packed.functions
+                }, f, indent=4)
+            sol = packed.text
+
+        with erc_scope(erc):
+            result = self._llm.single(self.get_prompt(sol, erc, erc_doc), temperature=0, n=1, log_label="audit_full")[0]
         with open(output_file, "w") as f:
             f.write(result)
         
@@ -81,56 +120,57 @@ class SlicedLLMSolAuditor(LLMERCAuditor):
             print(f"Auditing {sol_file} with ERC{erc} rules...")
             with open(os.path.join(self._erc_dir, f"ERC{erc}_ERC{erc}.json"), "r") as f:
                 erc_obj = json.load(f)
-            for idx, (obj, rtype, rule, cond) in enumerate(iterate_rules(erc_obj, True)):
-                if only_rules_at and idx not in only_rules_at.get(str(erc), []):
-                    continue
-                try:
+            with erc_scope(erc):
+                for idx, (obj, rtype, rule, cond) in enumerate(iterate_rules(erc_obj, True)):
+                    if only_rules_at and idx not in only_rules_at.get(str(erc), []):
+                        continue
+                    try:
                     
-                    if obj["def"].startswith("event"):
-                        if rtype == "interface":
-                            print(contract.events)
-                            event_interfaces = "\n".join([get_event_interface(evt['name'], evt['params']) for evt in contract.events])
-                            prompt = f"""By given the following solidity event interfaces:\"\"\"\n{event_interfaces}\n\"\"\"\nCheck if the code contains the interface "{rule}", "YES" if contains or "NO" otherwise."""
-                            res = self._llm.single(prompt, temperature=0, n=1)[0]
-                            with open(os.path.join(task_output_dir, f"{idx}.txt"), "w") as f:
-                                f.write(f"rule: {rtype} {rule}\n")
-                                f.write(res)
-                        else:
-                            # rule is contract scope, we need to ask every function
-                            cnt = 0
-                            for fsig, fstr in contract.func2str.items():
-                                prompt = f"""By given the following solidity code for "{fsig}":\"\"\"
+                        if obj["def"].startswith("event"):
+                            if rtype == "interface":
+                                print(contract.events)
+                                event_interfaces = "\n".join([get_event_interface(evt['name'], evt['params']) for evt in contract.events])
+                                prompt = f"""By given the following solidity event interfaces:\"\"\"\n{event_interfaces}\n\"\"\"\nCheck if the code contains the interface "{rule}", "YES" if contains or "NO" otherwise."""
+                                res = self._llm.single(prompt, temperature=0, n=1, log_label="audit_sliced_evt_interface")[0]
+                                with open(os.path.join(task_output_dir, f"{idx}.txt"), "w") as f:
+                                    f.write(f"rule: {rtype} {rule}\n")
+                                    f.write(res)
+                            else:
+                                # rule is contract scope, we need to ask every function
+                                cnt = 0
+                                for fsig, fstr in contract.func2str.items():
+                                    prompt = f"""By given the following solidity code for "{fsig}":\"\"\"
 {fstr}
 \"\"\"
 Check if the code violated the rule "{rtype} {rule} {("if "+str(cond["if"])) if cond else ""}", return in "YES" or "NO".
 """                         
-                                cnt += 1
-                                res = self._llm.single(prompt, temperature=0, n=1)[0]
-                                with open(os.path.join(task_output_dir, f"{idx}_{cnt}.txt"), "w") as f:
-                                    f.write(f"rule: {rtype} {rule} {('if '+str(cond["if"])) if cond else ''}\n")
-                                    f.write(res)
-                    else:
-                        func_def = obj["def"]
-                        func_str = None
-                        
-                        if rtype == "interface":
-                            func_str = f"{"\n".join(contract.func2str.keys())}\n{"\n".join(contract.state_var_sigs)}"
+                                    cnt += 1
+                                    res = self._llm.single(prompt, temperature=0, n=1, log_label="audit_sliced_evt")[0]
+                                    with open(os.path.join(task_output_dir, f"{idx}_{cnt}.txt"), "w") as f:
+                                        f.write(f"rule: {rtype} {rule} {('if '+str(cond["if"])) if cond else ''}\n")
+                                        f.write(res)
                         else:
-                            for fsig, fcode in contract.func2str.items():
-                                if func_def.split("(")[0].split(" ")[1] == fsig.split("(")[0]:
-                                    func_str = fcode
-                                    break
-                        if func_str is None:
-                            continue
-                        prompt = f"""By given the following solidity {"code" if rtype != "interface" else "interfaces"}:\"\"\"
+                            func_def = obj["def"]
+                            func_str = None
+                        
+                            if rtype == "interface":
+                                func_str = f"{"\n".join(contract.func2str.keys())}\n{"\n".join(contract.state_var_sigs)}"
+                            else:
+                                for fsig, fcode in contract.func2str.items():
+                                    if func_def.split("(")[0].split(" ")[1] == fsig.split("(")[0]:
+                                        func_str = fcode
+                                        break
+                            if func_str is None:
+                                continue
+                            prompt = f"""By given the following solidity {"code" if rtype != "interface" else "interfaces"}:\"\"\"
 {func_str}
 \"\"\"
 Check if the code {"violated the rule " if rtype != "interface" else "contains "} "{rtype} {rule} {("if "+cond) if cond else ""}" {f"for {func_def}" if rtype != "interface" else ""}, return in "YES" or "NO".
 """             
-                        res = self._llm.single(prompt, temperature=0, n=1)[0]
-                        with open(os.path.join(task_output_dir, f"{idx}.txt"), "w") as f:
-                            f.write(f"rule: {rtype} {rule} {('if '+cond) if cond else ''}\n")
-                            f.write(res)
-                except Exception as e:
-                    logger.error(f"Error in auditing rule {rtype} {rule} {cond} in {sol_file} {contract.name}: {e}")
-                    continue
+                            res = self._llm.single(prompt, temperature=0, n=1, log_label="audit_sliced_fn")[0]
+                            with open(os.path.join(task_output_dir, f"{idx}.txt"), "w") as f:
+                                f.write(f"rule: {rtype} {rule} {('if '+cond) if cond else ''}\n")
+                                f.write(res)
+                    except Exception as e:
+                        logger.error(f"Error in auditing rule {rtype} {rule} {cond} in {sol_file} {contract.name}: {e}")
+                        continue
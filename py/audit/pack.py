@@ -0,0 +1,140 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+import logging
+from typing import Dict, List, Set, Tuple
+
+from slither.core.compilation_unit import SlitherCompilationUnit
+from slither.core.declarations import FunctionContract
+
+from audit.utils import find_all_callees, get_functions_to_check, is_function_overrided_by_state_variable, shrink_file, slice as solslice, slithir_funcs_to_text
+from erc.find import get_erc_suit
+from erc.types import Erc
+from llm.utils import estimate_tokens
+from sol.super_slice import super_slice
+from sol.utils import get_contracts_and_ercs
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    budget: int
+    original_tokens: int
+    packed_tokens: int
+    # function signature => "full", "slice", "super_slice" or "skipped"
+    functions: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.packed_tokens
+
+
+def get_erc_rule_types(ercs: List[Erc]) -> Dict[str, Set[str]]:
+    """function name => rule types the ERCs define for it"""
+    fn2rtypes = defaultdict(set)
+    for erc in ercs:
+        for fn in erc['functions']:
+            fn2rtypes[fn['format']['name']].add("interface")
+        for rule in erc.get('rules', []):
+            interface = rule.get('interface') or ""
+            if not interface.startswith("function"):
+                continue
+            fname = interface.split("(")[0].split(" ")[-1]
+            fn2rtypes[fname].add(rule['type'])
+    return fn2rtypes
+
+
+def get_ercs_for_packing(erc: str) -> List[Erc]:
+    suite = get_erc_suit(erc)
+    if suite is None:
+        return []
+    return [suite.main_erc] + (suite.optional_ercs or [])
+
+
+def rank_functions(fns: List[FunctionContract], fn2rtypes: Dict[str, Set[str]]) -> List[FunctionContract]:
+    """Order functions by relevance to the ERC, functions with more
+    rule types come first, functions not in the ERC come last."""
+    def score(f: FunctionContract) -> Tuple[int, int]:
+        rtypes = fn2rtypes.get(f.name, set())
+        return (len(rtypes), 0 if f.view or f.pure else 1)
+    return sorted(fns, key=score, reverse=True)
+
+
+def _function_slices(f: FunctionContract, clines: List[str], included: Set[FunctionContract], rtypes: Set[str]):
+    """Yield (kind, text, callees) for f, from the largest to the smallest slice."""
+    callees = find_all_callees({f})
+    full_text = slithir_funcs_to_text(callees - included, clines, True, False, True, True)
+    yield "full", full_text, callees
+
+    actions = [rt for rt in rtypes if rt in ("throw", "emit", "return", "call", "assign")]
+    if actions:
+        lines = solslice(f, actions=actions)
+        yield "slice", shrink_file(clines, lines), set()
+
+    if f.parameters:
+        try:
+            text = super_slice(
+                slithir_funcs_to_text(callees, clines, False, False, True, False),
+                f.contract_declarer.name,
+                f.name,
+                target_fn_param_idx_list=list(range(len(f.parameters))),
+                target_keyword_list=["msg.sender"],
+                keep_emits="emit" in rtypes,
+                keep_throws="throw" in rtypes
+            )
+        except Exception as ex:
+            logger.debug(f"failed to super slice '{f.canonical_name}': {ex}")
+            text = None
+        if text:
+            yield "super_slice", text + "\n", set()
+
+
+def pack_context(cu: SlitherCompilationUnit, clines: List[str], erc: str, budget: int) -> PackedContext:
+    """Fit the ERC related code of the given compilation unit into a token budget.
+
+    Functions are visited in the order of their relevance to the ERC.
+    Each function is added with its callees if it fits, otherwise
+    with its rule-action slice or its super slice, otherwise skipped.
+
+    Args:
+        cu (SlitherCompilationUnit): Compiled solidity file
+        clines (List[str]): Lines of the solidity file
+        erc (str): ERC number, ex. "20"
+        budget (int): Max number of tokens of the packed code
+
+    Returns:
+        PackedContext: packed code and its token accounting
+    """
+    original_tokens = estimate_tokens("".join(clines))
+    fn2rtypes = get_erc_rule_types(get_ercs_for_packing(erc))
+    packed = PackedContext(text="", budget=budget, original_tokens=original_tokens, packed_tokens=0)
+
+    contracts = list(get_contracts_and_ercs(cu, cname2ercs={}).keys())
+    if not contracts:
+        contracts = [c for c in cu.contracts_derived if not c.is_interface]
+    fns = []
+    for c in contracts:
+        fns.extend([f for f in get_functions_to_check(c) if not is_function_overrided_by_state_variable(f)])
+
+    chunks = []
+    used = 0
+    included: Set[FunctionContract] = set()
+    for f in rank_functions(fns, fn2rtypes):
+        if f in included:
+            packed.functions[f.signature_str] = "full"
+            continue
+        packed.functions[f.signature_str] = "skipped"
+        for kind, text, callees in _function_slices(f, clines, included, fn2rtypes.get(f.name, set())):
+            tokens = estimate_tokens(text)
+            if used + tokens > budget:
+                continue
+            chunks.append(text)
+            used += tokens
+            included |= callees
+            packed.functions[f.signature_str] = kind
+            break
+
+    packed.text = "".join(chunks)
+    packed.packed_tokens = used
+    return packed
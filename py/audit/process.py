@@ -2,10 +2,12 @@ import logging
 import multiprocessing
 import os
 from queue import Empty
+import time
 from typing import Dict, List, Optional
 
 from audit.context import (ContractMetadata, init_sol_audit_context)
-from audit.report import AuditReport, ErcViolation
+from audit.report import (COMPLIANT, ERROR, NOT_FOUND, TIMEOUT, VIOLATION, AuditReport, ErcViolation,
+                          ReportSink, violation_from_record)
 from audit.utils import get_functions_to_check
 from erc.find import get_erc_suit
 from slither.core.slither_core import SlitherCompilationUnit
@@ -66,11 +68,20 @@ def process_sol(sol_file:str,
                 filter_rule:List[str] = None,
                 filter_rtype:List[str] = None,
                 constraintsllmaudit:bool = False,
-                erc_spec: str = None
+                erc_spec: str = None,
+                stream: str = None
                 ):
+    """Audit the contracts of a solidity file, the report is written to `{out_dir}/{file}.json`
+
+    Args:
+        stream (str, optional): NDJSON file, a record is appended for every verified
+            (contract, rule, function) and rules already in it are not verified again
+            unless no_cache. Defaults to None.
+    """
     if logger is None:
         logger = logging.getLogger(__name__)
     
+    sink = None
     try:
         # Compile it into get slithir
         cu, ctx = init_sol_audit_context(sol_file, cname2ercs=cname2ercs, no_func_slice=True, solc_lock = solc_lock)
@@ -85,6 +96,8 @@ def process_sol(sol_file:str,
         # file can include multiple contracts 
         # each contract can have multiple ercs to be audited
         sol_report = AuditReport(sol_file, {})
+        if stream is not None:
+            sink = ReportSink(stream, sol_file, resume=not no_cache)
 
         erc_spec_override = {}
         if erc_spec is not None:
@@ -151,8 +164,8 @@ def process_sol(sol_file:str,
                             idx != 0,
                             only_rules,
                             logger,
-                            constraintsllmaudit
-                            
+                            constraintsllmaudit,
+                            sink=sink
                     )
 
                     sol_report.add_violations(contract.name, violations)
@@ -169,6 +182,9 @@ def process_sol(sol_file:str,
         logger.error(f"failed to handle '{sol_file}': {ex}")
         # traceback.print_exc() 
         pass
+    finally:
+        if sink is not None:
+            sink.close()
 
 
 def get_audit_report_filename(file, contract, erc:str) -> str:
@@ -197,7 +213,8 @@ def audit_with_erc(
     only_rules_at: Optional[List[int]] = None, 
     logger: Optional[logging.Logger] = None,
     constraintsllmaudit:bool = False,
-    timeout:int = 600) -> List[ErcViolation]:
+    timeout:int = 600,
+    sink: Optional[ReportSink] = None) -> List[ErcViolation]:
     if logger is None:
         logger = logging.getLogger(__name__)
     
@@ -217,74 +234,41 @@ def audit_with_erc(
         pass
     
     violations = []
+
+    def reuse(scope: str, rid: int, fn: str) -> bool:
+        # verdict of a previous run in the stream
+        if sink is None:
+            return False
+        record = sink.get(cucontract.name, erc_suite, scope, rid, fn)
+        if record is None:
+            return False
+        if record["verdict"] == VIOLATION:
+            violations.append(violation_from_record(record))
+        return True
+
+    def decide(scope: str, rid: int, rule: Dict, fn: str, verdict: str, start: float, vio: ErcViolation = None):
+        if vio is not None:
+            violations.append(vio)
+        if sink is not None:
+            sink.put(cucontract.name, erc_suite, scope, rid, vio.type if vio else rule.get("type", "interface"),
+                     vio.rule if vio else rule.get("rule", rule.get("def")), fn, verdict,
+                     time.perf_counter() - start, vio)
+
     if not filter_rtype or (filter_rtype and "interface" in filter_rtype):
         # checking function interface rules
         for idx, rule in enumerate(ei["functions"]):
-            func = rule['format']
-            ret_type = func.get('return_type', None)
-            vio = ErcViolation(
-                erc=erc_suite,
-                type="interface",
-                rule=rule['def'],
-                contract=cucontract.name,
-                interface=erc['name'],
-                fn_interface=None,
-                rid=idx,
-                severity="medium",
-                tags=set()
-            )
-            # checking contract has the function or not
-            candidate_fns = [f for f in cucontract.functions if f.name == func['name']]
-            if not candidate_fns:
-                # check whether function is field getter situation
-                ret_type = ret_type.get('type', None) if ret_type else None
-                arg_type_strs = []
-                for argt in func['arg_types']:
-                    arg_type_strs.append(argt['type'])
-                target_fn_sig = get_function_signature(func['name'], arg_type_strs, ret_type)
-                
-                in_sv = target_fn_sig in contract.state_var_sigs
-                # logger.info(f"check if {target_fn_sig} is in {contract.state_var_sigs}: {in_sv}")
-                if not in_sv:
-                    vio.tags.add("no_function")
-                    violations.append(vio)
-                    continue
-            else:
-                correct_param_fn = None
-
-                # checking function parameters
-                for f in candidate_fns:
-                    if len(f.parameters) != len(func['arg_types']):
-                        continue
-                    skip = False
-                    for idx, at in enumerate(f.parameters):
-                        if str(at.type) != func['arg_types'][idx]["type"]:
-                            skip = True
-                            break
-                    if skip:
-                        continue
-                    correct_param_fn = f
-                if correct_param_fn is None:
-                    vio.tags.add("incorrect_param")
-                    violations.append(vio)
-                    continue
-
-                # checking return type
-                if ret_type is not None:
-                    if correct_param_fn.return_type is None or len(correct_param_fn.return_type) != 1:
-                        vio.tags.add("incorrect_return")
-                        violations.append(vio)
-                        continue
-                    if str(correct_param_fn.return_type[0]) != ret_type["type"]:
-                        vio.tags.add("incorrect_return")
-                        violations.append(vio)
-                        continue
-                
-
+            if reuse("function", idx, None):
+                continue
+            start = time.perf_counter()
+            vio = check_function_interface(contract, cucontract, erc_suite, erc, idx, rule)
+            decide("function", idx, rule, None, COMPLIANT if vio is None else VIOLATION, start, vio)
 
         # checking event interface rules
         contract_events = [get_event_interface(e['name'], e['params']) for e in contract.events]
         for idx, rule in enumerate(ei['events']):
+            if reuse("event", idx, None):
+                continue
+            start = time.perf_counter()
             vio = ErcViolation(
                 erc=erc_suite,
                 type="interface",
@@ -299,8 +283,7 @@ def audit_with_erc(
             ev = rule['format']
             esig = get_event_interface(ev['name'], ev['arg_types'])
             compliant = esig in contract_events
-            if not compliant:
-                violations.append(vio)
+            decide("event", idx, rule, None, COMPLIANT if compliant else VIOLATION, start, None if compliant else vio)
 
     # checking function scope related rules
     for idx, rule in enumerate(ei['rules']):
@@ -336,6 +319,9 @@ def audit_with_erc(
             continue
         if "interface" in rule and rule['interface'] != None and rule['interface'].strip().startswith('function'):
             fi = parse_function_signature(rule['interface'])
+            if reuse("rule", idx, rule['interface']):
+                continue
+            start = time.perf_counter()
             verifier = ErcVerifier(cu=cu, logger=logger, contract_path=sol_file, llm=constraintsllmaudit)
             try:
                 compliant = run_verifier_with_timeout(
@@ -349,7 +335,7 @@ def audit_with_erc(
 
                 # rule["audit"] = {"compliant": compliant}
                 if not compliant:
-                    violations.append(
+                    decide("rule", idx, rule, rule['interface'], VIOLATION, start,
                         ErcViolation(
                             erc=erc_suite,
                             type=rule["type"],
@@ -362,16 +348,18 @@ def audit_with_erc(
                             tags={"function"}
                         )
                     )
+                else:
+                    decide("rule", idx, rule, rule['interface'], COMPLIANT, start)
             except TimeoutException:
-                pass
+                decide("rule", idx, rule, rule['interface'], TIMEOUT, start)
             except FnNotFound:
                 # rule["audit"] = {"compliant": False}
                 # # logger.error(f"[sym] skip rule='{rule['rule']}' for function='{rule['interface']}' since function not found: {ex}")
-                pass
+                decide("rule", idx, rule, rule['interface'], NOT_FOUND, start)
             except Exception:
                 # rule["audit"] = {"compliant": True, "error": str(ex)}
                 # # logger.exception(f"[sym] failed to verify rule='{rule['rule']}' for function='{rule['interface']}': {ex}")
-                pass
+                decide("rule", idx, rule, rule['interface'], ERROR, start)
         else:
             # checking the compound rule (emit rule)
             c = cu.get_contract_from_name(contract.name)[0]
@@ -386,6 +374,9 @@ def audit_with_erc(
             rule['audit_fns'] = []
             
             for f in fns:
+                if reuse("rule", idx, f.signature_str):
+                    continue
+                start = time.perf_counter()
                 verifier = ErcVerifier(cu=cu, logger=logger, contract_path=sol_file, llm=constraintsllmaudit)
                 try:
                     compliant = run_verifier_with_timeout(
@@ -402,7 +393,7 @@ def audit_with_erc(
                     #     "compliant": compliant,
                     # })
                     if not compliant:
-                        violations.append(ErcViolation(
+                        decide("rule", idx, rule, f.signature_str, VIOLATION, start, ErcViolation(
                             erc=erc_suite,
                             type=rule["type"],
                             rule=rule['rule'],
@@ -413,22 +404,91 @@ def audit_with_erc(
                             severity="-",
                             tags={"function"}
                         ))
+                    else:
+                        decide("rule", idx, rule, f.signature_str, COMPLIANT, start)
 
                 except TimeoutException:
-                    pass
+                    decide("rule", idx, rule, f.signature_str, TIMEOUT, start)
                 except FnNotFound:
-                    pass
+                    decide("rule", idx, rule, f.signature_str, NOT_FOUND, start)
                     # # logger.error(f"[sym] skip function='{f.signature_str}' for rule='{rule['rule']}' since function not found: {ex}")
                 except StateVarAnchorFnNotFound:
                     # # logger.error(f"[sym] skip function='{f.signature_str}' for rule='{rule['rule']}' since anchor function not found: {ex}")
-                    pass
+                    decide("rule", idx, rule, f.signature_str, NOT_FOUND, start)
                 except Exception:
                     # # logger.error(f"[sym] failed to verify rule='{rule['rule']}' for function='{f.signature_str}': {ex}")
-                    pass
+                    decide("rule", idx, rule, f.signature_str, ERROR, start)
     
     return violations
 
 
+def check_function_interface(
+    contract:ContractMetadata,
+    cucontract,
+    erc_suite:str,
+    erc: Erc,
+    idx:int,
+    rule:Dict) -> Optional[ErcViolation]:
+    """Violation of a function interface rule, None if the contract has the function"""
+    func = rule['format']
+    ret_type = func.get('return_type', None)
+    vio = ErcViolation(
+        erc=erc_suite,
+        type="interface",
+        rule=rule['def'],
+        contract=cucontract.name,
+        interface=erc['name'],
+        fn_interface=None,
+        rid=idx,
+        severity="medium",
+        tags=set()
+    )
+    # checking contract has the function or not
+    candidate_fns = [f for f in cucontract.functions if f.name == func['name']]
+    if not candidate_fns:
+        # check whether function is field getter situation
+        ret_type = ret_type.get('type', None) if ret_type else None
+        arg_type_strs = []
+        for argt in func['arg_types']:
+            arg_type_strs.append(argt['type'])
+        target_fn_sig = get_function_signature(func['name'], arg_type_strs, ret_type)
+        
+        in_sv = target_fn_sig in contract.state_var_sigs
+        # logger.info(f"check if {target_fn_sig} is in {contract.state_var_sigs}: {in_sv}")
+        if not in_sv:
+            vio.tags.add("no_function")
+            return vio
+        return None
+
+    correct_param_fn = None
+
+    # checking function parameters
+    for f in candidate_fns:
+        if len(f.parameters) != len(func['arg_types']):
+            continue
+        skip = False
+        for pidx, at in enumerate(f.parameters):
+            if str(at.type) != func['arg_types'][pidx]["type"]:
+                skip = True
+                break
+        if skip:
+            continue
+        correct_param_fn = f
+    if correct_param_fn is None:
+        vio.tags.add("incorrect_param")
+        return vio
+
+    # checking return type
+    if ret_type is not None:
+        if correct_param_fn.return_type is None or len(correct_param_fn.return_type) != 1:
+            vio.tags.add("incorrect_return")
+            return vio
+        if str(correct_param_fn.return_type[0]) != ret_type["type"]:
+            vio.tags.add("incorrect_return")
+            return vio
+    return None
+
+
 def get_correct_sym(sym:Dict) -> Dict:
     if 'type' in sym:
         return sym
@@ -1,6 +1,12 @@
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set
+import fcntl
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from dataclasses_json import dataclass_json, config
 
 
@@ -35,4 +41,171 @@ class AuditReport:
             self.contract[contract] = []
         self.contract[contract].extend(violations)
 
-    
\ No newline at end of file
+
+logger = logging.getLogger(__name__)
+
+# verdicts of a (contract, rule, function) record
+COMPLIANT = "compliant"
+VIOLATION = "violation"
+TIMEOUT = "timeout"
+NOT_FOUND = "not_found"
+ERROR = "error"
+# verdicts reused on resume, timeouts and errors can be transient and are checked again
+FINAL_VERDICTS = (COMPLIANT, VIOLATION, NOT_FOUND)
+
+
+class ReportSink:
+    def __init__(self, path: str, sol_file: str, resume: bool = True) -> None:
+        """Append-only NDJSON records of the verified rules of a solidity file
+
+        One compact line per (contract, rule, function) is appended as soon as it is
+        decided, so a crashed or timed out run keeps its finished rules. Lines are
+        written with a single O_APPEND write under a file lock, several processes
+        can share the file.
+
+        Args:
+            path (str): NDJSON file
+            sol_file (str): the audited file, records of other files are ignored
+            resume (bool, optional): reuse the final verdicts of a previous run of the file. Defaults to True.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.sol_file = sol_file
+        self.decided: Dict[tuple, Dict] = {}
+        if resume and os.path.exists(path):
+            self.decided = {key: record for key, record in _indexed_records(path).get(sol_file, {}).items()
+                            if record["verdict"] in FINAL_VERDICTS}
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def close(self):
+        os.close(self._fd)
+
+    def get(self, contract: str, erc: str, scope: str, rid: int, fn: str) -> Optional[Dict]:
+        return self.decided.get((self.sol_file, contract, erc, scope, rid, fn))
+
+    def put(self,
+            contract: str,
+            erc: str,
+            scope: str,
+            rid: int,
+            rtype: str,
+            rule: str,
+            fn: str,
+            verdict: str,
+            seconds: float,
+            violation: "ErcViolation" = None) -> Dict:
+        """Append the verdict of a rule
+
+        Args:
+            scope (str): "function" or "event" for the interface rules, "rule" for the others
+            rid (int): offset of the rule in the list of its scope
+            fn (str): the checked function, None for the interface rules
+            violation (ErcViolation, optional): the violation if the verdict is VIOLATION. Defaults to None.
+        """
+        record = {
+            "file": self.sol_file,
+            "contract": contract,
+            "erc": erc,
+            "scope": scope,
+            "rid": rid,
+            "type": rtype,
+            "rule": rule,
+            "fn": fn,
+            "verdict": verdict,
+            "seconds": round(seconds, 3),
+            "time": round(time.time(), 3),
+        }
+        if violation is not None:
+            record["interface"] = violation.interface
+            record["fn_interface"] = violation.fn_interface
+            record["severity"] = violation.severity
+            record["tags"] = sorted(violation.tags) if violation.tags else None
+        self._append((json.dumps(record, separators=(",", ":")) + "\n").encode())
+        if verdict in FINAL_VERDICTS:
+            self.decided[record_key(record)] = record
+        return record
+
+    def _append(self, line: bytes):
+        # the lock makes the partial line check and the write atomic across processes
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size and os.pread(self._fd, 1, size - 1) != b"\n":
+                # terminate the partial line of a killed run, it is skipped on load
+                line = b"\n" + line
+            os.write(self._fd, line)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+# stream path -> (offset of the first unread byte, file -> record key -> record)
+_stream_index: Dict[str, Tuple[int, Dict[str, Dict[tuple, Dict]]]] = {}
+
+
+def _indexed_records(path: str) -> Dict[str, Dict[tuple, Dict]]:
+    """The records of a stream by file, the stream is read once per process
+
+    Later calls only read what was appended since, by this or other processes.
+    """
+    offset, by_file = _stream_index.get(path, (0, {}))
+    if os.path.getsize(path) < offset:
+        # the stream was replaced
+        offset, by_file = 0, {}
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    # a partial last line is read again once it is terminated
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"skip malformed record in {path}: {line[:80]!r}")
+            continue
+        by_file.setdefault(record["file"], {})[record_key(record)] = record
+    _stream_index[path] = (offset + end, by_file)
+    return by_file
+
+
+def record_key(record: Dict) -> tuple:
+    return (record["file"], record["contract"], record["erc"], record["scope"], record["rid"], record["fn"])
+
+
+def load_records(path: str) -> Iterator[Dict]:
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # the last line of a killed run can be partial
+                logger.warning(f"skip malformed record in {path}: {line[:80]!r}")
+
+
+def violation_from_record(record: Dict) -> ErcViolation:
+    return ErcViolation(
+        erc=record["erc"],
+        type=record["type"],
+        rule=record["rule"],
+        contract=record["contract"],
+        interface=record["interface"],
+        fn_interface=record["fn_interface"],
+        rid=record["rid"],
+        severity=record["severity"],
+        tags=set(record["tags"]) if record["tags"] is not None else None
+    )
+
+
+def consolidate(records: Iterator[Dict]) -> Dict[str, AuditReport]:
+    """sol file => AuditReport of the violations, the latest record of a rule wins"""
+    latest = OrderedDict()
+    for record in records:
+        latest[record_key(record)] = record
+    reports: Dict[str, AuditReport] = {}
+    for record in latest.values():
+        report = reports.setdefault(record["file"], AuditReport(record["file"], {}))
+        report.add_violations(
+            record["contract"],
+            [violation_from_record(record)] if record["verdict"] == VIOLATION else []
+        )
+    return reports
+
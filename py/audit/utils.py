@@ -16,6 +16,7 @@ from slither.core.cfg.node import NodeType, Node
 import subprocess
 import logging
 
+from sol.callgraph import get_call_graph
 from sol.utils import get_ifelse_blocks
 logger = logging.getLogger(__name__)
 
@@ -27,29 +28,62 @@ def generate_random_string(length):
     return result
 
 
+# comments, string literals, numbers and identifiers of a line of solidity
+_lex_re = re.compile(r"""//.*|/\*.*?(?:\*/|$)|"(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?|\d[\w.]*|[A-Za-z_$][\w$]*""")
+_ident_re = re.compile(r"[A-Za-z_$][\w$]*")
+
+class IdentifierRenamer:
+    def __init__(self, mapping: Dict[str, str]) -> None:
+        """Rename identifiers of consecutive source lines in a single pass
+
+        Each line is lexed once and every identifier goes through a dict lookup,
+        string literals and comments are kept as is.
+
+        Args:
+            mapping (Dict[str, str]): identifier => new name
+        """
+        self.mapping = mapping
+        self._in_block_comment = False
+
+    def _replace(self, m: re.Match) -> str:
+        tok = m.group(0)
+        c = tok[0]
+        if c == "/":
+            if tok.startswith("/*") and not (len(tok) >= 4 and tok.endswith("*/")):
+                self._in_block_comment = True
+            return tok
+        if c == '"' or c == "'" or c.isdigit():
+            return tok
+        return self.mapping.get(tok, tok)
+
+    def rename(self, line: str) -> str:
+        prefix = ""
+        if self._in_block_comment:
+            end = line.find("*/")
+            if end == -1:
+                return line
+            self._in_block_comment = False
+            prefix, line = line[:end + 2], line[end + 2:]
+        return prefix + _lex_re.sub(self._replace, line)
+
+    def rename_comment(self, line: str) -> str:
+        """Rename every identifier of a comment line, ex. the @param of NatSpec"""
+        if not self.mapping:
+            return line
+        return _ident_re.sub(lambda m: self.mapping.get(m.group(0), m.group(0)), line)
+
+
 def find_all_callees(funcs: Set[FunctionContract]) -> Set[FunctionContract]:
-    to_explore: List[FunctionContract] = []
-    explored: Set[FunctionContract] = set()
+    """Functions transitively called by funcs, funcs included
 
+    The closures come from the call graph of the compilation unit,
+    computed once and shared by every caller.
+    """
+    explored: Set[FunctionContract] = set()
     for f in funcs:
-        to_explore.append(f)
-
-    while len(to_explore) != 0:
-        f = to_explore.pop(0)
         if f is None or f in explored:
             continue
-        explored.add(f)
-        if hasattr(f, "is_constructor") and f.is_constructor:
-            to_explore.extend(f.contract.constructors)
-
-        if isinstance(f, SolidityFunction):
-            continue
-        for c in f.all_internal_calls():
-            to_explore.append(c)
-        for c in f.all_library_calls():
-            callee = c[1]
-            to_explore.append(callee)
-
+        explored |= get_call_graph(f).callees(f)
     return explored
 
 
@@ -103,6 +137,7 @@ def slice(initf: FunctionContract, params: List[int] = None,
     matched_lines = set()
     cond_callsite_lines: Dict[Operation, FunctionContract] = {}
     cond_sv: Set[Tuple[Node, StateVariable]] = set()
+    graph = get_call_graph(initf)
     while len(to_explore) != 0:
         f = to_explore.pop(0)
         if f is None or f in explored:
@@ -131,7 +166,7 @@ def slice(initf: FunctionContract, params: List[int] = None,
             callees:List[str] = []
             
             if node.calls_as_expression:
-                for ir in node.irs:
+                for ir in graph.call_irs(node):
                     if isinstance(ir, EventCall):
                         has_emit = True
                     elif isinstance(ir, HighLevelCall):
@@ -394,19 +429,7 @@ def slithir_funcs_to_text(
             for v in func.parameters:
                 replace_map[v.name] = generate_random_string(random.randint(4, 10))
 
-        for line_id in range(func_start_line, func_body_end + 1):
-            line = filelines[line_id - 1]
-            if lstrip:
-                line = line.lstrip()
-            if line.strip().startswith(("*", "/*", "//")) and not with_comment:
-                continue
-
-            if mangle_localvar:
-                for key, value in replace_map.items():
-                    line = re.sub(f"\\b{key}\\b", value, line)
-                    # line = re.sub(f"`{key}`", '`'+value+'`', line)
-            func_lines.append((line, line_id - 1))
-
+        body_replace_map = replace_map
         if mangle_statevar:
             state_vars = set(func.state_variables_read) | set(
                 func.state_variables_written
@@ -416,16 +439,23 @@ def slithir_funcs_to_text(
                     contract_state_var_replace_map[v] = generate_random_string(
                         random.randint(4, 10)
                     )
+            # local variables shadow state variables
+            body_replace_map = {
+                **{v.name: contract_state_var_replace_map[v] for v in state_vars},
+                **replace_map,
+            }
+        renamer = IdentifierRenamer(body_replace_map) if body_replace_map else None
 
-            replaced_lines = []
-            for line, row in func_lines:
-                for v in state_vars:
-                    line = re.sub(
-                        f"\\b{v.name}\\b", contract_state_var_replace_map[v], line
-                    )
-                replaced_lines.append((line, row))
-
-            func_lines = replaced_lines
+        for line_id in range(func_start_line, func_body_end + 1):
+            line = filelines[line_id - 1]
+            if lstrip:
+                line = line.lstrip()
+            if renamer:
+                # lexed before skipping comments to keep track of block comments
+                line = renamer.rename(line)
+            if line.strip().startswith(("*", "/*", "//")) and not with_comment:
+                continue
+            func_lines.append((line, line_id - 1))
 
         lines.extend(func_lines)
 
@@ -442,8 +472,8 @@ def slithir_funcs_to_text(
                         if lstrip:
                             curr_line = curr_line.lstrip()
 
-                        for key, value in replace_map.items():
-                            curr_line = re.sub(f"\\b{key}\\b", value, curr_line)
+                        if replace_map:
+                            curr_line = IdentifierRenamer(replace_map).rename_comment(curr_line)
                         lines.append((curr_line, curr))
                     else:
                         break
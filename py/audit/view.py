@@ -1,5 +1,6 @@
 from collections import defaultdict
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from glob import glob
 import os
@@ -42,8 +43,7 @@ def auto_verify(sol_file, violation:Violation):
 
 def erc721_auto_verify(sol_file, violation:Violation):
     if violation.type == "emit":
-        with open(sol_file, "r") as f:
-            code = f.read()
+        code = read_code(sol_file)
         if violation.rule.find("Approval") != -1 and violation.interface.lower().find("transfer") != -1 and \
               code.find("Clear approval. No need to re-authorize or emit the Approval event") != -1:
             violation.tp_auto_verified = True
@@ -83,8 +83,7 @@ def fill_severity(vio:Violation):
 
 def erc20_auto_verify(sol_file, violation:Violation):
     if violation.rule.find("Transfers of 0 values") != -1:
-        with open(sol_file, "r") as f:
-            code = f.read()
+        code = read_code(sol_file)
         if code.find(r'require(amount > 0, "Transfer amount must be greater than zero");') != -1:
             violation.tp_auto_verified = True
         elif code.find(r'Transfer amount must be greater than zero') != -1:
@@ -98,8 +97,7 @@ def erc20_auto_verify(sol_file, violation:Violation):
 
         
     elif violation.rule.find("deliberately authorized ") != -1:
-        with open(sol_file, "r") as f:
-            code = f.read()
+        code = read_code(sol_file)
         if code.find("!= type(uint256).max") != -1 or code.find('_allowances[sender][msg.sender] != MAX') != -1:
             violation.tp_auto_verified = True
             if violation.tags is None:
@@ -112,8 +110,7 @@ def erc20_auto_verify(sol_file, violation:Violation):
             violation.tp_auto_verified = True
     elif violation.type == "throw":
         if violation.rule.find("account balance does not have enough") != -1:
-            with open(sol_file, "r") as f:
-                code = f.read()
+            code = read_code(sol_file)
             if code.find(r'uint256 balance = IUniswapRouterV2.swap99(') != -1:
                 violation.fp_auto_verified = True
                 violation.fp_reason = 1
@@ -155,31 +152,150 @@ def get_sol_files_set(dir: str):
 def get_violations_from_json(report:dict):
     pass
 
-def view(
-    json_file_or_dir:str, 
-    print_format:str, 
-    unverified_only:bool, 
-    verbose:bool,
-    only_ercs: List[str] = None,
-    ):
+def report_violations(jf:str, report:dict, orignal_file:str, contract:str, erc_num:str) -> List[Violation]:
+    """Violations of a single audit report"""
+    violations = []
+    erc = report["erc"]
+    
+    
+    erc['erc'] = erc_num
+    for func in erc["functions"]:
+        ok = func.get("audit", {}).get("compliant", None)
+        if ok is None:
+            continue
+        if not ok:
+            violations.append(
+                Violation(
+                    report_file=jf,
+                    erc=erc["erc"],
+                    file=orignal_file,
+                    type="interface",
+                    rule=func["def"],
+                    interface=func["def"],
+                    rid=-1,
+                    contract=contract,
+                    tp_auto_verified=True
+                )
+            )
+           
+    for ev in erc["events"]:
+        ok = ev.get("audit", {}).get("compliant", None)
+        if not ok:
+            violations.append(
+                Violation(
+                    report_file=jf,
+                    erc=erc["erc"],
+                    file=orignal_file,
+                    type="interface",
+                    rule=ev["def"],
+                    interface=ev["def"],
+                    rid=-1,
+                    contract=contract,
+                    tp_auto_verified=True
+                )
+            )
+            
+    for idx, rule in enumerate(erc["rules"]):
+        if rule["type"] == "emit":
+            # function scope emit rule
+            if rule["interface"].strip().startswith("function"):
+                ok = rule.get("audit", {}).get("compliant", None)
+                if ok is None:
+                    continue
 
-    if Path(json_file_or_dir).is_dir():
-        json_files = glob(os.path.join(json_file_or_dir, "*.json"))
-    else:
-        json_files = [json_file_or_dir]
+                if not ok:
+                    violations.append(
+                        Violation(
+                            report_file=jf,
+                            erc=erc["erc"],
+                            file=orignal_file,
+                            type="emit",
+                            rule=rule["rule"],
+                            interface=rule["interface"],
+                            contract=contract,
+                            rid=idx,
+                            expect_event= rule["sym"]["EmitVerify"]['event'] if 'EmitVerify' in rule['sym'] else rule["sym"]['event']
+                        )
+                    )
+                    
+            # contract scope emit rule
+            else:
+                audit_fns = rule.get("audit_fns", [])
+                for afn in audit_fns:
+                    if not afn["compliant"]:
+                        violations.append(
+                            Violation(
+                                report_file=jf,
+                                erc=erc["erc"],
+                                file=orignal_file,
+                                type="emit",
+                                rule=rule['rule'] + rule['if']['if'] if 'if' in rule['if'] else rule['if'],
+                                interface=afn["function"],
+                                contract=contract,
+                                rid=idx,
+                                expect_event=rule["sym"]["EmitVerify"]['event'] if 'EmitVerify' in rule['sym'] else rule["sym"]['event']
+                            )
+                        )
+
+        else:
+            ok = rule.get("audit", {}).get("compliant", None)
+            if ok is None:
+                continue
+            if not ok:
+                violations.append(
+                    Violation(
+                        report_file=jf,
+                        erc=erc["erc"],
+                        file=orignal_file,
+                        type=rule["type"],
+                        rule=rule["rule"],
+                        interface=rule["interface"],
+                        contract=contract,
+                        rid=idx,
+                       
+                    )
+                )
+    return violations
+
+
+def parse_report_name(jf:str):
+    """(erc, contract, original sol file name) of a report named <file>-<contract>-<erc>.json"""
+    name = os.path.basename(jf)
+    erc_num = name.split("-")[-1].split(".")[0]
+    contract = name.split("-")[-2]
+    orignal_file = "-".join(name.split("-")[:-2]) + ".sol"
+    return erc_num, contract, orignal_file
 
-    total = 0
+
+def find_original_file(orignal_file:str, search_paths:List[str]) -> Optional[str]:
+    for s in search_paths:
+        if os.path.exists(os.path.join(s, orignal_file)):
+            return os.path.join(s, orignal_file)
+    return None
+
+
+def uses_openzeppelin(sol_file:str) -> bool:
+    code = read_code(sol_file)
+    return code.find("File: @openzeppelin") != -1 or code.find("openzeppelin") != -1
+
+
+@lru_cache(maxsize=256)
+def read_code(sol_file:str) -> str:
+    # auto verification reads the same file for each of its violations
+    with open(sol_file, "r") as f:
+        return f.read()
+
+
+def load_reports(json_files:List[str], search_paths:List[str], only_ercs:List[str] = None):
     total_files = 0
     violations = []
     orig_files = set()
-    search_paths = ["benchmark/large", "benchmark/small", "benchmark/large10k"]
 
     audied_erc_cnt = defaultdict(int)
-    fp_reasons = defaultdict(list)
     orig_file_cnt = defaultdict(int)
     erc721_use_openzeppelin = 0
     for jf in json_files:
-        erc_num = os.path.basename(jf).split("-")[-1].split(".")[0]
+        erc_num, contract, orignal_file = parse_report_name(jf)
         audied_erc_cnt[erc_num] += 1
         
         if only_ercs:
@@ -192,147 +308,70 @@ def view(
                 continue
         with open(jf, "r") as f:
             report = json.load(f)
-        orignal_file = "-".join(os.path.basename(jf).split("-")[:-2]) + ".sol"
-        contract = os.path.basename(jf).split("-")[-2]
-        found = False
-        for s in search_paths:
-            if os.path.exists(os.path.join(s, orignal_file)):
-                orignal_file = os.path.join(s, orignal_file)
-                found = True
-                break
-        if not found:
+        found_file = find_original_file(orignal_file, search_paths)
+        if found_file is None:
             print(f"Cannot find {orignal_file} in {search_paths}")
             continue
+        orignal_file = found_file
         
         if erc_num == "ERC721":
-            with open(orignal_file, "r") as f:
-                code = f.read()
-                if code.find("File: @openzeppelin") != -1 or code.find("openzeppelin") != -1:
-                    erc721_use_openzeppelin += 1
-                # else:
-                #     print(f"ERC721 not using openzeppelin: {orignal_file}")
-        # try:
-        #     with open(orignal_file, "r") as f:
-        #         code = f.read()
-        # except Exception as e:
-        #     print(f"Cannot open {orignal_file} from {jf}")
-        #     raise e
+            if uses_openzeppelin(orignal_file):
+                erc721_use_openzeppelin += 1
 
         total_files += 1
         orig_files.add(orignal_file)
-        erc = report["erc"]
-        
-        
-        erc['erc'] = erc_num
         if erc_num == "ERC20" or erc_num == "ERC721" or erc_num == "ERC1155":
             orig_file_cnt[orignal_file] += 1
         
-        cnt = 0
-        for func in erc["functions"]:
-            ok = func.get("audit", {}).get("compliant", None)
-            if ok is None:
-                continue
-            if not ok:
-                cnt += 1
-                violations.append(
-                    Violation(
-                        report_file=jf,
-                        erc=erc["erc"],
-                        file=orignal_file,
-                        type="interface",
-                        rule=func["def"],
-                        interface=func["def"],
-                        rid=-1,
-                        contract=contract,
-                        tp_auto_verified=True
-                    )
-                )
-               
-        for ev in erc["events"]:
-            ok = ev.get("audit", {}).get("compliant", None)
-            if not ok:
-                cnt += 1
-                violations.append(
-                    Violation(
-                        report_file=jf,
-                        erc=erc["erc"],
-                        file=orignal_file,
-                        type="interface",
-                        rule=ev["def"],
-                        interface=ev["def"],
-                        rid=-1,
-                        contract=contract,
-                        tp_auto_verified=True
-                    )
-                )
-                
-        for idx, rule in enumerate(erc["rules"]):
-            if rule["type"] == "emit":
-                # function scope emit rule
-                if rule["interface"].strip().startswith("function"):
-                    ok = rule.get("audit", {}).get("compliant", None)
-                    if ok is None:
-                        continue
-
-                    if not ok:
-                        cnt += 1
-                        
-                        violations.append(
-                            Violation(
-                                report_file=jf,
-                                erc=erc["erc"],
-                                file=orignal_file,
-                                type="emit",
-                                rule=rule["rule"],
-                                interface=rule["interface"],
-                                contract=contract,
-                                rid=idx,
-                                expect_event= rule["sym"]["EmitVerify"]['event'] if 'EmitVerify' in rule['sym'] else rule["sym"]['event']
-                            )
-                        )
-                        
-                # contract scope emit rule
-                else:
-                    audit_fns = rule.get("audit_fns", [])
-                    for afn in audit_fns:
-                        if not afn["compliant"]:
-                            cnt += 1
-                            violations.append(
-                                Violation(
-                                    report_file=jf,
-                                    erc=erc["erc"],
-                                    file=orignal_file,
-                                    type="emit",
-                                    rule=rule['rule'] + rule['if']['if'] if 'if' in rule['if'] else rule['if'],
-                                    interface=afn["function"],
-                                    contract=contract,
-                                    rid=idx,
-                                    expect_event=rule["sym"]["EmitVerify"]['event'] if 'EmitVerify' in rule['sym'] else rule["sym"]['event']
-                                )
-                            )
+        violations.extend(report_violations(jf, report, orignal_file, contract, erc_num))
+    return violations, audied_erc_cnt, orig_files, orig_file_cnt, erc721_use_openzeppelin
 
-            else:
-                ok = rule.get("audit", {}).get("compliant", None)
-                if ok is None:
-                    continue
-                if not ok:
-                    cnt += 1
-                    
-                    violations.append(
-                        Violation(
-                            report_file=jf,
-                            erc=erc["erc"],
-                            file=orignal_file,
-                            type=rule["type"],
-                            rule=rule["rule"],
-                            interface=rule["interface"],
-                            contract=contract,
-                            rid=idx,
-                           
-                        )
-                    )
 
-        total += cnt
+SEARCH_PATHS = ["benchmark/large", "benchmark/small", "benchmark/large10k"]
+
+def view(
+    json_file_or_dir:str, 
+    print_format:str, 
+    unverified_only:bool, 
+    verbose:bool,
+    only_ercs: List[str] = None,
+    warehouse: str = None,
+    ):
+    """Print the violations of audit reports
+
+    Args:
+        warehouse (str, optional): SQLite `ReportWarehouse`, reports are ingested once and
+            only new or changed reports are parsed again. Defaults to None(parse every report).
+    """
+
+    if Path(json_file_or_dir).is_dir():
+        json_files = glob(os.path.join(json_file_or_dir, "*.json"))
+    else:
+        json_files = [json_file_or_dir]
+
+    search_paths = SEARCH_PATHS
+
+    fp_reasons = defaultdict(list)
+    if warehouse:
+        from audit.warehouse import ReportWarehouse
+        wh = ReportWarehouse(warehouse)
+        try:
+            wh.ingest(json_files, search_paths)
+            for name in wh.missing_files(json_files, only_ercs):
+                print(f"Cannot find {name} in {search_paths}")
+            violations = wh.violations(json_files, only_ercs)
+            audied_erc_cnt = wh.audited_erc_counts(json_files)
+            orig_file_cnt = wh.orig_file_counts(json_files, only_ercs)
+            orig_files = set(wh.orig_files(json_files, only_ercs))
+            erc721_use_openzeppelin = wh.openzeppelin_count(json_files, only_ercs)
+            if verbose:
+                for (erc, severity), n in wh.counts(json_files, ("erc", "severity"), only_ercs).items():
+                    print(f"[{erc}] {severity}: {n} violations before verification")
+        finally:
+            wh.close()
+    else:
+        violations, audied_erc_cnt, orig_files, orig_file_cnt, erc721_use_openzeppelin = \
+            load_reports(json_files, search_paths, only_ercs)
 
     confirmed = json.loads(open('eval/confirmed.json', 'r').read())
     confirmed_tps = confirmed['tp']
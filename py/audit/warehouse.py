@@ -0,0 +1,181 @@
+from collections import defaultdict
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List
+
+from audit.view import (
+    Violation, fill_severity, find_original_file, parse_report_name, report_violations, uses_openzeppelin
+)
+
+logger = logging.getLogger(__name__)
+
+_violation_columns = [
+    "report_file", "erc", "file", "type", "rule", "contract", "interface", "rid",
+    "severity", "tp_auto_verified", "expect_event",
+]
+
+
+class ReportWarehouse:
+    def __init__(self, path: str) -> None:
+        """Violations of audit reports, one row per violation
+
+        Reports are keyed by path and parsed again only when their size or mtime changes,
+        the per ERC/rule/severity counts are answered by the tables.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                report_file TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                erc TEXT,
+                contract TEXT,
+                name TEXT,
+                orig_file TEXT,
+                openzeppelin INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS violations (
+                report_file TEXT,
+                erc TEXT,
+                file TEXT,
+                type TEXT,
+                rule TEXT,
+                contract TEXT,
+                interface TEXT,
+                rid INTEGER,
+                severity TEXT,
+                tp_auto_verified INTEGER,
+                expect_event TEXT
+            );
+            CREATE INDEX IF NOT EXISTS reports_orig_file ON reports(orig_file);
+            CREATE INDEX IF NOT EXISTS violations_report_file ON violations(report_file);
+            CREATE INDEX IF NOT EXISTS violations_erc ON violations(erc, severity);
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    def stale_reports(self, json_files: List[str]) -> List[str]:
+        ingested = {path: (size, mtime) for path, size, mtime in
+                    self._conn.execute("SELECT report_file, size, mtime FROM reports")}
+        stale = []
+        for jf in json_files:
+            st = os.stat(jf)
+            if ingested.get(jf) != (st.st_size, st.st_mtime):
+                stale.append(jf)
+        return stale
+
+    def put(self, jf: str, search_paths: List[str]):
+        st = os.stat(jf)
+        erc_num, contract, name = parse_report_name(jf)
+        orig_file = find_original_file(name, search_paths)
+        vios = []
+        if orig_file is not None:
+            with open(jf, "r") as f:
+                report = json.load(f)
+            vios = report_violations(jf, report, orig_file, contract, erc_num)
+            for vio in vios:
+                fill_severity(vio)
+        with self._conn:
+            self._conn.execute("DELETE FROM violations WHERE report_file = ?", (jf,))
+            self._conn.executemany(
+                f"INSERT INTO violations({', '.join(_violation_columns)}) VALUES ({', '.join('?' * len(_violation_columns))})",
+                [tuple(getattr(vio, c) for c in _violation_columns) for vio in vios]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports(report_file, size, mtime, erc, contract, name, orig_file, openzeppelin) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (jf, st.st_size, st.st_mtime, erc_num, contract, name, orig_file,
+                 orig_file is not None and erc_num == "ERC721" and uses_openzeppelin(orig_file))
+            )
+
+    def ingest(self, json_files: List[str], search_paths: List[str]) -> int:
+        """Parse the new and changed reports, and the ones whose original file was missing"""
+        stale = set(self.stale_reports(json_files))
+        requested = set(json_files)
+        stale.update(jf for (jf,) in self._conn.execute("SELECT report_file FROM reports WHERE orig_file IS NULL")
+                     if jf in requested)
+        logger.info(f"{len(json_files)} reports, {len(stale)} to ingest")
+        for jf in stale:
+            self.put(jf, search_paths)
+        return len(stale)
+
+    def _select(self, json_files: List[str], only_ercs: List[str] = None):
+        """Fill the temp table of the reports to query, returns the ERC filter and its arguments"""
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected (report_file TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM selected")
+        self._conn.executemany("INSERT OR IGNORE INTO selected VALUES (?)", [(jf,) for jf in json_files])
+        if not only_ercs:
+            return "1", ()
+        # same substring match as `view`
+        return "(" + " OR ".join("instr(r.erc, ?) > 0" for _ in only_ercs) + ")", tuple(only_ercs)
+
+    def violations(self, json_files: List[str], only_ercs: List[str] = None) -> List[Violation]:
+        erc_filter, args = self._select(json_files, only_ercs)
+        cols = ", ".join(f"v.{c}" for c in _violation_columns)
+        rows = self._conn.execute(
+            f"SELECT {cols} FROM violations v JOIN reports r ON r.report_file = v.report_file "
+            f"JOIN selected s ON s.report_file = r.report_file "
+            f"WHERE r.orig_file IS NOT NULL AND {erc_filter} ORDER BY s.rowid, v.rowid", args
+        )
+        vios = []
+        for row in rows:
+            vio = Violation(**dict(zip(_violation_columns, row)))
+            vio.tp_auto_verified = bool(vio.tp_auto_verified)
+            # severity is filled again after the verification
+            vio.severity = None
+            vios.append(vio)
+        return vios
+
+    def missing_files(self, json_files: List[str], only_ercs: List[str] = None) -> List[str]:
+        """Original files of the reports not found in the search paths"""
+        erc_filter, args = self._select(json_files, only_ercs)
+        return [name for (name,) in self._conn.execute(
+            f"SELECT r.name FROM reports r JOIN selected s ON s.report_file = r.report_file "
+            f"WHERE r.orig_file IS NULL AND {erc_filter} ORDER BY s.rowid", args
+        )]
+
+    def audited_erc_counts(self, json_files: List[str]) -> Dict[str, int]:
+        self._select(json_files)
+        return defaultdict(int, self._conn.execute(
+            "SELECT r.erc, COUNT(*) FROM reports r JOIN selected s ON s.report_file = r.report_file GROUP BY r.erc"
+        ))
+
+    def orig_files(self, json_files: List[str], only_ercs: List[str] = None) -> List[str]:
+        erc_filter, args = self._select(json_files, only_ercs)
+        return [f for (f,) in self._conn.execute(
+            f"SELECT DISTINCT r.orig_file FROM reports r JOIN selected s ON s.report_file = r.report_file "
+            f"WHERE r.orig_file IS NOT NULL AND {erc_filter}", args
+        )]
+
+    def orig_file_counts(self, json_files: List[str], only_ercs: List[str] = None) -> Dict[str, int]:
+        """Reports of the ERC20/721/1155 suites per original file"""
+        erc_filter, args = self._select(json_files, only_ercs)
+        return defaultdict(int, self._conn.execute(
+            f"SELECT r.orig_file, COUNT(*) FROM reports r JOIN selected s ON s.report_file = r.report_file "
+            f"WHERE r.orig_file IS NOT NULL AND r.erc IN ('ERC20', 'ERC721', 'ERC1155') AND {erc_filter} "
+            f"GROUP BY r.orig_file", args
+        ))
+
+    def openzeppelin_count(self, json_files: List[str], only_ercs: List[str] = None) -> int:
+        erc_filter, args = self._select(json_files, only_ercs)
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM reports r JOIN selected s ON s.report_file = r.report_file "
+            f"WHERE r.openzeppelin AND {erc_filter}", args
+        ).fetchone()[0]
+
+    def counts(self, json_files: List[str], by: List[str] = ("erc", "severity"), only_ercs: List[str] = None) -> Dict[tuple, int]:
+        """Raw violation counts grouped by violation columns, ex. ("erc", "rid") or ("erc", "severity")"""
+        for c in by:
+            if c not in _violation_columns:
+                raise ValueError(f"unknown column {c}")
+        erc_filter, args = self._select(json_files, only_ercs)
+        group = ", ".join(f"v.{c}" for c in by)
+        return {row[:-1]: row[-1] for row in self._conn.execute(
+            f"SELECT {group}, COUNT(*) FROM violations v JOIN reports r ON r.report_file = v.report_file "
+            f"JOIN selected s ON s.report_file = r.report_file "
+            f"WHERE r.orig_file IS NOT NULL AND {erc_filter} GROUP BY {group} ORDER BY {group}", args
+        )}
@@ -1,6 +1,8 @@
-
-
-from typing import Dict
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
 
 from audit.process import get_the_function
 from erc.find import  get_erc
@@ -12,23 +14,155 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def init_erc_code_database(erc_ct:Dict, existing: Dict=None) -> Dict:
+
+def file_hash(file: str) -> str:
+    with open(file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def rules_hash(erc: Erc) -> str:
+    """Hash of the rules of an ERC, the samples of a rule id are only valid for the same rules"""
+    return hashlib.sha256(json.dumps(erc["rules"], sort_keys=True).encode()).hexdigest()
+
+
+# bump when the slicing of the samples changes, the samples of other versions are dropped
+STORE_VERSION = 1
+
+
+class ErcCodeStore:
+    def __init__(self, path: str) -> None:
+        """On-disk rule => code samples store
+
+        Samples are keyed by (file hash, contract, rule id, rules hash) and point to
+        deduplicated code blobs. Ingestion only appends, a contract already
+        ingested for the same rules of an ERC is never sliced again.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != STORE_VERSION:
+            # blobs are content addressed, they are kept
+            self._conn.executescript("""
+                DROP TABLE IF EXISTS samples;
+                DROP TABLE IF EXISTS ingested;
+            """)
+            self._conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                code TEXT
+            );
+            CREATE TABLE IF NOT EXISTS samples (
+                file_hash TEXT,
+                contract TEXT,
+                rule_id TEXT,
+                rules_hash TEXT,
+                blob_hash TEXT,
+                file TEXT,
+                PRIMARY KEY (file_hash, contract, rule_id, rules_hash)
+            );
+            CREATE INDEX IF NOT EXISTS samples_rule ON samples(rule_id, rules_hash);
+            CREATE TABLE IF NOT EXISTS ingested (
+                file_hash TEXT,
+                contract TEXT,
+                erc TEXT,
+                rules_hash TEXT,
+                PRIMARY KEY (file_hash, contract, erc, rules_hash)
+            );
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    def is_ingested(self, fhash: str, contract: str, erc: str, rhash: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM ingested WHERE file_hash = ? AND contract = ? AND erc = ? AND rules_hash = ?",
+            (fhash, contract, erc, rhash)
+        ).fetchone() is not None
+
+    def put(self, fhash: str, file: str, contract: str, erc: str, rhash: str, rule2code: Dict[str, str]):
+        """Add the samples of one contract, the contract is marked ingested even without samples"""
+        with self._conn:
+            for rule_id, code in rule2code.items():
+                bhash = hashlib.sha256(code.encode()).hexdigest()
+                self._conn.execute("INSERT OR IGNORE INTO blobs(hash, code) VALUES (?, ?)", (bhash, code))
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO samples(file_hash, contract, rule_id, rules_hash, blob_hash, file) VALUES (?, ?, ?, ?, ?, ?)",
+                    (fhash, contract, rule_id, rhash, bhash, file)
+                )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO ingested(file_hash, contract, erc, rules_hash) VALUES (?, ?, ?, ?)",
+                (fhash, contract, erc, rhash)
+            )
+
+    def rule_ids(self, rhash: str) -> List[str]:
+        return [rid for (rid,) in self._conn.execute(
+            "SELECT DISTINCT rule_id FROM samples WHERE rules_hash = ? ORDER BY rule_id", (rhash,))]
+
+    def get_codes(self, rule_id: str, rhash: str, limit: int = None, unique: bool = False) -> List[str]:
+        """Code samples of a rule, one per contract or one per distinct code if unique"""
+        if unique:
+            query = "SELECT code FROM blobs WHERE hash IN (SELECT blob_hash FROM samples WHERE rule_id = ? AND rules_hash = ?)"
+        else:
+            query = "SELECT b.code FROM samples s JOIN blobs b ON s.blob_hash = b.hash WHERE s.rule_id = ? AND s.rules_hash = ? ORDER BY s.rowid"
+        args = (rule_id, rhash)
+        if limit is not None:
+            query += " LIMIT ?"
+            args += (limit,)
+        return [code for (code,) in self._conn.execute(query, args)]
+
+    def get_samples(self, fhash: str, contract: str, rhash: str) -> Dict[str, str]:
+        """rule id => code sliced from one contract, same as `get_erc_code`"""
+        return dict(self._conn.execute(
+            "SELECT s.rule_id, b.code FROM samples s JOIN blobs b ON s.blob_hash = b.hash "
+            "WHERE s.file_hash = ? AND s.contract = ? AND s.rules_hash = ? ORDER BY s.rowid",
+            (fhash, contract, rhash)
+        ))
+
+
+def init_erc_code_database(erc_ct:Dict, existing: Dict=None, store_path: str = None) -> Dict:
+    """rule id => code samples sliced from the contracts of erc_ct
+
+    Args:
+        erc_ct (Dict): ERC => [{"file", "contract"}], see `init_erc_ct_database`
+        existing (Dict, optional): samples to add to. Defaults to None.
+        store_path (str, optional): SQLite `ErcCodeStore`, contracts already in the
+            store are not compiled again. Defaults to None(in memory only).
+    """
     ercs = ["20"]
-    erc_code_db = {} if existing is None else existing
-    for erc in ercs:
-        erc_info = get_erc(erc)
-        items = erc_ct[erc]
-        for item in items:
-            file = item['file']
-            contract_name = item['contract']
-            partial = get_erc_code(file, contract_name, erc_info)
-            for erc_rule_id, code in partial.items():
-                if erc_rule_id not in erc_code_db:
-                    erc_code_db[erc_rule_id] = []
-                erc_code_db[erc_rule_id].append(code)
-    return erc_code_db
+    store = ErcCodeStore(store_path) if store_path else None
+    try:
+        erc_code_db = {} if existing is None else existing
+        for erc in ercs:
+            erc_info = get_erc(erc)
+            rhash = rules_hash(erc_info)
+            items = erc_ct[erc]
+            for item in items:
+                file = item['file']
+                contract_name = item['contract']
+                if store is None:
+                    partial = get_erc_code(file, contract_name, erc_info)
+                else:
+                    fhash = file_hash(file)
+                    if store.is_ingested(fhash, contract_name, erc_info['name'], rhash):
+                        partial = store.get_samples(fhash, contract_name, rhash)
+                    else:
+                        partial = get_erc_code(file, contract_name, erc_info)
+                        if partial is not None:
+                            store.put(fhash, file, contract_name, erc_info['name'], rhash, partial)
+                        # else not marked ingested, compiled again by the next run
+                if partial is None:
+                    continue
+                for erc_rule_id, code in partial.items():
+                    if erc_rule_id not in erc_code_db:
+                        erc_code_db[erc_rule_id] = []
+                    erc_code_db[erc_rule_id].append(code)
+        return erc_code_db
+    finally:
+        if store is not None:
+            store.close()
             
-def get_erc_code(file:str, contract_name:str, erc:Erc) -> Dict:
+def get_erc_code(file:str, contract_name:str, erc:Erc) -> Optional[Dict]:
+    """rule id => code sliced from the contract, None if the file does not compile"""
     partial = {}
     with open(file, 'r') as f:
         filelines = f.read().splitlines(True)
@@ -36,6 +170,7 @@ def get_erc_code(file:str, contract_name:str, erc:Erc) -> Dict:
         _, cu = compile(file)
     except Exception as ex:
         logger.error(f"{file}: {ex}")
+        return None
     
     rules = erc['rules']
     
@@ -1,48 +1,158 @@
 from collections import defaultdict
 import logging
 import os
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
+from typing import Dict, List
 
 from sol.utils import get_contracts_and_ercs, compile
 
-lock = threading.Lock()
 logger = logging.getLogger(__name__)
 
 
-def init_erc_ct_database(sols_dir:str):
+def init_erc_ct_database(sols_dir:str, index_path:str = None, max_workers:int = None):
+    """ERC => contracts implementing it, [{"file", "contract"}]
+
+    Args:
+        sols_dir (str): directory of the solidity files
+        index_path (str, optional): SQLite index of the results, only new or changed
+            files are compiled on the next run. Defaults to None(not persisted).
+        max_workers (int, optional): number of compiling processes. Defaults to the number of CPUs.
+    """
     print(sols_dir, os.path.join(sols_dir, "*.sol"))
-    sol_files = glob(os.path.join(sols_dir, "*.sol"))
-    pool = ThreadPoolExecutor(max_workers=10)
-    futures = [pool.submit(summary_sol, sol_file) for sol_file in sol_files]
+    if index_path:
+        index = ErcCtIndex(index_path)
+        try:
+            index.update(sols_dir, max_workers)
+            return index.load(sols_dir)
+        finally:
+            index.close()
+
     db = defaultdict(list)
-    for future in as_completed(futures):
-        result = future.result()
+    for _, result, _ in compile_all(glob(os.path.join(sols_dir, "*.sol")), max_workers):
         for erc, items in result.items():
             db[erc].extend(items)
-    pool.shutdown()
     return db
 
 
-
 def summary_sol(sol_file:str):
-    
-    try:
-        lock.acquire()
-        _, cu = compile(sol_file)
-    except Exception as ex:
-        cu = None
-    finally:
-        lock.release()
-    if cu is None:
-        return {}
+    # every worker calls its own solc binary, no need to lock the global version
+    _, cu = compile(sol_file, isolated_solc=True)
     summary = defaultdict(list)
     for c, ercs in get_contracts_and_ercs(cu).items():
-        for erc in ercs:            
+        for erc in ercs:
             summary[erc].append({
                 "file": sol_file,
                 "contract": c.name
             })
     return summary
-    
\ No newline at end of file
+
+
+def _summary_worker(sol_file: str):
+    try:
+        return sol_file, dict(summary_sol(sol_file)), None
+    except Exception as ex:
+        logger.debug(f"failed to compile {sol_file}: {ex}")
+        return sol_file, {}, str(ex)
+
+
+def compile_all(sol_files: List[str], max_workers:int = None):
+    """Yield (file, summary, error) in the order the files are finished"""
+    if not sol_files:
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_summary_worker, sol_file) for sol_file in sol_files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class ErcCtIndex:
+    def __init__(self, path: str) -> None:
+        """Persistent contract => ERC index of a corpus directory
+
+        Files are keyed by path and re-indexed when their size or mtime changes,
+        files that failed to compile are retried on every update.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS contracts (
+                path TEXT,
+                contract TEXT,
+                erc TEXT
+            );
+            CREATE INDEX IF NOT EXISTS contracts_path ON contracts(path);
+            CREATE INDEX IF NOT EXISTS contracts_erc ON contracts(erc);
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    def stale_files(self, sol_files: List[str]) -> List[str]:
+        indexed = {path: (size, mtime) for path, size, mtime in
+                   self._conn.execute("SELECT path, size, mtime FROM files WHERE error IS NULL")}
+        stale = []
+        for sol_file in sol_files:
+            st = os.stat(sol_file)
+            if indexed.get(sol_file) != (st.st_size, st.st_mtime):
+                stale.append(sol_file)
+        return stale
+
+    def put(self, sol_file: str, summary: Dict, error: str = None):
+        st = os.stat(sol_file)
+        with self._conn:
+            self._conn.execute("DELETE FROM contracts WHERE path = ?", (sol_file,))
+            self._conn.executemany(
+                "INSERT INTO contracts(path, contract, erc) VALUES (?, ?, ?)",
+                [(sol_file, item["contract"], erc) for erc, items in summary.items() for item in items]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files(path, size, mtime, error) VALUES (?, ?, ?, ?)",
+                (sol_file, st.st_size, st.st_mtime, error)
+            )
+
+    def remove_missing(self, sol_files: List[str], sols_dir: str):
+        existing = set(sol_files)
+        # glob is not recursive, only the files directly in the directory
+        directory = os.path.dirname(os.path.join(sols_dir, ""))
+        missing = [path for (path,) in self._conn.execute("SELECT path FROM files")
+                   if os.path.dirname(path) == directory and path not in existing]
+        with self._conn:
+            for path in missing:
+                self._conn.execute("DELETE FROM contracts WHERE path = ?", (path,))
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return missing
+
+    def update(self, sols_dir: str, max_workers:int = None) -> int:
+        """Compile the new and changed files of the directory, results are written as they finish"""
+        sol_files = glob(os.path.join(sols_dir, "*.sol"))
+        removed = self.remove_missing(sol_files, sols_dir)
+        stale = self.stale_files(sol_files)
+        logger.info(f"{sols_dir}: {len(sol_files)} files, {len(stale)} to index, {len(removed)} removed")
+        for cnt, (sol_file, summary, error) in enumerate(compile_all(stale, max_workers)):
+            self.put(sol_file, summary, error)
+            if (cnt + 1) % 100 == 0:
+                logger.info(f"indexed {cnt + 1}/{len(stale)} files")
+        return len(stale)
+
+    def load(self, sols_dir: str = None) -> Dict[str, List[Dict]]:
+        query = "SELECT path, contract, erc FROM contracts"
+        args = ()
+        if sols_dir:
+            prefix = os.path.join(sols_dir, "")
+            query += " WHERE substr(path, 1, ?) = ?"
+            args = (len(prefix), prefix)
+        db = defaultdict(list)
+        for path, contract, erc in self._conn.execute(query + " ORDER BY path, rowid", args):
+            db[erc].append({
+                "file": path,
+                "contract": contract
+            })
+        return db
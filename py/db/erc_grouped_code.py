@@ -1,5 +1,5 @@
 from typing import Dict
-from sol.simil import zss_distance
+from sol.simil import jaccard_distance, pq_grams, zss_distance
 from sol.ast import get_sol_ast
 import logging
 logger = logging.getLogger(__name__)
@@ -32,13 +32,25 @@ def init_erc_grouped_code_database(erc_ct:Dict) -> Dict:
         db[rid] = get_grouped_exps(codes)
     return db
 
-def get_grouped_exps(codes):
+def get_grouped_exps(codes, exact=True):
+    """Group the example codes by their distance to the first one
+
+    Args:
+        codes (List[str]): example codes of a rule
+        exact (bool, optional): use the exact tree edit distance, super-cubic in the
+            size of the code, or the linear pq-gram distance when False. Defaults to True.
+    """
     code2ast = {}
     for code in codes:
         code2ast[code] = get_sol_ast(code)
     
+    uniq_codes = list(code2ast.keys())
     sus = list(code2ast.values())
-    distances = [(zss_distance(sus[0], su), i) for i, su in enumerate(sus[1:])]
+    if exact:
+        distances = [(zss_distance(sus[0], su), i + 1) for i, su in enumerate(sus[1:])]
+    else:
+        ref = pq_grams(sus[0])
+        distances = [(jaccard_distance(ref, pq_grams(su)), i + 1) for i, su in enumerate(sus[1:])]
     dist = dict(Counter([dis for dis, _ in distances]))
     groups = group_tuples(distances, 3)
     
@@ -49,9 +61,9 @@ def get_grouped_exps(codes):
         
         rule_examples.append({
             "sim": item[0],
-            "code": codes[code_id]
+            "code": uniq_codes[code_id]
         })
     return {
             "dist": dist,
             "examples": rule_examples
-        }
\ No newline at end of file
+        }
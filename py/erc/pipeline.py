@@ -1,33 +1,103 @@
 import logging
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 from abc import ABC, abstractmethod
 import asyncio
+import copy
 import json
 import os
 
 from erc.types import Erc
+from llm.metrics import erc_scope
 
 logger = logging.getLogger(__name__)
 
+
+class Journal:
+    def __init__(self, path: str) -> None:
+        """Append-only journal of finished units of work(ex. one LLM request),
+        used to resume an interrupted pipeline from the last finished unit.
+
+        Args:
+            path (str): JSONL file of the journal
+        """
+        self._path = path
+        self._entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line can be partially written if the run was interrupted
+                        continue
+                    self._entries[f"{entry['stage']}:{entry['key']}"] = entry['value']
+            logger.debug(f"loaded {len(self._entries)} journal entries from {path}")
+
+    def get(self, stage: str, key: str) -> Optional[Dict]:
+        return self._entries.get(f"{stage}:{key}")
+
+    def append(self, stage: str, key: str, value: Dict):
+        self._entries[f"{stage}:{key}"] = value
+        with open(self._path, "a") as f:
+            f.write(json.dumps({"stage": stage, "key": key, "value": value}) + "\n")
+
+    def stage(self, stage: str) -> "StageJournal":
+        return StageJournal(self, stage)
+
+    def remove(self):
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+
+class StageJournal:
+    def __init__(self, journal: Journal, stage: str) -> None:
+        self._journal = journal
+        self._stage = stage
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._journal.get(self._stage, key)
+
+    def append(self, key: str, value: Dict):
+        self._journal.append(self._stage, key, value)
+
+
+# Called with the rules of one function/event as soon as they are produced
+OnRulesFunction = Callable[[List[Dict]], None]
+
 class ErcPipeline(ABC):
-    
+
     @abstractmethod
     def name(self) -> str:
         raise NotImplementedError()
 
     @abstractmethod
-    async def run(self, erc: Erc) -> Erc:
+    async def run(self, erc: Erc, journal: StageJournal = None, on_rules: OnRulesFunction = None) -> Erc:
+        raise NotImplementedError()
+
+    def streamable(self) -> bool:
+        """Whether run_rules can start on part of the rules while the previous pipeline is still running"""
+        return False
+
+    async def run_rules(self, erc: Erc, rules: List[Dict], journal: StageJournal = None):
         raise NotImplementedError()
-    
+
 
 class ErcPipelineManager:
-    def __init__(self, pipelines: List[ErcPipeline]) -> None:
+    def __init__(self, pipelines: List[ErcPipeline], stream: bool = True) -> None:
         self.pipelines = pipelines
-    
+        self.stream = stream
+
     async def run(self, erc_obj: Erc, cache_dir:str = None, cache_prefix = "") -> Erc:
+        with erc_scope(erc_obj['name']):
+            return await self._run(erc_obj, cache_dir, cache_prefix)
+
+    async def _run(self, erc_obj: Erc, cache_dir:str = None, cache_prefix = "") -> Erc:
         curr = erc_obj
         prev_changed = False
-        for pl in self.pipelines:
+        journal = None
+        if cache_dir:
+            journal = Journal(os.path.join(cache_dir, f"{cache_prefix}_{erc_obj['name']}_journal.jsonl"))
+        for idx, pl in enumerate(self.pipelines):
             pl_name = pl.name()
             if cache_dir:
                 dst = os.path.join(cache_dir, f"{cache_prefix}_{erc_obj['name']}_{pl_name}.json")
@@ -37,13 +107,45 @@ class ErcPipelineManager:
                         logger.debug(f"loaded {dst} from cache")
                 else:
                     prev_changed = True
-            curr = await pl.run(curr)
+            stage_journal = journal.stage(pl_name) if journal else None
+
+            # the next pipeline is never loaded from cache once this one has changed,
+            # so it can start on the rules of a function as soon as they are produced
+            nxt = self.pipelines[idx + 1] if idx + 1 < len(self.pipelines) else None
+            if self.stream and prev_changed and nxt is not None and nxt.streamable():
+                curr, produced = await self._run_streaming(pl, nxt, curr, stage_journal, journal.stage(nxt.name()) if journal else None)
+            else:
+                curr = await pl.run(curr, stage_journal)
+                produced = curr
             if cache_dir:
                 with open(dst, "w") as f:
-                    json.dump(curr, f, indent=4)
+                    json.dump(produced, f, indent=4)
+        if journal:
+            # every stage has its cache file now
+            journal.remove()
         return curr
 
+    async def _run_streaming(self, pl: ErcPipeline, nxt: ErcPipeline, erc: Erc,
+                             journal: StageJournal, nxt_journal: StageJournal) -> Tuple[Erc, Erc]:
+        """Run pl and start nxt.run_rules on each batch of rules pl produces.
 
-
-
-
+        Returns:
+            Tuple[Erc, Erc]: the output of pl with nxt already applied to its rules,
+                and the output of pl as it produced it, for the cache of pl
+        """
+        tasks = []
+        produced_rules: Dict[int, Dict] = {}
+        def on_rules(rules: List[Dict]):
+            # nxt updates the rules in place, keep a copy before its task starts
+            for rule in rules:
+                produced_rules[id(rule)] = copy.deepcopy(rule)
+            tasks.append(asyncio.create_task(nxt.run_rules(erc, rules, nxt_journal)))
+        try:
+            erc = await pl.run(erc, journal, on_rules)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        produced = dict(erc)
+        produced["rules"] = [produced_rules.get(id(rule), rule) for rule in erc.get("rules", [])]
+        return erc, produced
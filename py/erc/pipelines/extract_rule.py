@@ -3,12 +3,12 @@ import json
 import logging
 import os
 import re
-from typing import Callable, List, Tuple
-from openai import AsyncOpenAI
+from typing import Callable, Dict, List, Tuple
 
-from erc.pipeline import ErcPipeline
+from erc.pipeline import ErcPipeline, OnRulesFunction, StageJournal
 from erc.types import Erc
 from erc.utils import iterate_rules
+from llm.dedupe import DedupedCompletions
 from llm.utils import trim_json_markers
 from log import get_private_file_logger
 
@@ -199,10 +199,38 @@ List the conditions that need to be in order in the given description for functi
 async def empty():
     return None
 
-async def parse_evt_rules(openai:AsyncOpenAI, erc_obj, promptfns):
+def resume_extracted(fn_or_evt, kind:str, promptfns, journal:StageJournal):
+    """Fill the extraction finished by an interrupted run from the journal"""
+    if journal is None:
+        return
+    for name, _ in promptfns:
+        if name in fn_or_evt.get('extracted', {}):
+            continue
+        entry = journal.get(f"{kind}:{fn_or_evt['def']}:{name}")
+        if entry is None:
+            continue
+        fn_or_evt.setdefault("extracted", {})[name] = entry["extracted"]
+        if "extract_debug" not in fn_or_evt or isinstance(fn_or_evt['extract_debug'], str):
+            fn_or_evt['extract_debug'] = {}
+        fn_or_evt["extract_debug"][name] = entry["debug"]
+
+def checkpoint_extracted(fn_or_evt, kind:str, names:List[str], journal:StageJournal):
+    if journal is None:
+        return
+    for name in names:
+        if name not in fn_or_evt.get('extracted', {}):
+            # failed to parse the reply, ask again on the next run
+            continue
+        journal.append(f"{kind}:{fn_or_evt['def']}:{name}", {
+            "extracted": fn_or_evt["extracted"][name],
+            "debug": fn_or_evt["extract_debug"][name]
+        })
+
+async def parse_evt_rules(completions:DedupedCompletions, erc_obj, promptfns, journal:StageJournal = None, on_evt_done = None):
     events = erc_obj["events"]
     
     for evt in events:
+        resume_extracted(evt, "evt", promptfns, journal)
         prompts = [
             promptfn(evt['def'], evt['raw_rules']) if name not in evt.get('extracted', {}) else None
             for name, promptfn in promptfns
@@ -210,7 +238,7 @@ async def parse_evt_rules(openai:AsyncOpenAI, erc_obj, promptfns):
         for name, promptfn in promptfns:
             llm_logger.info(f"ID=0 Label=ext_evt_{name}\nPrompt=\n{promptfn(evt['def'], evt['raw_rules'])}")
         coroutines = [
-            openai.chat.completions.create(
+            completions.create(
                 messages=[
                     {
                         "content":prompt,
@@ -218,9 +246,10 @@ async def parse_evt_rules(openai:AsyncOpenAI, erc_obj, promptfns):
                     }
                 ],
                 reasoning_effort="high",
-                model="gpt-5"
+                model="gpt-5",
+                label=f"ext_evt_{name}"
             ) if prompt else empty()
-            for prompt in prompts
+            for prompt, (name, _) in zip(prompts, promptfns)
         ]
 
         results = await asyncio.gather(*coroutines)
@@ -232,20 +261,24 @@ async def parse_evt_rules(openai:AsyncOpenAI, erc_obj, promptfns):
             
             
             if res is None:
-                if name in evt["extract_debug"]:
+                if name in evt.get("extract_debug", {}):
                     llm_logger.info(f"ID=0 Label=ext_evt_{name}\nReplies=\n0:\n{evt['extract_debug'][name]}")
                 if name not in evt["extracted"]:
                     evt["extracted"][name] = None
                 continue
             try:
-                evt["extracted"][name] = json.loads(trim_json_markers(res.choices[0].message.content))
+                evt["extracted"][name] = json.loads(trim_json_markers(res))
             except Exception as ex:
                 print(ex)
             if "extract_debug" not in evt or isinstance(evt['extract_debug'], str):
                 evt['extract_debug'] = {}
-            evt["extract_debug"][name] = res.choices[0].message.content
+            evt["extract_debug"][name] = res
+
+        checkpoint_extracted(evt, "evt", [name for (res, (name, _)) in zip(results, promptfns) if res is not None], journal)
+        if on_evt_done:
+            on_evt_done(evt)
 
-async def parse_fn_rules(openai:AsyncOpenAI, erc_obj:Erc, promptfns):
+async def parse_fn_rules(completions:DedupedCompletions, erc_obj:Erc, promptfns, journal:StageJournal = None, on_fn_done = None):
     logger.debug(f"Extracting function rules for {erc_obj['name']}")
     functions = erc_obj["functions"]
     
@@ -259,6 +292,7 @@ async def parse_fn_rules(openai:AsyncOpenAI, erc_obj:Erc, promptfns):
             merged_raw[fn_name] += "\n" + fn['raw_rules']
     
     for fn in functions:
+        resume_extracted(fn, "fn", promptfns, journal)
 
         prompts = [
             promptfn(fn['def'], merged_raw[fn['def'].split("(")[0]]) if name not in fn.get('extracted', {}) else None
@@ -277,7 +311,7 @@ async def parse_fn_rules(openai:AsyncOpenAI, erc_obj:Erc, promptfns):
                 # logger.debug(f"Skipping {name} for {fn['def']}")
 
         coroutines = [
-            openai.chat.completions.create(
+            completions.create(
                 messages=[
                     {
                         "content":prompt,
@@ -286,9 +320,10 @@ async def parse_fn_rules(openai:AsyncOpenAI, erc_obj:Erc, promptfns):
                 ],
                 reasoning_effort="high",
                 model="gpt-5",
+                label=f"ext_fn_{name}"
             ) if prompt else empty()
-            for prompt 
-            in prompts
+            for prompt, (name, _)
+            in zip(prompts, promptfns)
         ]
     
         results = await asyncio.gather(*coroutines)
@@ -298,21 +333,21 @@ async def parse_fn_rules(openai:AsyncOpenAI, erc_obj:Erc, promptfns):
             if "extracted" not in fn:
                 fn["extracted"] = {}
             if res is None:
-                if name in fn["extract_debug"]:
+                if name in fn.get("extract_debug", {}):
                     llm_logger.info(f"ID=0 Label=ext_fn_{name}\nReplies=\n0:\n{fn["extract_debug"][name]}")
                 if name not in fn["extracted"]:
                     fn["extracted"][name] = None
                 continue
             try:
                 if name == "semantic_return":
-                    fn["extracted"][name] = res.choices[0].message.content
+                    fn["extracted"][name] = res
                 else:
-                    fn["extracted"][name] = json.loads(trim_json_markers(res.choices[0].message.content))
+                    fn["extracted"][name] = json.loads(trim_json_markers(res))
             except Exception as ex:
                 print(ex)
             if "extract_debug" not in fn or isinstance(fn['extract_debug'], str):
                 fn['extract_debug'] = {}
-            fn["extract_debug"][name] = res.choices[0].message.content
+            fn["extract_debug"][name] = res
             
             # extract pattern in the `...`
             reg = r"`(.*?)`"
@@ -328,6 +363,10 @@ async def parse_fn_rules(openai:AsyncOpenAI, erc_obj:Erc, promptfns):
                                 continue
                     frules.append(rule)
                 fn["extracted"][name]["assign"] = frules
+
+        checkpoint_extracted(fn, "fn", [name for (res, (name, _)) in zip(results, promptfns) if res is not None], journal)
+        if on_fn_done:
+            on_fn_done(fn)
                         
 
 def if_view(fn_or_evt_obj):
@@ -336,9 +375,9 @@ def if_view(fn_or_evt_obj):
 class ExtractRule(ErcPipeline):
     def name(self) -> str:
         return "ext"
-    def __init__(self, openai:AsyncOpenAI, erc_str:str) -> None:
+    def __init__(self, completions:DedupedCompletions, erc_str:str) -> None:
         super().__init__()
-        self._openai = openai
+        self._completions = completions
         self._erc_str = erc_str
         # rule cateogry, extract function, skip function
         prompt_fns: List[Tuple[str, Callable ]] = []
@@ -357,10 +396,20 @@ class ExtractRule(ErcPipeline):
         self._prompt_fns = prompt_fns
         self._evt_prompt_fns = evt_prompt_fns
     
-    async def run(self, ei: Erc) -> Erc:
-        await parse_fn_rules(self._openai, ei, self._prompt_fns)
-        await parse_evt_rules(self._openai, ei, self._evt_prompt_fns)
+    async def run(self, ei: Erc, journal: StageJournal = None, on_rules: OnRulesFunction = None) -> Erc:
         ei["rules"] = []
+        def add_rules(fns, evts):
+            rules = self.get_rules(Erc(name=ei["name"], functions=fns, events=evts))
+            ei["rules"].extend(rules)
+            if on_rules and rules:
+                on_rules(rules)
+
+        await parse_fn_rules(self._completions, ei, self._prompt_fns, journal, lambda fn: add_rules([fn], []))
+        await parse_evt_rules(self._completions, ei, self._evt_prompt_fns, journal, lambda evt: add_rules([], [evt]))
+        return ei
+
+    def get_rules(self, ei: Erc) -> List[Dict]:
+        rules = []
         for (fn_or_evt, rule_type, rule, cond) in iterate_rules(ei):
             rule_obj = {
                 'rule': rule,
@@ -378,5 +427,5 @@ class ExtractRule(ErcPipeline):
                 if self._erc_str.find(f"function {callee_name}") == -1:
                     logger.info(f"Skip rule {rule} for {fn_or_evt['def']}")
                     continue
-            ei["rules"].append(rule_obj)
-        return ei
\ No newline at end of file
+            rules.append(rule_obj)
+        return rules
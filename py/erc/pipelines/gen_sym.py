@@ -1,11 +1,12 @@
 import asyncio
-from openai import AsyncOpenAI
-from erc.pipeline import ErcPipeline
+from erc.pipeline import ErcPipeline, OnRulesFunction, StageJournal
 from erc.types import Erc
 import json
 import logging
+from typing import Dict, List
 
 from erc.utils import get_base_erc_name
+from llm.dedupe import DedupedCompletions
 from llm.utils import trim_json_markers
 from log import get_private_file_logger
 
@@ -13,16 +14,13 @@ logger = logging.getLogger(__name__)
 llm_logger = get_private_file_logger("llm.log")
 
 
-async def empty():
-    return None
-
 class GenSym(ErcPipeline):
     def name(self) -> str:
         return "sym"
 
-    def __init__(self, openai: AsyncOpenAI) -> None:
+    def __init__(self, completions: DedupedCompletions) -> None:
         super().__init__()
-        self._openai = openai
+        self._completions = completions
         self._sym_json_schema = {
     "throw": json.loads(open("docs/sym_input/throw_verify.json").read()),
     "emit": json.loads(open("docs/sym_input/emit_verify.json").read()),
@@ -41,36 +39,51 @@ class GenSym(ErcPipeline):
         }
 
     
-    async def run(self, ei: Erc) -> Erc:
+    def streamable(self) -> bool:
+        return True
+
+    async def run(self, ei: Erc, journal: StageJournal = None, on_rules: OnRulesFunction = None) -> Erc:
+        await self.run_rules(ei, ei["rules"], journal)
+        return ei
+
+    async def run_rules(self, ei: Erc, rules: List[Dict], journal: StageJournal = None):
         # For each rule, generate config for sym engine
-        coroutines = []
-        for rule in ei["rules"]:
-            rtype = rule["type"]
-            if rtype not in self._sym_json_schema:
-                # logger.debug(f"no json schema for {rtype}")
-                coroutines.append(empty())
-                continue
-            if "sym" in rule:
-                # logger.debug(f"sym for {rule['rule']} already exists")
-                coroutines.append(empty())
-                continue
-            if rtype == "emit" and rule["interface"].startswith("event "):
-                verify_json_schema = self._emit_global
-            elif rtype == "assign" and rule["interface"].startswith("event"):
-                verify_json_schema = self._assign_global
-            else:
-                verify_json_schema = self._sym_json_schema[rtype]
-            erc_name = get_base_erc_name(ei["name"])
-            anchor_list = f"Possible anchor functions for StateVarSelector:\n{self._anchor_list[erc_name]}\n  ONLY use them with StateVarSelector. DO NOT use anchor functions with FnCallRetSelector(which mainly for receiver function)." if erc_name in self._anchor_list else ""
-            rule_str = rule["rule"]
-            args_str = ""
-            if "if" in rule and rule["if"] is not None:
-                if_str = rule["if"]
-                args = rule.get("args", None)
-                args_rules = json.dumps(rule.get("args", []), indent=4) if args is not None else None
-                rule_str += f" if {if_str}"
-                args_str = f"Arg rules: {args_rules}" if args_rules else "Arg rules: None"
-            prompt = f"""For '{rule['interface']}'
+        await asyncio.gather(*[self.gen_rule(ei, rule, journal) for rule in rules])
+
+    async def gen_rule(self, ei: Erc, rule: Dict, journal: StageJournal = None):
+        rtype = rule["type"]
+        if rtype not in self._sym_json_schema:
+            # logger.debug(f"no json schema for {rtype}")
+            return
+        if "sym" in rule:
+            # logger.debug(f"sym for {rule['rule']} already exists")
+            if "sym_debug" in rule:
+                llm_logger.info(f"ID=0 Label=ext_sym\nReplies=\n0:\n{rule['sym_debug']}")
+            return
+        key = json.dumps([rule["interface"], rtype, rule["rule"], rule.get("if"), rule.get("args")], sort_keys=True)
+        entry = journal.get(key) if journal else None
+        if entry is not None:
+            rule["sym"] = entry["sym"]
+            rule["sym_debug"] = entry["sym_debug"]
+            llm_logger.info(f"ID=0 Label=ext_sym\nReplies=\n0:\n{rule['sym_debug']}")
+            return
+        if rtype == "emit" and rule["interface"].startswith("event "):
+            verify_json_schema = self._emit_global
+        elif rtype == "assign" and rule["interface"].startswith("event"):
+            verify_json_schema = self._assign_global
+        else:
+            verify_json_schema = self._sym_json_schema[rtype]
+        erc_name = get_base_erc_name(ei["name"])
+        anchor_list = f"Possible anchor functions for StateVarSelector:\n{self._anchor_list[erc_name]}\n  ONLY use them with StateVarSelector. DO NOT use anchor functions with FnCallRetSelector(which mainly for receiver function)." if erc_name in self._anchor_list else ""
+        rule_str = rule["rule"]
+        args_str = ""
+        if "if" in rule and rule["if"] is not None:
+            if_str = rule["if"]
+            args = rule.get("args", None)
+            args_rules = json.dumps(rule.get("args", []), indent=4) if args is not None else None
+            rule_str += f" if {if_str}"
+            args_str = f"Arg rules: {args_rules}" if args_rules else "Arg rules: None"
+        prompt = f"""For '{rule['interface']}'
 rule: {rule_str}
 {args_str}
 By using the following json schema of the configuration for the rule verification:
@@ -78,40 +91,31 @@ By using the following json schema of the configuration for the rule verificatio
 {anchor_list}
 Generate the verify json for the rule.{"" if args_str else "Do not generate arg verifiers if there is no arg rule."}
 """
-            
-            llm_logger.info(f"ID=0 Label=ext_sym\nPrompt=\n{prompt}")
-            coroutine = self._openai.chat.completions.create(
-                messages=[
-                    {
-                        "content": prompt,
-                        "role": "user",
-                    }
-                ],
-                model="gpt-5",
-                reasoning_effort="high",
-                #response_format={"type": "json_object" }
-            )
-            coroutines.append(coroutine)
-            
-        results = await asyncio.gather(*coroutines)
         
-        for (res, rule) in zip(results, ei["rules"]):
-            if "sym_debug" in rule:
-                llm_logger.info(f"ID=0 Label=ext_sym\nReplies=\n0:\n{rule["sym_debug"]}")
-            if res is None:
-                continue
-            res_text = res.choices[0].message.content
-
-            try:
-                rule["sym"] = json.loads(trim_json_markers(res_text))
-                if rule["type"] == "assign" and rule["interface"].startswith("event"):
-                    rule["sym"]["event"] = rule["interface"].split(" ")[1].split("(")[0]
-            except Exception as e:
-                rule["sym"] = None
-               
-            rule["sym_debug"] = res_text
-            logger.debug(f"sym for {rule['rule']} is {rule['sym']}")
-            
-
-        return ei
+        llm_logger.info(f"ID=0 Label=ext_sym\nPrompt=\n{prompt}")
+        res_text = await self._completions.create(
+            messages=[
+                {
+                    "content": prompt,
+                    "role": "user",
+                }
+            ],
+            model="gpt-5",
+            reasoning_effort="high",
+            label="ext_sym",
+            #response_format={"type": "json_object" }
+        )
+        if res_text is None:
+            return
 
+        try:
+            rule["sym"] = json.loads(trim_json_markers(res_text))
+            if rule["type"] == "assign" and rule["interface"].startswith("event"):
+                rule["sym"]["event"] = rule["interface"].split(" ")[1].split("(")[0]
+        except Exception as e:
+            rule["sym"] = None
+           
+        rule["sym_debug"] = res_text
+        logger.debug(f"sym for {rule['rule']} is {rule['sym']}")
+        if journal:
+            journal.append(key, {"sym": rule["sym"], "sym_debug": res_text})
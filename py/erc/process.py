@@ -3,6 +3,7 @@ from erc.pipeline import ErcPipelineManager
 from erc.pipelines.extract_rule import ExtractRule
 from erc.pipelines.gen_sym import GenSym
 from erc.pre import preprocess
+from llm.dedupe import DedupedCompletions
 import asyncio
 import os
 import json
@@ -11,7 +12,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-async def process_erc(erc_file:str, out_dir:str, cache_dir:str=None, preprocess_only = False):
+async def process_erc(erc_file:str, out_dir:str, cache_dir:str=None, preprocess_only = False, completions:DedupedCompletions = None):
     try:
         with open(erc_file, "r") as f:
             erc_str = f.read()
@@ -28,11 +29,11 @@ async def process_erc(erc_file:str, out_dir:str, cache_dir:str=None, preprocess_
         
         if preprocess_only:
             return
-        client = AsyncOpenAI(
-        )
+        if completions is None:
+            completions = DedupedCompletions(AsyncOpenAI())
         ppl_manager = ErcPipelineManager([
-            ExtractRule(client, erc_str),
-            GenSym(client)
+            ExtractRule(completions, erc_str),
+            GenSym(completions)
         ])
         
         results = await asyncio.gather(*[ppl_manager.run(erc_obj, cache_dir, erc_filename) for erc_obj in erc_objs])
@@ -3,7 +3,9 @@ import json
 import os
 from typing import List
 import openai
+import time
 import uuid
+from llm import metrics
 from log import get_private_file_logger
 
 llm_logger = get_private_file_logger("llm.log")
@@ -39,14 +41,19 @@ class OpenAILLMAdapter(LLMAdapter):
             prompts_str += f"{p['role']}:\n{p['content']}\n"
         llm_logger.info(f"ID={id} Label={log_label}\nPrompt=\n{prompts_str}")
         model = model if model else self._model
-        response = self._client.chat.completions.create(
+        start = time.monotonic()
+        raw = self._client.chat.completions.with_raw_response.create(
             model=model,
             temperature=temperature if not model.startswith("gpt-5") else 1, 
             n=n,
             messages=prompts
         )
+        response = raw.parse()
+        latency = time.monotonic() - start
         
         replies = [choice.message.content for choice in response.choices]
+        prompt_tokens, completion_tokens = metrics.count_tokens(response, prompts, replies)
+        metrics.record(log_label, model, prompt_tokens, completion_tokens, latency, retries=raw.retries_taken)
         replies_str = ""
         for idx, r in enumerate(replies):
             replies_str += f"{idx}:\n{r}\n"
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict
+from openai import AsyncOpenAI
+from llm import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DedupedCompletions:
+    def __init__(self, openai: AsyncOpenAI, store_path: str = None) -> None:
+        """Chat completions where every unique request is only sent once
+
+        Identical requests that are in flight at the same time share one future,
+        and finished requests are appended to the store so later runs reuse them.
+
+        Args:
+            openai (AsyncOpenAI): openai client
+            store_path (str, optional): JSONL file of finished requests. Defaults to None(in memory only).
+        """
+        self._openai = openai
+        self._store_path = store_path
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._done: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        if store_path and os.path.exists(store_path):
+            with open(store_path, "r") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line can be partially written if the run was interrupted
+                        continue
+                    self._done[item["key"]] = item["content"]
+            logger.debug(f"loaded {len(self._done)} completions from {store_path}")
+
+    @staticmethod
+    def key(**kwargs) -> str:
+        return hashlib.sha256(json.dumps(kwargs, sort_keys=True).encode()).hexdigest()
+
+    def _save(self, key: str, content: str):
+        self._done[key] = content
+        if not self._store_path:
+            return
+        os.makedirs(os.path.dirname(self._store_path) or ".", exist_ok=True)
+        with open(self._store_path, "a") as f:
+            f.write(json.dumps({"key": key, "content": content}) + "\n")
+
+    async def create(self, label: str = None, **kwargs) -> str:
+        """Same arguments as `chat.completions.create`, returns the content of the first choice
+
+        Args:
+            label (str, optional): stage of the request in the LLM metrics, not part of the request.
+        """
+        key = self.key(**kwargs)
+        model = kwargs.get("model")
+        if key in self._done:
+            self.hits += 1
+            metrics.record(label, model, 0, 0, 0, cache="hit")
+            return self._done[key]
+        if key in self._inflight:
+            self.hits += 1
+            metrics.record(label, model, 0, 0, 0, cache="hit")
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            start = time.monotonic()
+            raw = await self._openai.chat.completions.with_raw_response.create(**kwargs)
+            res = raw.parse()
+            latency = time.monotonic() - start
+            content = res.choices[0].message.content
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as ex:
+            fut.set_exception(ex)
+            # waiters (if any) get the exception, avoid "exception never retrieved"
+            fut.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        prompt_tokens, completion_tokens = metrics.count_tokens(res, kwargs.get("messages", []), [content])
+        metrics.record(label, model, prompt_tokens, completion_tokens, latency, retries=raw.retries_taken)
+        self._save(key, content)
+        fut.set_result(content)
+        return content
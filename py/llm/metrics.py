@@ -0,0 +1,131 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from llm.utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# one JSON object per LLM request, next to llm.log by default
+METRICS_FILE = os.environ.get("LLM_METRICS_FILE", "llm_metrics.jsonl")
+
+# ERC of the requests sent in the current thread/task, see `erc_scope`
+current_erc: ContextVar[Optional[str]] = ContextVar("current_erc", default=None)
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def erc_scope(erc: str):
+    """Attribute the LLM requests sent inside the block to the given ERC"""
+    token = current_erc.set(str(erc) if erc is not None else None)
+    try:
+        yield
+    finally:
+        current_erc.reset(token)
+
+
+def count_tokens(response, messages: List[Dict], replies: List[str]):
+    """(prompt tokens, completion tokens) reported by the API,
+    estimated locally if the response has no usage."""
+    usage = getattr(response, "usage", None)
+    if usage is not None and usage.prompt_tokens is not None:
+        return usage.prompt_tokens, usage.completion_tokens or 0
+    prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+    return prompt_tokens, sum(estimate_tokens(r or "") for r in replies)
+
+
+def record(stage: str, model: str, prompt_tokens: int, completion_tokens: int,
+           latency: float, retries: int = 0, cache: str = "miss", erc: str = None):
+    """Append the metrics of one LLM request to METRICS_FILE
+
+    Args:
+        stage (str): label of the request, ex. "ext_fn_throw", "ext_sym"
+        model (str): model name
+        prompt_tokens (int): tokens of the prompt
+        completion_tokens (int): tokens of all the replies
+        latency (float): seconds until the replies are received, 0 on cache hits
+        retries (int, optional): retries taken by the client. Defaults to 0.
+        cache (str, optional): "hit" or "miss". Defaults to "miss".
+        erc (str, optional): Defaults to the ERC of the current `erc_scope`.
+    """
+    item = {
+        "ts": time.time(),
+        "stage": stage or "unknown",
+        "erc": erc if erc is not None else current_erc.get(),
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "latency": round(latency, 3),
+        "retries": retries,
+        "cache": cache,
+    }
+    try:
+        with _lock, open(METRICS_FILE, "a") as f:
+            f.write(json.dumps(item) + "\n")
+    except OSError as ex:
+        # metrics must never break the request itself
+        logger.warning(f"failed to write LLM metrics to {METRICS_FILE}: {ex}")
+
+
+def load(path: str = None) -> List[Dict]:
+    items = []
+    with open(path or METRICS_FILE, "r") as f:
+        for line in f:
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return items
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile, p in [0, 100]"""
+    if not values:
+        return 0
+    values = sorted(values)
+    idx = max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))
+    return values[idx]
+
+
+def summarize(items: List[Dict], by: str = "stage") -> Dict[str, Dict]:
+    """Aggregate request metrics by "stage" or "erc".
+    Latency percentiles only count the requests actually sent(cache misses)."""
+    groups = defaultdict(list)
+    for item in items:
+        groups[str(item.get(by))].append(item)
+
+    summary = {}
+    for name, group in sorted(groups.items()):
+        sent = [i for i in group if i.get("cache") != "hit"]
+        latencies = [i["latency"] for i in sent]
+        summary[name] = {
+            "requests": len(group),
+            "cache_hits": len(group) - len(sent),
+            "retries": sum(i.get("retries", 0) for i in sent),
+            "prompt_tokens": sum(i["prompt_tokens"] for i in sent),
+            "completion_tokens": sum(i["completion_tokens"] for i in sent),
+            "p50_latency": percentile(latencies, 50),
+            "p95_latency": percentile(latencies, 95),
+            "total_latency": sum(latencies),
+        }
+    return summary
+
+
+def format_summary(summary: Dict[str, Dict], by: str = "stage") -> str:
+    header = f"{by:<32} {'reqs':>6} {'hits':>6} {'retry':>6} {'prompt_tok':>11} {'compl_tok':>10} {'p50(s)':>8} {'p95(s)':>8} {'total(s)':>9}"
+    lines = [header, "-" * len(header)]
+    for name, s in summary.items():
+        lines.append(
+            f"{name:<32} {s['requests']:>6} {s['cache_hits']:>6} {s['retries']:>6} "
+            f"{s['prompt_tokens']:>11} {s['completion_tokens']:>10} "
+            f"{s['p50_latency']:>8.2f} {s['p95_latency']:>8.2f} {s['total_latency']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -1,9 +1,11 @@
 
 # Define the types for the callable parameters
 from abc import ABC, abstractmethod
+import contextvars
 from dataclasses import dataclass
 import json
-from typing import Callable, List, Tuple, TypeVar, Generic
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar, Generic
 
 from llm.adapters import LLMAdapter
 from llm.utils import trim_json_markers
@@ -18,6 +20,13 @@ IsPassedFunction = Callable[[RCTX, R], bool]
 MutateFunction = Callable[[object, T, List[FB]], List[T]]
 FeedbackFunction = Callable[[object, RCTX, R], FB]
 
+# placeholder result of a run or check that raised, it counts as neither passed nor failed
+_RUN_ERROR = object()
+
+def _submit(pool:ThreadPoolExecutor, fn:Callable, *args) -> Future:
+    # pool threads do not inherit the context vars of the caller(ex. the ERC of the metrics)
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
 @dataclass
 class SelfReflectSeed:
     seed: T
@@ -46,48 +55,116 @@ class SelfReflect(ABC):
         raise NotImplementedError()
     
     
-    def self_reflect(self, initial:T, test_datas:List[RCTX], max_cycle = 3, max_llm_ask = 20) -> Tuple[T, int]:
+    def seed_key(self, seed:T) -> str:
+        return json.dumps(seed, sort_keys=True, default=str)
+
+    def _run_and_check(self, seed:T, rctx:RCTX):
+        """(result, passed) of a run, _RUN_ERROR if the result can not be checked"""
+        res = self.run(seed, rctx)
+        try:
+            return res, self.is_passed(rctx, res)
+        except Exception as err:
+            print(f"is pass error: {str(err)}")
+            return _RUN_ERROR
+
+    def _evaluate(self, pool:ThreadPoolExecutor, seeds:List[SelfReflectSeed], test_datas:List[RCTX]) -> Tuple[Optional[SelfReflectSeed], int]:
+        """Run every (seed, test) pair that is not cached yet concurrently.
+
+        Returns:
+            Tuple[Optional[SelfReflectSeed], int]: the first seed that passes every test(if any)
+            and the number of LLM asks
+        """
+        pending:Dict[Future, Tuple[str, int]] = {}
+        for seed in seeds:
+            skey = self.seed_key(seed.seed)
+            for tid, rctx in enumerate(test_datas):
+                key = (skey, tid)
+                if key in self._run_cache or key in pending.values():
+                    continue
+                pending[_submit(pool, self._run_and_check, seed.seed, rctx)] = key
+
+        def passed_all(seed:SelfReflectSeed) -> bool:
+            skey = self.seed_key(seed.seed)
+            for tid in range(len(test_datas)):
+                if (skey, tid) not in self._run_cache:
+                    return False
+                checked = self._run_cache[(skey, tid)]
+                if checked is not _RUN_ERROR and not checked[1]:
+                    return False
+            return True
+
+        ask = 0
+        for seed in seeds:
+            if passed_all(seed):
+                return seed, ask
+        for fut in as_completed(pending):
+            key = pending[fut]
+            try:
+                self._run_cache[key] = fut.result()
+                ask += 1
+            except Exception as err:
+                print(f"is pass error: {str(err)}")
+                self._run_cache[key] = _RUN_ERROR
+            for seed in seeds:
+                if self.seed_key(seed.seed) == key[0] and passed_all(seed):
+                    # early cut-off, no need to wait for the other candidates
+                    for other in pending:
+                        other.cancel()
+                    return seed, ask
+        return None, ask
+
+    def _feedbacks(self, pool:ThreadPoolExecutor, seed:SelfReflectSeed, test_datas:List[RCTX]) -> List[Future]:
+        skey = self.seed_key(seed.seed)
+        fbs = []
+        for tid, rctx in enumerate(test_datas):
+            checked = self._run_cache.get((skey, tid), _RUN_ERROR)
+            if checked is _RUN_ERROR or checked[1]:
+                continue
+            res = checked[0]
+            if (skey, tid) not in self._feedback_cache:
+                self._feedback_cache[(skey, tid)] = _submit(pool, self.feedback, rctx, res)
+            fbs.append(self._feedback_cache[(skey, tid)])
+        return fbs
+
+    def self_reflect(self, initial:T, test_datas:List[RCTX], max_cycle = 3, max_llm_ask = 20, max_workers = 8) -> Tuple[T, int]:
         cycle = 0
         ask = 0
         seeds:List[SelfReflectSeed] = [SelfReflectSeed(seed=initial, num_of_passed=0)]
-
-        while True:
-            if cycle >= max_cycle:
-                break
-            if ask >= max_llm_ask:
-                break
-
-            interesting_seeds_to_add = []
-            for seed in seeds:
-                fbs = []
-                not_passed_cnt = 0
-                for rctx in test_datas:
-                    try:
-                        run = self.run(seed.seed, rctx)
-                        ask += 1
-                        if self.is_passed(rctx, run):
-                            continue
-                    except Exception as err:
-                        print(f"is pass error: {str(err)}")
-                        continue
-                    not_passed_cnt += 1
-                    feedback = self.feedback(rctx, run)
-                    fbs.append(feedback)
-                
-                if not_passed_cnt == 0:
-                    seed.num_of_passed = len(test_datas)
-                    return seed.seed, seed.num_of_passed
-
-                print(f"{not_passed_cnt}/{len(test_datas)} not passed")
-                seed.num_of_passed = len(test_datas) - not_passed_cnt
-                
-
-                new_seeds = self.mutate(seed.seed, fbs)
-                interesting_seeds_to_add.extend([SelfReflectSeed(seed=new_seed, num_of_passed=0) for new_seed in new_seeds])
-
-            if interesting_seeds_to_add:
-                seeds = interesting_seeds_to_add + seeds
-            cycle += 1
+        # (seed, test index) => (result of run, passed), shared by repeated seeds
+        self._run_cache:Dict[Tuple[str, int], Tuple[R, bool]] = {}
+        self._feedback_cache:Dict[Tuple[str, int], Future] = {}
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while True:
+                if cycle >= max_cycle:
+                    break
+                if ask >= max_llm_ask:
+                    break
+
+                passed, cycle_ask = self._evaluate(pool, seeds, test_datas)
+                ask += cycle_ask
+                if passed is not None:
+                    passed.num_of_passed = len(test_datas)
+                    return passed.seed, passed.num_of_passed
+
+                seed_fbs = []
+                for seed in seeds:
+                    fbs = self._feedbacks(pool, seed, test_datas)
+                    print(f"{len(fbs)}/{len(test_datas)} not passed")
+                    seed.num_of_passed = len(test_datas) - len(fbs)
+                    seed_fbs.append((seed, fbs))
+
+                mutations = [_submit(pool, self.mutate, seed.seed, [fb.result() for fb in fbs]) for seed, fbs in seed_fbs]
+                interesting_seeds_to_add = []
+                for mutation in mutations:
+                    interesting_seeds_to_add.extend([SelfReflectSeed(seed=new_seed, num_of_passed=0) for new_seed in mutation.result()])
+
+                if interesting_seeds_to_add:
+                    seeds = interesting_seeds_to_add + seeds
+                cycle += 1
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
         seeds.sort(key=lambda s:s.num_of_passed,reverse=True)
         return seeds[0].seed, seeds[0].num_of_passed
 
@@ -1,3 +1,5 @@
+import re
+
 def trim_json_markers(input_str: str) -> str:
     start_marker = "json```"
     alt_start_marker = "```json"
@@ -34,4 +36,20 @@ def trim_json_markers(input_str: str) -> str:
         if line.find("//") != -1:
             lines[idx] = line[:line.find("//")]
     input_str = "\n".join(lines)
-    return input_str
\ No newline at end of file
+    return input_str
+
+_token_re = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """Rough local estimate of the number of BPE tokens in text.
+
+    Every punctuation character counts as one token and every word
+    counts as one token per 4 characters, which is close enough to
+    the OpenAI tokenizers on Solidity code and ERC documents.
+    """
+    if not text:
+        return 0
+    cnt = 0
+    for m in _token_re.finditer(text):
+        cnt += (len(m.group(0)) + 3) // 4
+    return cnt
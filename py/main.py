@@ -10,6 +10,9 @@ import asyncio
 import click
 from erc.process import process_erc
 from llm.adapters import OpenAILLMAdapter
+from llm.dedupe import DedupedCompletions
+from llm import metrics as llm_metrics
+from openai import AsyncOpenAI
 import os
 
 import warnings
@@ -29,28 +32,75 @@ def main():
 @click.option("--out-dir")
 @click.option("--no-cache", is_flag=True, default=False)
 @click.option("--pre-only", is_flag=True, default=False)
-def erc(erc_files: List[str], out_dir: str, no_cache: bool, pre_only: bool):
+@click.option("--prompt-store", default=".cache/prompts.jsonl", show_default=True,
+              help="finished LLM requests shared across runs, not affected by --no-cache")
+def erc(erc_files: List[str], out_dir: str, no_cache: bool, pre_only: bool, prompt_store: str):
     logger.debug(
         f"extracting erc from {erc_files}, out='{out_dir}'"
-        f" no-cache='{no_cache}' pre-only={pre_only}"
+        f" no-cache='{no_cache}' pre-only={pre_only} prompt-store='{prompt_store}'"
     )
+    # shared by all ERC files so identical prompts are only sent once
+    completions = None if pre_only else DedupedCompletions(AsyncOpenAI(), prompt_store if prompt_store else None)
     tasks = []
     for erc_file in erc_files:
         output_dir = out_dir if out_dir else os.path.dirname(erc_file)
         cache_dir = None if no_cache else os.path.join(output_dir, ".cache")
-        os.makedirs(cache_dir, exist_ok=True)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
         os.makedirs(output_dir, exist_ok=True)
         tasks.append(
-            process_erc(erc_file, output_dir, cache_dir, preprocess_only=pre_only)
+            process_erc(erc_file, output_dir, cache_dir, preprocess_only=pre_only, completions=completions)
         )
 
     async def process_all():
         return await asyncio.gather(*tasks)
 
     asyncio.run(process_all())
+    if completions is not None:
+        logger.info(f"LLM requests: {completions.misses} sent, {completions.hits} deduplicated")
     
 
     
+@main.command()
+@click.argument("metrics_file", default=llm_metrics.METRICS_FILE, type=click.Path(exists=True))
+@click.option("--by", type=click.Choice(["stage", "erc"]), multiple=True, default=["stage", "erc"], show_default=True)
+def metrics(metrics_file: str, by: List[str]):
+    """Summarize latency and tokens of the LLM requests"""
+    items = llm_metrics.load(metrics_file)
+    print(f"{len(items)} LLM requests in {metrics_file}")
+    for key in by:
+        print()
+        print(llm_metrics.format_summary(llm_metrics.summarize(items, by=key), by=key))
+
+
+@main.command()
+@click.argument("json_file_or_dir", type=click.Path(exists=True))
+@click.option("--format", "print_format", type=click.Choice(["csv", "text"]), default="text")
+@click.option("--unverified-only", is_flag=True, default=False)
+@click.option("--verbose", is_flag=True, default=False)
+@click.option("--only-erc", multiple=True, default=None)
+@click.option("--warehouse", default=None, help="SQLite store of the ingested reports, only new reports are parsed")
+def view(json_file_or_dir: str, print_format: str, unverified_only: bool, verbose: bool, only_erc: List[str], warehouse: str):
+    """Print the violations of audit reports"""
+    from audit.view import view as view_reports
+    view_reports(json_file_or_dir, print_format, unverified_only, verbose, list(only_erc) or None, warehouse)
+
+
+@main.command()
+@click.argument("stream", type=click.Path(exists=True))
+@click.option("--out-dir", default="out")
+def consolidate(stream: str, out_dir: str):
+    """Write the audit reports of the records of an `audit --stream` run"""
+    from audit.report import AuditReport, consolidate as consolidate_records, load_records
+    os.makedirs(out_dir, exist_ok=True)
+    for sol_file, report in consolidate_records(load_records(stream)).items():
+        filename = os.path.basename(sol_file).split(".")[0]
+        out = os.path.join(out_dir, f"{filename}.json")
+        with open(out, "w") as f:
+            f.write(AuditReport.to_json(report, indent=4))
+        print(f"[+] {out}")
+
+
 @main.command()
 @click.argument("sol_file_or_dirs", nargs=-1, type=click.Path(exists=True))
 @click.option("--out-dir", default="out")
@@ -66,6 +116,8 @@ def erc(erc_files: List[str], out_dir: str, no_cache: bool, pre_only: bool):
 @click.option("--only-rtype", type=click.Choice(["throw", "call", "return","emit","assign", "interface","order"]),  multiple=True, default=None)
 @click.option("--only-rule", type=click.STRING, multiple=True, default=None)
 @click.option("--erc-spec", type=click.STRING, default=None)
+@click.option("--token-budget", type=int, default=None, help="max prompt tokens for --mode llm")
+@click.option("--stream", default=None, help="NDJSON file of the verified rules for --mode sym, rules in it are not verified again")
 def audit(
     sol_file_or_dirs: str,
     out_dir: str,
@@ -80,7 +132,9 @@ def audit(
     only_erc: List[str],
     only_rtype: List[str],
     only_rule: List[str],
-    erc_spec: str = None
+    erc_spec: str = None,
+    token_budget: int = None,
+    stream: str = None
 ):
 
     def parse_cname2ercs(input_str):
@@ -153,12 +207,13 @@ def audit(
                     filter_erc=only_erc,
                     filter_rtype=only_rtype,
                     constraintsllmaudit=mode == "constraintsllmaudit",
-                    erc_spec=erc_spec
+                    erc_spec=erc_spec,
+                    stream=stream
                 )
             logger.info(f"finish auditing {len(sol_file_or_dirs)} files")
 
     elif mode == "llm":
-        auditor = FullLLMERCAuditor(OpenAILLMAdapter(model=model))
+        auditor = FullLLMERCAuditor(OpenAILLMAdapter(model=model), token_budget=token_budget)
         for sol_file_or_dir in sol_file_or_dirs:
             auditor.process(sol_file_or_dir, out_dir, 
                             skip_if_exists=True, 
@@ -1,13 +1,111 @@
-from typing import Dict
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Dict, Optional
 from solidity_parser import parser
 import logging
 logger = logging.getLogger(__name__)
 
+
+class SolAstCache:
+    def __init__(self, maxsize: int = 256, cache_dir: str = None) -> None:
+        """Parse-once cache of solidity_parser ASTs keyed by the hash of the source code
+
+        The ANTLR parser is pure python and takes seconds on large files, so every
+        source is parsed once and shared. Returned ASTs are shared as well,
+        callers must not modify them.
+
+        Args:
+            maxsize (int, optional): max number of ASTs kept in memory(LRU). Defaults to 256.
+            cache_dir (str, optional): directory of the zlib compressed ASTs, reused across runs.
+                Defaults to None(in memory only).
+        """
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._asts: OrderedDict[str, Dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(code: str) -> str:
+        return hashlib.sha256(code.encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.z")
+
+    def _load(self, key: str) -> Optional[Dict]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return json.loads(zlib.decompress(f.read()))
+        except (OSError, zlib.error, json.JSONDecodeError) as ex:
+            logger.debug(f"ignore broken ast cache {path}: {ex}")
+            return None
+
+    def _dump(self, key: str, ast: Dict):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(json.dumps(ast, separators=(",", ":")).encode()))
+        os.replace(tmp, path)
+
+    def _put(self, key: str, ast: Dict):
+        with self._lock:
+            self._asts[key] = ast
+            self._asts.move_to_end(key)
+            while len(self._asts) > self.maxsize:
+                self._asts.popitem(last=False)
+
+    def parse(self, code: str) -> Dict:
+        """Same as `parser.parse(code, loc=True)`, raises if the code can not be parsed"""
+        key = self.key(code)
+        with self._lock:
+            ast = self._asts.get(key)
+            if ast is not None:
+                self._asts.move_to_end(key)
+                self.hits += 1
+                return ast
+            self.misses += 1
+
+        ast = self._load(key)
+        if ast is None:
+            ast = parser.parse(code, loc=True)
+            self._dump(key, ast)
+        self._put(key, ast)
+        return ast
+
+    def clear(self):
+        with self._lock:
+            self._asts.clear()
+
+
+ast_cache = SolAstCache(
+    maxsize=int(os.environ.get("SOL_AST_CACHE_SIZE", "256")),
+    cache_dir=os.environ.get("SOL_AST_CACHE_DIR") or None
+)
+
+
+def parse_sol(code: str) -> Dict:
+    """Parse solidity code with locations through the shared AST cache"""
+    return ast_cache.parse(code)
+
+
 def get_sol_ast(code: str) -> Dict:
     try:
-        return parser.parse(code, loc=True)
+        return parse_sol(code)
     except Exception as ex:
         logger.error(f'failed to get ast: {ex}.')
         logger.error(f'failed code is: {code}.')
         return None
-    
+
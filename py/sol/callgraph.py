@@ -0,0 +1,164 @@
+from collections import defaultdict
+import threading
+from typing import Dict, FrozenSet, List, Set
+from slither.core.cfg.node import Node
+from slither.core.compilation_unit import SlitherCompilationUnit
+from slither.core.declarations import Function, SolidityFunction
+from slither.slithir.operations import EventCall, HighLevelCall, InternalCall, LibraryCall, Operation
+
+
+class CallGraph:
+    def __init__(self, cu: SlitherCompilationUnit = None) -> None:
+        """Internal/library call graph of a compilation unit
+
+        Callee closures are computed once per strongly connected component,
+        so recursive and mutually recursive functions are handled and every
+        function shares the closures of its callees.
+
+        Args:
+            cu (SlitherCompilationUnit, optional): functions and modifiers of the unit are
+                added upfront so `callers` is complete. Defaults to None.
+        """
+        self._succs: Dict[Function, List[Function]] = {}
+        self._calls: Dict[Function, List[Function]] = {}
+        self._callers: Dict[Function, Set[Function]] = defaultdict(set)
+        self._closures: Dict[Function, FrozenSet[Function]] = {}
+        self._callees: Dict[Function, FrozenSet[Function]] = {}
+        self._has_require: Dict[Function, bool] = {}
+        self._call_irs: Dict[Node, List[Operation]] = {}
+        self._lock = threading.RLock()
+        if cu is not None:
+            for f in cu.functions_and_modifiers:
+                self.successors(f)
+
+    def successors(self, f: Function) -> List[Function]:
+        """Functions directly called by f(internal, library and modifier calls)"""
+        succs = self._succs.get(f)
+        if succs is not None:
+            return succs
+        calls = []
+        modifiers = []
+        if not isinstance(f, SolidityFunction):
+            calls.extend(f.internal_calls)
+            calls.extend(c[1] for c in f.library_calls)
+            if getattr(f, "is_constructor", False):
+                calls.extend(f.contract.constructors)
+            modifiers.extend(m for m in f.modifiers if isinstance(m, Function))
+        calls = list(dict.fromkeys(s for s in calls if s is not None))
+        succs = list(dict.fromkeys(calls + modifiers))
+        for s in succs:
+            self._callers[s].add(f)
+        self._calls[f] = calls
+        self._succs[f] = succs
+        return succs
+
+    def callers(self, f: Function) -> Set[Function]:
+        """Functions directly calling f"""
+        return self._callers.get(f, set())
+
+    def closure(self, f: Function) -> FrozenSet[Function]:
+        """f and every function transitively called by f"""
+        closure = self._closures.get(f)
+        if closure is None:
+            with self._lock:
+                if f not in self._closures:
+                    self._compute_closures(f)
+                closure = self._closures[f]
+        return closure
+
+    def callees(self, f: Function) -> FrozenSet[Function]:
+        """f and every function transitively called by f, as `find_all_callees`
+        always returned them: the calls inside modifiers are followed, the
+        modifiers themselves are only part of it when they are called"""
+        callees = self._callees.get(f)
+        if callees is None:
+            callees = {f}
+            for g in self.closure(f):
+                callees.update(self._calls[g])
+            callees = frozenset(callees)
+            self._callees[f] = callees
+        return callees
+
+    def _compute_closures(self, root: Function):
+        # iterative Tarjan, an SCC is finished after all the SCCs it calls
+        index: Dict[Function, int] = {root: 0}
+        low: Dict[Function, int] = {root: 0}
+        stack = [root]
+        on_stack = {root}
+        work = [(root, iter(self.successors(root)))]
+        while work:
+            v, it = work[-1]
+            for w in it:
+                if w in self._closures:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(self.successors(w))))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] != index[v]:
+                    continue
+                scc = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    scc.append(w)
+                    if w is v:
+                        break
+                closure = set(scc)
+                for w in scc:
+                    for s in self.successors(w):
+                        if s not in closure:
+                            closure |= self._closures[s]
+                closure = frozenset(closure)
+                for w in scc:
+                    self._closures[w] = closure
+
+    def may_require(self, f: Function) -> bool:
+        """Whether f or any of its callees has a require/assert node"""
+        for g in self.closure(f):
+            has_require = self._has_require.get(g)
+            if has_require is None:
+                has_require = not isinstance(g, SolidityFunction) and \
+                    any(node.contains_require_or_assert() for node in g.nodes)
+                self._has_require[g] = has_require
+            if has_require:
+                return True
+        return False
+
+    def call_irs(self, node: Node) -> List[Operation]:
+        """Event, high level, internal and library call IRs of the node"""
+        irs = self._call_irs.get(node)
+        if irs is None:
+            irs = []
+            if node.calls_as_expression:
+                irs = [ir for ir in node.irs if isinstance(ir, (EventCall, HighLevelCall, InternalCall, LibraryCall))]
+            self._call_irs[node] = irs
+        return irs
+
+
+_graphs_lock = threading.Lock()
+
+def get_call_graph(f: Function) -> CallGraph:
+    """Call graph of the compilation unit of f, built once and shared
+
+    The graph is kept on the unit itself, it is released with the unit.
+    """
+    cu = getattr(f, "compilation_unit", None)
+    if cu is None:
+        # ex. solidity functions, not part of any unit
+        return CallGraph()
+    with _graphs_lock:
+        graph = getattr(cu, "_call_graph", None)
+        if graph is None:
+            graph = CallGraph(cu)
+            cu._call_graph = graph
+    return graph
@@ -1,12 +1,65 @@
 
+from collections.abc import ItemsView, ValuesView
 from dataclasses import dataclass
-from typing import Dict, List
-from slither.core.declarations import Contract
+from typing import Callable, Dict, List
+from slither.core.declarations import Contract, FunctionContract
 
 from audit.utils import find_all_callees, get_functions_to_check, is_function_overrided_by_state_variable, slithir_funcs_to_text
 from sol.utils import get_public_state_var_sigs
 
 
+class LazyFunc2Str(dict):
+    """function signature => sliced code, every slice is computed on first access
+
+    Keys are known upfront, so membership, len and iteration over the keys
+    do not compute any slice.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending: Dict[str, Callable[[], str]] = {}
+
+    def set_lazy(self, key: str, compute: Callable[[], str]):
+        super().__setitem__(key, None)
+        self._pending[key] = compute
+
+    def __getitem__(self, key):
+        if key in self._pending:
+            super().__setitem__(key, self._pending[key]())
+            del self._pending[key]
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._pending.pop(key, None)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._pending.pop(key, None)
+        super().__delitem__(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        # not dict's own iterator, so dict(d), {**d} and update(d) go through
+        # keys() and __getitem__ instead of copying the unread slices as None
+        return super().__iter__()
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
+
 @dataclass
 class ContractMetadata:
     events: List
@@ -25,8 +78,16 @@ def get_contract_metadata(c: Contract, ercs:List[str], clines: List[str], select
             name=c.name,
             state_var_sigs = get_public_state_var_sigs(c)
         )
+    if not no_func_slice:
+        cmeta.func2str = LazyFunc2Str()
     funcs = get_functions_to_check(c)
 
+    def slice_fn(f: FunctionContract) -> Callable[[], str]:
+        def compute() -> str:
+            explored = find_all_callees({f})
+            return slithir_funcs_to_text(explored, clines, True, False, True, True)
+        return compute
+
     sliced_fn = set()
     # slice each function
     for f in funcs:
@@ -39,13 +100,6 @@ def get_contract_metadata(c: Contract, ercs:List[str], clines: List[str], select
             # simply give up
             continue
         
-        if not no_func_slice:
-            to_explore = set()
-            to_explore.add(f)
-            explored = find_all_callees(to_explore)
-            text = slithir_funcs_to_text(explored, clines, True, False, True, True)
-        
-
         if f.full_name in sliced_fn:
             if f.contract_declarer == f.contract:
                 # should override
@@ -54,7 +108,8 @@ def get_contract_metadata(c: Contract, ercs:List[str], clines: List[str], select
                 
                 continue
         if not no_func_slice:
-            cmeta.func2str[f.signature_str] = text
+            # sliced on first access, most of the functions are never read
+            cmeta.func2str.set_lazy(f.signature_str, slice_fn(f))
         cmeta.func2attrs[f.signature_str] = {
             "is_view": f.view,
             "is_pure": f.pure,
@@ -1,5 +1,6 @@
 import collections
-from typing import Dict, List
+import zlib
+from typing import Dict, List, Set
 from solidity_parser import parser
 import zss
 
@@ -79,6 +80,56 @@ def num_of_children(node) -> int:
     
 
 
-def diversity(source_unit: Dict, source_units: List[Dict]):
-    distances = [zss_distance(source_unit, su) for su in source_units]
+_MAX_FEATURE = (1 << 31) - 1
+
+def pq_grams(source_unit: Dict, p: int = 2, q: int = 3) -> Set[int]:
+    """pq-gram profile of the tree, as a set of hashed grams
+
+    Every gram is the labels of a node's p ancestors(itself included) and of q
+    consecutive children. Repeated grams are numbered so the set keeps the
+    multiplicity of the profile. Labels are the same as the ones zss compares.
+    """
+    profile = collections.Counter()
+    # (node, labels of the p-1 ancestors above it)
+    to_explore = [(source_unit, ("*",) * (p - 1))]
+    while to_explore:
+        node, ancestors = to_explore.pop()
+        stem = ancestors + (node_label(node),)
+        child_nodes = [c for c in children(node) if c is not None]
+        if not child_nodes:
+            profile[stem + ("*",) * q] += 1
+            continue
+        base = ("*",) * (q - 1)
+        labels = base + tuple(node_label(c) for c in child_nodes) + base
+        for i in range(len(labels) - q + 1):
+            profile[stem + labels[i:i + q]] += 1
+        for c in child_nodes:
+            to_explore.append((c, stem[1:]))
+
+    features = set()
+    for gram, cnt in profile.items():
+        gram_str = "|".join(gram)
+        for i in range(cnt):
+            # stable across processes, unlike hash()
+            features.add(zlib.crc32(f"{gram_str}#{i}".encode()) & _MAX_FEATURE)
+    return features
+
+
+def jaccard_distance(features1: Set[int], features2: Set[int]) -> float:
+    if not features1 and not features2:
+        return 0
+    return 1 - len(features1 & features2) / len(features1 | features2)
+
+
+def ast_distance(source_unit1: Dict, source_unit2: Dict) -> float:
+    """pq-gram distance in [0, 1], linear approximation of `zss_distance`"""
+    return jaccard_distance(pq_grams(source_unit1), pq_grams(source_unit2))
+
+
+def diversity(source_unit: Dict, source_units: List[Dict], exact: bool = True):
+    if exact:
+        distances = [zss_distance(source_unit, su) for su in source_units]
+    else:
+        features = pq_grams(source_unit)
+        distances = [jaccard_distance(features, pq_grams(su)) for su in source_units]
     print(distances)
\ No newline at end of file
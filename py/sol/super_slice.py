@@ -1,6 +1,9 @@
-from typing import Dict, List, Set
-from solidity_parser import parser
+import bisect
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from sol.ast import parse_sol
 import json
+import threading
 import logging
 logger = logging.getLogger(__name__)
 
@@ -39,41 +42,92 @@ def complete_multiline_statements(code_lines: List[str], lines_need: Set[int]):
                 i += 1
     [lines_need.add(i) for i in new_added_lines]
 
+class SourceUnitIndex:
+    def __init__(self, su: Dict) -> None:
+        """One-time index of a parsed source unit for the lookups of super_slice
+
+        Functions are kept in the visiting order of the former stack walk,
+        so lookups return the same candidates in the same order.
+
+        Args:
+            su (Dict): Output of solidity_parser's parser
+        """
+        # function name => [(function node, contract name or None for free functions)]
+        self.name2fns: Dict[str, List[Tuple[Dict, Optional[str]]]] = {}
+        # (function name, number of parameters) => function nodes, call edges of a call site
+        self.callees: Dict[Tuple[str, int], List[Dict]] = {}
+        self._contract_fn: Dict[Tuple[str, str], Optional[Dict]] = {}
+        contracts = []
+
+        children = su.get("children", []) if su["type"] == "SourceUnit" else [su]
+        for idx, node in enumerate(reversed(children)):
+            node_type = node["type"]
+            if node_type == "FunctionDefinition":
+                self._add_fn(node, None)
+            elif node_type == "ContractDefinition":
+                # later children were visited first
+                contracts.append((node["loc"]["start"]["line"], -idx, node))
+                for sub in reversed(node.get("subNodes", [])):
+                    if sub["type"] == "FunctionDefinition":
+                        self._add_fn(sub, node["name"])
+
+        # contracts sorted by start line, an interval index over their line ranges
+        contracts.sort(key=lambda c: (c[0], c[1]))
+        self._contract_starts = [c[0] for c in contracts]
+        self._contracts = [c[2] for c in contracts]
+
+    def _add_fn(self, node: Dict, contract: Optional[str]):
+        self.name2fns.setdefault(node["name"], []).append((node, contract))
+        params = node.get("parameters", {}).get("parameters", [])
+        self.callees.setdefault((node["name"], len(params)), []).append(node)
+
+    def find_fn(self, contract: Optional[str], fn: str) -> List[Dict]:
+        candidates = self.name2fns.get(fn, [])
+        if contract is None:
+            return [node for node, _ in candidates]
+        key = (contract, fn)
+        if key not in self._contract_fn:
+            self._contract_fn[key] = next((node for node, c in candidates if c is None or c == contract), None)
+        found = self._contract_fn[key]
+        return [found] if found is not None else []
+
+    def find_callees(self, fn: str, nargs: int) -> List[Dict]:
+        return self.callees.get((fn, nargs), [])
+
+    def find_contract_of_fn(self, fn: Dict) -> Optional[Dict]:
+        # top-level contracts do not overlap, only the last one starting before fn can contain it
+        idx = bisect.bisect_right(self._contract_starts, fn["loc"]["start"]["line"]) - 1
+        if idx < 0:
+            return None
+        contract = self._contracts[idx]
+        if contract["loc"]["end"]["line"] >= fn["loc"]["end"]["line"]:
+            return contract
+        return None
+
+
+# id(source unit) => (source unit, index), the source unit is kept so its id is not reused
+_indexes: OrderedDict = OrderedDict()
+_indexes_lock = threading.Lock()
+_INDEXES_MAXSIZE = 64
+
+def get_source_unit_index(su: Dict) -> SourceUnitIndex:
+    with _indexes_lock:
+        item = _indexes.get(id(su))
+        if item is not None and item[0] is su:
+            _indexes.move_to_end(id(su))
+            return item[1]
+    index = SourceUnitIndex(su)
+    with _indexes_lock:
+        _indexes[id(su)] = (su, index)
+        while len(_indexes) > _INDEXES_MAXSIZE:
+            _indexes.popitem(last=False)
+    return index
+
 def find_fn(su, contract, fn):
-    nodes:List[Dict] = [su]
-    candidates = []
-    while nodes:
-        node = nodes.pop()
-        node_type = node["type"]
-        if node_type == "SourceUnit":
-            nodes.extend(node.get("children", []))
-        elif node_type == "FunctionDefinition":
-            if node["name"] == fn: 
-                if contract is not None:
-                    return [node]
-                else:
-                    candidates.append(node)
-        elif node_type == "ContractDefinition":
-            if contract is None:
-                nodes.extend(node.get("subNodes", []))
-            elif node["name"] == contract:
-                nodes.extend(node.get("subNodes", []))
-    return candidates
+    return get_source_unit_index(su).find_fn(contract, fn)
 
 def find_contract_of_fn(su, fn):
-    nodes:List[Dict] = [su]
-    
-    while nodes:
-        node = nodes.pop()
-        node_type = node["type"]
-        if node_type == "SourceUnit":
-            nodes.extend(node.get("children", []))
-        elif node_type == "ContractDefinition":
-            if node["loc"]["start"]["line"] <= fn["loc"]["start"]["line"] and \
-                node["loc"]["end"]["line"] >= fn["loc"]["end"]["line"]:
-                    return node
-    
-    return None
+    return get_source_unit_index(su).find_contract_of_fn(fn)
 
 def get_function_parameter_at(node, index):
     pms_node = node.get("parameters", {})
@@ -135,10 +189,8 @@ def super_slice_function(
                 if len(target_arg_ids) != 0:
                     lines_need.add(node["loc"]["start"]["line"]-1)
                     # add to fn_elms
-                    candidates = find_fn(source_unit, None, callee_name)
+                    candidates = get_source_unit_index(source_unit).find_callees(callee_name, len(callsite_args))
                     for candidate in candidates:
-                        if len(candidate["parameters"]["parameters"]) != len(callsite_args):
-                            continue
                         fn_elms.append((candidate, keywords,target_arg_ids))
                     
 
@@ -180,12 +232,10 @@ def is_target_arg(source_unit, code_lines, fn_elms, arg_node, fn_params, keyword
                     target_arg_ids.append(idx)
             if len(target_arg_ids) != 0:
                 return True
-            candidates = find_fn(source_unit, None, callee_name)
+            candidates = get_source_unit_index(source_unit).find_callees(callee_name, len(callsite_args))
             # print(f"found call={callee_name} {len(candidates)} candidates")
 
             for candidate in candidates:
-                if len(candidate["parameters"]["parameters"]) != len(callsite_args):
-                    continue
                 fn_lines = code_lines[candidate["loc"]["start"]["line"]-1:candidate["loc"]["end"]["line"]]
                 if return_target(fn_lines, keywords):
                     fn_elms.append((candidate, keywords, target_arg_ids))
@@ -237,7 +287,7 @@ def super_slice(
         raise Exception("target_fn_param_idx_list and target_keyword_list, at least one of them is required")
     
     code_lines = code_str.splitlines()
-    source_unit = parser.parse(code_str, loc=True)
+    source_unit = parse_sol(code_str)
 
     # print(json.dumps(source_unit, indent=4))
     lines_need = set()
@@ -2265,9 +2265,10 @@ def audit_by_llm_sliced(contract_path:str, to_exec: Execution, buggy:list, entry
     cmeta = get_contract_metadata(c, ercs, clines)
     logger.info(f"Contract {c.name} at {contract_path}, entrypoint: {entryfunction}")
     code = None
-    for key, value in cmeta.func2str.items():
+    for key in cmeta.func2str:
         if key.startswith(entryfunction+"("):
-            code = value
+            # only slice the entry function
+            code = cmeta.func2str[key]
             break
     if code is None:
         logger.debug(f"Cannot find entry function {entryfunction} in {contract_path}")
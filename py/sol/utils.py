@@ -1,5 +1,7 @@
 
 
+import fcntl
+import os
 import re
 import subprocess
 from typing import List, Set, Union
@@ -13,6 +15,9 @@ from slither.slithir.variables import ReferenceVariable, TemporaryVariable
 from slither.core.expressions import CallExpression
 from slither.slithir.operations import InternalCall, LibraryCall, EventCall, Operation, HighLevelCall, Assignment, Index
 from slither.core.cfg.node import Node
+from solc_select.constants import ARTIFACTS_DIR
+from solc_select.solc_select import artifact_path
+from sol.callgraph import get_call_graph
 import logging
 logger = logging.getLogger(__name__)
 
@@ -300,12 +305,58 @@ def ensure_solc_version(text: str, use_solc_ver = None) -> str:
     ret.check_returncode()
     return ver
 
+def get_solc_binary(ver: str) -> str:
+    """Path of the solc binary of the given version, installed by solc-select if missing.
+
+    Unlike `ensure_solc_version`, the global solc version is untouched,
+    so files requiring different compilers can be compiled concurrently.
+    """
+    path = artifact_path(ver)
+    if not path.exists():
+        os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+        # workers compiling in parallel may install the same version
+        with open(os.path.join(ARTIFACTS_DIR, f".install-{ver}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not path.exists():
+                ret = subprocess.run(
+                    ["solc-select", "install", ver],
+                    stdout=subprocess.DEVNULL,
+                )
+                ret.check_returncode()
+    return str(path)
+
 def compile(
     sol_file_or_dir: str,
     auto_solc=True,
-    solc_version=None
+    solc_version=None,
+    isolated_solc=False
 ) -> Tuple[str, SlitherCompilationUnit]:
-    
+    """Compile a solidity file with slither
+
+    Args:
+        sol_file_or_dir (str): Solidity file
+        auto_solc (bool, optional): pick solc version by the pragma. Defaults to True.
+        solc_version (str, optional): Defaults to None.
+        isolated_solc (bool, optional): call the solc binary of the version directly
+            instead of switching the global version by solc-select use, safe to
+            use from concurrent processes. Defaults to False.
+    """
+    if isolated_solc:
+        if not solc_version:
+            with open(sol_file_or_dir, 'r') as f:
+                solc_version = get_minmatch_solidity_version(f.read()) if auto_solc else "0.8.20"
+        if solc_version == "0.0.0":
+            solc_version = "0.8.20"
+        try:
+            slither = Slither(sol_file_or_dir, solc=get_solc_binary(solc_version))
+            return solc_version, slither.compilation_units[0]
+        except Exception as ex:
+            # see below
+            if solc_version == "0.8.0":
+                slither = Slither(sol_file_or_dir, solc=get_solc_binary("0.8.20"))
+                return "0.8.20", slither.compilation_units[0]
+            raise ex
+
     if not solc_version and auto_solc:
         with open(sol_file_or_dir, 'r') as f: 
             solc_version = ensure_solc_version(f.read())
@@ -614,11 +665,15 @@ def find_throw_nodes(initf: FunctionContract, params: List[int] = None, msg_send
     dirty_fns.add(initf)
     
     cond_callsite_lines: Dict[Operation, FunctionContract] = {}
+    graph = get_call_graph(initf)
     while len(to_explore) != 0:
         f = to_explore.pop(0)
         if f is None or f in explored:
             continue
         explored.add(f)
+        if not graph.may_require(f):
+            # neither f nor its callees can add a throw node
+            continue
         if f not in fn2cared:
             fn2cared[f] = set()
         
@@ -640,7 +695,7 @@ def find_throw_nodes(initf: FunctionContract, params: List[int] = None, msg_send
             callees:List[str] = []
             
             if node.calls_as_expression:
-                for ir in node.irs:
+                for ir in graph.call_irs(node):
                     if isinstance(ir, HighLevelCall):
                         callees.append(ir.function.name)
                     elif isinstance(ir, InternalCall) or isinstance(ir, LibraryCall):
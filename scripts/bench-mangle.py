@@ -0,0 +1,73 @@
+import sys
+sys.path.append("./py")
+import argparse
+from collections import Counter
+from glob import glob
+import os
+import random
+import re
+import time
+from typing import Dict, List
+
+from audit.utils import IdentifierRenamer, generate_random_string
+
+_word_re = re.compile(r"[A-Za-z_]\w*")
+
+
+def regex_mangle(lines: List[str], replace_map: Dict[str, str]) -> List[str]:
+    """Per variable per line re.sub, the mangling used by slithir_funcs_to_text before the renamer"""
+    out = []
+    for line in lines:
+        for key, value in replace_map.items():
+            line = re.sub(f"\\b{key}\\b", value, line)
+        out.append(line)
+    return out
+
+
+def renamer_mangle(lines: List[str], replace_map: Dict[str, str]) -> List[str]:
+    renamer = IdentifierRenamer(replace_map)
+    return [renamer.rename(line) for line in lines]
+
+
+def main(sol_files: List[str], top: int, num_vars: int, repeat: int):
+    sol_files = sorted(sol_files, key=os.path.getsize, reverse=True)[:top]
+    random.seed(0)
+    total_lines = 0
+    regex_time = 0.0
+    renamer_time = 0.0
+    for sol_file in sol_files:
+        with open(sol_file, "r") as f:
+            lines = f.read().splitlines(True)
+        # the most used identifiers, like the variables of a large slice
+        names = [n for n, _ in Counter(_word_re.findall("".join(lines))).most_common(num_vars)]
+        replace_map = {n: generate_random_string(random.randint(4, 10)) for n in names}
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            regex_mangle(lines, replace_map)
+        regex_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            renamer_mangle(lines, replace_map)
+        renamer_time += time.perf_counter() - start
+        total_lines += len(lines) * repeat
+
+    print(f"{len(sol_files)} files, {total_lines} lines, {num_vars} variables per file")
+    print(f"re.sub:   {regex_time:.3f}s, {total_lines / regex_time:,.0f} lines/s")
+    print(f"renamer:  {renamer_time:.3f}s, {total_lines / renamer_time:,.0f} lines/s")
+    print(f"speedup:  {regex_time / renamer_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark identifier mangling throughput")
+    parser.add_argument(
+        "sol_files",
+        nargs="*",
+        help="Solidity files to process (defaults to benchmark/large/*.sol)",
+    )
+    parser.add_argument("--top", type=int, default=20, help="Number of the largest files to use")
+    parser.add_argument("--vars", type=int, default=30, help="Number of variables to rename per file")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.sol_files or glob("benchmark/large/*.sol"), args.top, args.vars, args.repeat)
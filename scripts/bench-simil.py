@@ -0,0 +1,64 @@
+import sys
+sys.path.append("./py")
+import argparse
+from glob import glob
+import logging
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from sol.ast import get_sol_ast
+from sol.simil import jaccard_distance, pq_grams, zss_distance
+
+
+def functions_of(su) -> List[Dict]:
+    fns = []
+    for c in su.get("children", []):
+        if c["type"] != "ContractDefinition":
+            continue
+        for f in c.get("subNodes", []):
+            if f["type"] == "FunctionDefinition" and f.get("body"):
+                fns.append(f)
+    return fns
+
+
+def main(sol_files: List[str], max_fns: int, pairs: int):
+    logging.disable(logging.CRITICAL)
+    fns = []
+    for sol_file in sol_files:
+        with open(sol_file, "r") as f:
+            su = get_sol_ast(f.read())
+        if su is not None:
+            fns.extend(functions_of(su))
+    fns = fns[:max_fns]
+    print(f"{len(fns)} functions from {len(sol_files)} files")
+    if len(fns) < 2:
+        return
+
+    rng = np.random.RandomState(0)
+    pq_dists, zss_dists = [], []
+    pq_time, zss_time = 0.0, 0.0
+    for _ in range(pairs):
+        a, b = rng.choice(len(fns), size=2, replace=False)
+        start = time.perf_counter()
+        pq_dists.append(jaccard_distance(pq_grams(fns[a]), pq_grams(fns[b])))
+        pq_time += time.perf_counter() - start
+        start = time.perf_counter()
+        zss_dists.append(zss_distance(fns[a], fns[b]))
+        zss_time += time.perf_counter() - start
+    print(f"{pairs} pairs: pq-gram {pq_time:.3f}s, zss {zss_time:.3f}s, "
+          f"correlation {np.corrcoef(pq_dists, zss_dists)[0, 1]:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pq-gram distance against the zss distance")
+    parser.add_argument(
+        "sol_files",
+        nargs="*",
+        help="Solidity files to process (defaults to benchmark/baseline/*.sol)",
+    )
+    parser.add_argument("--max-fns", type=int, default=1000, help="Max number of functions to sample pairs from")
+    parser.add_argument("--pairs", type=int, default=300, help="Number of random function pairs compared with zss")
+    args = parser.parse_args()
+    main(args.sol_files or sorted(glob("benchmark/baseline/*.sol")), args.max_fns, args.pairs)
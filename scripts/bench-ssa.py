@@ -0,0 +1,70 @@
+import sys
+sys.path.append("./third_party/AChecker")
+import argparse
+from glob import glob
+import os
+import time
+from typing import List
+
+import src.cfg.rattle as rattle
+
+
+def read_code(bin_file: str) -> bytes:
+    with open(bin_file, "r") as f:
+        code = f.read().strip()
+    if code.startswith("0x"):
+        code = code[2:]
+    return code.encode()
+
+
+def recover(code: bytes):
+    """(seconds, peak RSS in KiB) of recovering the SSA of code in a fresh child process"""
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            rattle.Recover(code, edges=[], split_functions=False)
+        except BaseException:
+            status = 1
+        os._exit(status)
+    _, status, rusage = os.wait4(pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        return None
+    return elapsed, rusage.ru_maxrss
+
+
+def main(bin_files: List[str], top: int):
+    bin_files = sorted(bin_files, key=os.path.getsize, reverse=True)[:top]
+    _, base_rss = recover(b"00")
+    total_time = 0.0
+    max_rss = 0
+    failed = 0
+    print(f"{'file':<60} {'bytes':>8} {'time':>8} {'peak RSS':>10}")
+    for bin_file in bin_files:
+        code = read_code(bin_file)
+        result = recover(code)
+        if result is None:
+            failed += 1
+            print(f"{bin_file:<60} {len(code) // 2:>8} {'failed':>8}")
+            continue
+        elapsed, rss = result
+        total_time += elapsed
+        max_rss = max(max_rss, rss)
+        print(f"{bin_file:<60} {len(code) // 2:>8} {elapsed:>7.2f}s {rss / 1024:>7.0f} MiB")
+
+    print(f"{len(bin_files)} files, {failed} failed, {total_time:.2f}s total")
+    print(f"peak RSS: {max_rss / 1024:.0f} MiB (empty bytecode: {base_rss / 1024:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark AChecker SSA recovery time and peak memory")
+    parser.add_argument(
+        "bin_files",
+        nargs="*",
+        help="Runtime bytecode files (defaults to benchmark/baseline_bin/**/*.bin)",
+    )
+    parser.add_argument("--top", type=int, default=20, help="Number of the largest files to use")
+    args = parser.parse_args()
+    main(args.bin_files or glob("benchmark/baseline_bin/**/*.bin", recursive=True), args.top)
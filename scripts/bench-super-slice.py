@@ -0,0 +1,124 @@
+import sys
+sys.path.append("./py")
+import argparse
+from glob import glob
+import logging
+import time
+from typing import Dict, List
+
+from sol.ast import get_sol_ast
+from sol.super_slice import SourceUnitIndex, super_slice
+
+
+def walk_find_fn(su, contract, fn):
+    """Stack walk used by super_slice before the index, kept as the baseline"""
+    nodes: List[Dict] = [su]
+    candidates = []
+    while nodes:
+        node = nodes.pop()
+        node_type = node["type"]
+        if node_type == "SourceUnit":
+            nodes.extend(node.get("children", []))
+        elif node_type == "FunctionDefinition":
+            if node["name"] == fn:
+                if contract is not None:
+                    return [node]
+                else:
+                    candidates.append(node)
+        elif node_type == "ContractDefinition":
+            if contract is None or node["name"] == contract:
+                nodes.extend(node.get("subNodes", []))
+    return candidates
+
+
+def walk_find_contract_of_fn(su, fn):
+    for node in reversed(su.get("children", [])):
+        if node["type"] == "ContractDefinition" and \
+            node["loc"]["start"]["line"] <= fn["loc"]["start"]["line"] and \
+            node["loc"]["end"]["line"] >= fn["loc"]["end"]["line"]:
+            return node
+    return None
+
+
+def functions_of(su):
+    for c in su.get("children", []):
+        if c["type"] != "ContractDefinition":
+            continue
+        for f in c.get("subNodes", []):
+            if f["type"] == "FunctionDefinition" and f.get("name") and f.get("body"):
+                yield c, f
+
+
+def bench_file(sol_file: str, max_slices: int):
+    with open(sol_file, "r") as f:
+        code = f.read()
+    su = get_sol_ast(code)
+    if su is None:
+        return None
+    fns = list(functions_of(su))
+
+    start = time.perf_counter()
+    walk = [(walk_find_fn(su, None, f["name"]), walk_find_fn(su, c["name"], f["name"]), walk_find_contract_of_fn(su, f)) for c, f in fns]
+    walk_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = SourceUnitIndex(su)
+    indexed = [(index.find_fn(None, f["name"]), index.find_fn(c["name"], f["name"]), index.find_contract_of_fn(f)) for c, f in fns]
+    index_time = time.perf_counter() - start
+
+    mismatches = sum(1 for (a, b) in zip(walk, indexed)
+                     if [id(n) for n in a[0]] != [id(n) for n in b[0]] or
+                        [id(n) for n in a[1]] != [id(n) for n in b[1]] or a[2] is not b[2])
+
+    start = time.perf_counter()
+    slices = 0
+    for c, f in fns[:max_slices]:
+        params = f.get("parameters", {}).get("parameters", [])
+        try:
+            super_slice(code, c["name"], f["name"],
+                        target_fn_param_idx_list=list(range(len(params))),
+                        target_keyword_list=["msg.sender"],
+                        keep_emits=True, keep_throws=True)
+            slices += 1
+        except Exception:
+            continue
+    slice_time = time.perf_counter() - start
+    return len(fns), walk_time, index_time, mismatches, slices, slice_time
+
+
+def main(sol_files: List[str], max_slices: int):
+    logging.disable(logging.CRITICAL)
+    total = [0, 0.0, 0.0, 0, 0, 0.0]
+    parsed = 0
+    for sol_file in sol_files:
+        res = bench_file(sol_file, max_slices)
+        if res is None:
+            continue
+        parsed += 1
+        total = [t + r for t, r in zip(total, res)]
+        fns, walk_time, index_time, mismatches, slices, slice_time = res
+        print(f"{sol_file}: {fns} fns, walk {walk_time*1000:.1f}ms, index {index_time*1000:.1f}ms, "
+              f"{slices} slices in {slice_time*1000:.1f}ms{', MISMATCH ' + str(mismatches) if mismatches else ''}")
+
+    fns, walk_time, index_time, mismatches, slices, slice_time = total
+    print(f"\n{parsed}/{len(sol_files)} files parsed, {fns} functions")
+    print(f"lookups: walk {walk_time:.3f}s, index(incl. build) {index_time:.3f}s, "
+          f"speedup {walk_time / index_time if index_time else 0:.1f}x, mismatches {mismatches}")
+    print(f"super_slice: {slices} slices in {slice_time:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AST lookups of super_slice")
+    parser.add_argument(
+        "sol_files",
+        nargs="*",
+        help="Solidity files to process (defaults to benchmark/large/*.sol)",
+    )
+    parser.add_argument(
+        "--max-slices",
+        type=int,
+        default=20,
+        help="Max number of functions to super slice per file",
+    )
+    args = parser.parse_args()
+    main(args.sol_files or sorted(glob("benchmark/large/*.sol")), args.max_slices)
@@ -17,7 +17,7 @@ for file in ./benchmark/baseline_bin/**/*.bin; do
         continue
     fi
 
-    timeout 30m python third_party/AChecker/bin/achecker.py -f "$file" -b > "$OUTPUT_FILE" 2>&1
+    timeout 30m python third_party/AChecker/bin/achecker.py -f "$file" -b --cache-dir ./local/achecker/.artifacts > "$OUTPUT_FILE" 2>&1
 
     # Check if timeout occurred
     if [ $? -eq 124 ]; then
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
+import contextlib
+import io
 import json
 import logging
+import multiprocessing
 import resource
+import signal
 import sys
+import time
 import argparse
 import subprocess
 import os
 import shlex
 import re
+import multiprocessing.connection
 from collections import deque
+from src.artifacts import Artifacts, ArtifactStore, code_hash
 from src.project import Project
 from src.cfg import opcodes
 from src.slicing import interesting_slices, slice_to_program
@@ -74,285 +81,551 @@ def get_evm(contract):
     #    return extract_bin_str(out)
     return extract_bin_str(out)
 
-def analysis(p, initial_storage=dict(), sym_validation= None,
-                    mode=None, initial_balance=None,
-                    max_calls=3, controlled_addrs=set(), flags=None):
+USER_ALERTS = {'Violated-AC-Check':'Violated access control check', \
+                'Missing-AC-Check':'Missing access control check', \
+                'acsbl_sdestruct': 'Non protected SELFDESTRUCT', \
+                'SELFDESTRUCT':'Controlable Address of SELFDESTRUCT', \
+                'DELEGATECALL':'Controlable Target of DELEGATECALL'}
 
-    user_alerts = {'Violated-AC-Check':'Violated access control check', \
-                    'Missing-AC-Check':'Missing access control check', \
-                    'acsbl_sdestruct': 'Non protected SELFDESTRUCT', \
-                    'SELFDESTRUCT':'Controlable Address of SELFDESTRUCT', \
-                    'DELEGATECALL':'Controlable Target of DELEGATECALL'}
-    flags = flags or set(opcodes.CRITICAL)    
-    ##convert_to_ssa
-    sys.setrecursionlimit(10000)
-    ssa = rattle.Recover(bytes.hex(p.code).encode(), edges=p.cfg.edges(), split_functions=False)      
-    memory_info = resolve_all_memory(p.cfg, p.code)        
-    storage_info = resolve_all_storage(p.cfg, p.code, memory_info)                                      
-    violated_ac_count =0
-    missing_ac_count = 0
-    violated_ac_ib_count = 0    
+DEFECT_TYPES = ['Violated-AC-Check', 'Missing-AC-Check']
+
+
+class AnalysisContext(object):
+    """
+    Everything the sink groups of a contract share, computed once.
+    Workers are forked after it is built and only read it.
+    """
+    def __init__(self, p, ssa, memory_info, storage_info, sym_validation=None, mode=None):
+        self.p = p
+        self.ssa = ssa
+        self.memory_info = memory_info
+        self.storage_info = storage_info
+        self.sym_validation = sym_validation
+        self.mode = mode
+        # access control checks, JUMPIs on values loaded from storage
+        self.ac_jumpis = p.cfg.filter_ins('JUMPI', reachable=True)
+        self.ac_checks_with_sloads, self.slices, self.imap, self.other_ac_checks = dict(), None, None, []
+        self.ac_checks_sloads = []
+        if self.ac_jumpis:
+            self.ac_checks_with_sloads, self.slices, self.imap, self.other_ac_checks = p.resolve_access_control_slots(
+                ssa, self.ac_jumpis, ac_check_ins=opcodes.ins_in_ac_check, args=opcodes.CRITICAL_ARGS['JUMPI'],
+                memory_info=memory_info, restricted=True)
+        for k in self.ac_checks_with_sloads:
+            self.ac_checks_sloads.extend([ins for ins in [s['sload'] for s in self.ac_checks_with_sloads[k]] if ins in storage_info])
+
+    def tasks(self):
+        """(defect type, sink group) pairs, they are checked independently"""
+        tasks = []
+        if self.ac_jumpis:
+            tasks.append(('Violated-AC-Check', 'JUMPI'))
+        ins = [*self.p.cfg.filter_ins('SELFDESTRUCT', reachable=True), *self.p.cfg.filter_ins('DELEGATECALL', reachable=True)]
+        if ins:
+            for ins_type in sorted(set(s.name for s in ins)) + ['acsbl_sdestruct']:
+                tasks.append(('Missing-AC-Check', ins_type))
+        return tasks
+
+
+# context of the running analysis, inherited by the forked workers
+_context = None
+
+
+def check_violated_ac(ctx):
+    p, ssa, storage_info = ctx.p, ctx.ssa, ctx.storage_info
+    sym_validation, mode = ctx.sym_validation, ctx.mode
+    user_alerts = USER_ALERTS
+    defect_type = 'Violated-AC-Check'
+    ins = ctx.ac_jumpis
+    restricted = True
+    ins_type = set(s.name for s in ins).pop()
+    args = opcodes.CRITICAL_ARGS[ins_type]
+    sinks={s.addr: opcodes.CRITICAL_ARGS[ins_type] for s in ins}
+    ac_checks_with_sloads, slices, imap, other_ac_cehcks = ctx.ac_checks_with_sloads, ctx.slices, ctx.imap, ctx.other_ac_checks
+    ac_checks_sloads = ctx.ac_checks_sloads
+    violated_ac_count = 0
+    violated_ac_ib_count = 0
+
+    tainted_sstores = defaultdict(list)
+    sstores = p.cfg.filter_ins('SSTORE', reachable=True)                                 
+    ac_sload_slots = []
+
+    ac_sload_slots = list(set([s for ins in ac_checks_sloads if ins in storage_info for s in storage_info[ins].reads]))            
+    ac_sload_sha3_bases = {s:storage_info[ins].read_sha3_bases[s] for ins in ac_checks_sloads if ins in storage_info for s in storage_info[ins].reads if storage_info[ins].read_sha3_bases}                                                                  
+    
+    s_temp=[ins for ins in sstores if ins in storage_info and storage_info[ins].writes.union(set(storage_info[ins].write_sha3_bases.values())) & set(ac_sload_slots+list(ac_sload_sha3_bases.values()))]                            
+    sstores =s_temp                                                            
+    sstore_sinks={s.addr:[1] for s in sstores}  
+    sstore_taintedBy=opcodes.potentially_direct_user_controlled            
+    sload_sha3_bases= ac_sload_sha3_bases 
     
-    ac_checks_sloads = []            
-    for defect_type in list(['Violated-AC-Check','Missing-AC-Check']):
-        print("Checking contract for \033[4m{0}\033[0m ".format(defect_type))
-        print("------------------")                    
-        ins=[]
-        taintedBy = []
-
-        if not taintedBy:
-            taintedBy=opcodes.potentially_user_controlled                                              
-        if defect_type in (['Violated-AC-Check']):                
-            ins = p.cfg.filter_ins('JUMPI', reachable=True)
-            restricted=True
-            if not ins:
+    for s, sstore_slot_sbyte, sstore_struct_offset, s_path, s_r in p.extract_paths(ssa, sstores, sstore_sinks, sstore_taintedBy, defect_type='Storage-Tainting', args=[1], storage_slots=ac_sload_slots,storage_sha3_bases=sload_sha3_bases, restricted=True):                
+        logging.debug("%s: %s", 'SSTORE', s)
+        logging.debug("Path: %s", '->'.join('%x' %p for p in s_path))                                                                              
+        if s_r._tainted:  
+            tainted_sstores[s]=s_path                
+        #break                         
+    tainted_sstores_tmp = []
+    for jump_ins in ac_checks_with_sloads:                
+        current_ac_check_slots = [s for ins in [s['sload'] for s in ac_checks_with_sloads[jump_ins]] if ins in storage_info for s in storage_info[ins].reads]                                                                                                            
+        current_ac_check_slot_sha3_bases = [ac_sload_sha3_bases[slot] for slot in current_ac_check_slots if len(str(slot))>5 and slot in ac_sload_sha3_bases]                 
+        current_ac_check_slot_sbyte = [{'slot':s,'sbyte':sload['sbyte']} for s in current_ac_check_slots if len(str(s))<5  for sload in ac_checks_with_sloads[jump_ins]]                                                                                                                            
+        current_ac_check_struct_offset = [sload['structOffset'] for s in current_ac_check_slots for sload in ac_checks_with_sloads[jump_ins]]                                                                                                                            
+        current_ac_check_slots_sstores = [ins for ins in storage_info if ins.name=='SSTORE' and storage_info[ins].writes & set(current_ac_check_slots)]                                
+        for sstore_ins in tainted_sstores:                                                            
+            current_sstore_slot = [s for s in storage_info[sstore_ins].writes]                                                    
+            if set(current_sstore_slot)& set([s['slot'] for s in current_ac_check_slot_sbyte]):                                                
+                if not set([sstore_slot_sbyte[sstore_ins]]).union({'whole'}) & set([s['sbyte'] for s in current_ac_check_slot_sbyte]):           
+                    tainted_sstores_tmp.append(sstore_ins)                            
+            current_sstore_slot_sha3_base = [storage_info[sstore_ins].write_sha3_bases[s] for s in current_sstore_slot if len(str(s))>5 and s in storage_info[sstore_ins].write_sha3_bases]                    
+            if set(current_sstore_slot)& set([s['slot'] for s in current_ac_check_slot_sbyte]) or \
+                set(current_ac_check_slot_sha3_bases)& set(current_sstore_slot_sha3_base):                                                
+                if sstore_struct_offset[sstore_ins] not in current_ac_check_struct_offset:                                          
+                    tainted_sstores_tmp.append(sstore_ins)
+    
+    for ins in set(tainted_sstores_tmp):
+        del tainted_sstores[ins]
+    tainted_sstores_tmp = []                    
+    checked_tainted_sstores= []
+    not_tainted_sstore =[]
+    resolve_later = deque(ins for ins in tainted_sstores)
+    todo = deque()    
+    progress= True            
+    while todo or (progress and resolve_later):
+        if not todo:
+            todo = resolve_later
+            resolve_later = deque()
+            progress = False                    
+        sstore_ins = todo.popleft()
+        logging.debug("%s: %s", 'SSTORE', sstore_ins)
+        logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_sstores[sstore_ins]))                      
+        sstore_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainted_sstores[sstore_ins][:-1]]
+        sstore_path_other_ac_checks = [ins for ins in other_ac_cehcks if ins.bb.start in tainted_sstores[sstore_ins][:-1]]
+        
+        if len(sstore_path_ac_checks)==0 and len(sstore_path_other_ac_checks)==0:                    
+            if sym_validation: 
+                try:                       
+                    taint_valid_results= validate_path(p, tainted_sstores[sstore_ins])                                                                                            
+                except TimeoutException:                
+                    raise TimeoutException("Timed out!")                        
+                if taint_valid_results:                                                        
+                    checked_tainted_sstores.append(sstore_ins)
+                else: 
+                    not_tainted_sstore.append(sstore_ins)                            
+            else:
+                checked_tainted_sstores.append(sstore_ins)                
+        else:                    
+            other_access_sanitizers =[slot for ins in sstore_path_ac_checks for slot in storage_info[ins].reads]                                                                                                                                                                                                                                                                        
+            other_access_sanitizers_sstores = [ins for ins in storage_info if ins.name=='SSTORE' and storage_info[ins].writes & set(other_access_sanitizers)]                                         
+            if set(other_access_sanitizers_sstores) & set(checked_tainted_sstores):                                                   
+                if sym_validation:                            
+                    taint_valid_results = validate_path(p, tainted_sstores[sstore_ins])                                                
+                    if taint_valid_results:                                                           
+                        checked_tainted_sstores.append(sstore_ins)
+                    else: 
+                        not_tainted_sstore.append(sstore_ins)
+                else:
+                    checked_tainted_sstores.append(sstore_ins)                        
                 continue
-            ins_type = set(s.name for s in ins).pop()            
-            args = opcodes.CRITICAL_ARGS[ins_type] 
-            sinks={s.addr: opcodes.CRITICAL_ARGS[ins_type] for s in ins}            
-
-            tainted_sstores = defaultdict(list)                                        
-            ac_checks_with_sloads, slices, imap, other_ac_cehcks = p.resolve_access_control_slots(ssa, ins, ac_check_ins=opcodes.ins_in_ac_check, args=args, memory_info=memory_info, restricted=restricted)            
-            sstores = p.cfg.filter_ins('SSTORE', reachable=True)                                 
-            ac_sload_slots = []
-
-            for k in ac_checks_with_sloads:
-                ac_checks_sloads.extend([ins for ins in [s['sload'] for s in ac_checks_with_sloads[k]] if ins in storage_info])                                                                                                                           
-            ac_sload_slots = list(set([s for ins in ac_checks_sloads if ins in storage_info for s in storage_info[ins].reads]))            
-            ac_sload_sha3_bases = {s:storage_info[ins].read_sha3_bases[s] for ins in ac_checks_sloads if ins in storage_info for s in storage_info[ins].reads if storage_info[ins].read_sha3_bases}                                                                  
-            
-            s_temp=[ins for ins in sstores if ins in storage_info and storage_info[ins].writes.union(set(storage_info[ins].write_sha3_bases.values())) & set(ac_sload_slots+list(ac_sload_sha3_bases.values()))]                            
-            sstores =s_temp                                                            
-            sstore_sinks={s.addr:[1] for s in sstores}  
-            sstore_taintedBy=opcodes.potentially_direct_user_controlled            
-            sload_sha3_bases= ac_sload_sha3_bases 
-            
-            for s, sstore_slot_sbyte, sstore_struct_offset, s_path, s_r in p.extract_paths(ssa, sstores, sstore_sinks, sstore_taintedBy, defect_type='Storage-Tainting', args=[1], storage_slots=ac_sload_slots,storage_sha3_bases=sload_sha3_bases, restricted=True):                
-                logging.debug("%s: %s", 'SSTORE', s)
-                logging.debug("Path: %s", '->'.join('%x' %p for p in s_path))                                                                              
-                if s_r._tainted:  
-                    tainted_sstores[s]=s_path                
-                #break                         
-            tainted_sstores_tmp = []
-            for jump_ins in ac_checks_with_sloads:                
-                current_ac_check_slots = [s for ins in [s['sload'] for s in ac_checks_with_sloads[jump_ins]] if ins in storage_info for s in storage_info[ins].reads]                                                                                                            
-                current_ac_check_slot_sha3_bases = [ac_sload_sha3_bases[slot] for slot in current_ac_check_slots if len(str(slot))>5 and slot in ac_sload_sha3_bases]                 
-                current_ac_check_slot_sbyte = [{'slot':s,'sbyte':sload['sbyte']} for s in current_ac_check_slots if len(str(s))<5  for sload in ac_checks_with_sloads[jump_ins]]                                                                                                                            
-                current_ac_check_struct_offset = [sload['structOffset'] for s in current_ac_check_slots for sload in ac_checks_with_sloads[jump_ins]]                                                                                                                            
-                current_ac_check_slots_sstores = [ins for ins in storage_info if ins.name=='SSTORE' and storage_info[ins].writes & set(current_ac_check_slots)]                                
-                for sstore_ins in tainted_sstores:                                                            
-                    current_sstore_slot = [s for s in storage_info[sstore_ins].writes]                                                    
-                    if set(current_sstore_slot)& set([s['slot'] for s in current_ac_check_slot_sbyte]):                                                
-                        if not set([sstore_slot_sbyte[sstore_ins]]).union({'whole'}) & set([s['sbyte'] for s in current_ac_check_slot_sbyte]):           
-                            tainted_sstores_tmp.append(sstore_ins)                            
-                    current_sstore_slot_sha3_base = [storage_info[sstore_ins].write_sha3_bases[s] for s in current_sstore_slot if len(str(s))>5 and s in storage_info[sstore_ins].write_sha3_bases]                    
-                    if set(current_sstore_slot)& set([s['slot'] for s in current_ac_check_slot_sbyte]) or \
-                        set(current_ac_check_slot_sha3_bases)& set(current_sstore_slot_sha3_base):                                                
-                        if sstore_struct_offset[sstore_ins] not in current_ac_check_struct_offset:                                          
-                            tainted_sstores_tmp.append(sstore_ins)
-            
-            for ins in set(tainted_sstores_tmp):
-                del tainted_sstores[ins]
-            tainted_sstores_tmp = []                    
-            checked_tainted_sstores= []
-            not_tainted_sstore =[]
-            resolve_later = deque(ins for ins in tainted_sstores)
-            todo = deque()    
-            progress= True            
-            while todo or (progress and resolve_later):
-                if not todo:
-                    todo = resolve_later
-                    resolve_later = deque()
-                    progress = False                    
-                sstore_ins = todo.popleft()
-                logging.debug("%s: %s", 'SSTORE', sstore_ins)
-                logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_sstores[sstore_ins]))                      
-                sstore_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainted_sstores[sstore_ins][:-1]]
-                sstore_path_other_ac_checks = [ins for ins in other_ac_cehcks if ins.bb.start in tainted_sstores[sstore_ins][:-1]]
-                
-                if len(sstore_path_ac_checks)==0 and len(sstore_path_other_ac_checks)==0:                    
-                    if sym_validation: 
-                        try:                       
-                            taint_valid_results= validate_path(p, tainted_sstores[sstore_ins])                                                                                            
-                        except TimeoutException:                
-                            raise TimeoutException("Timed out!")                        
-                        if taint_valid_results:                                                        
+            if set(other_access_sanitizers_sstores) & set(not_tainted_sstore): 
+                not_tainted_sstore.append(sstore_ins)                        
+                continue
+            if tainted_sstores.keys() & set(other_access_sanitizers_sstores) != set(other_access_sanitizers_sstores):
+                not_tainted_sstore.append(sstore_ins)                    
+                continue                                            
+            if tainted_sstores.keys() & set(other_access_sanitizers_sstores): 
+                sstore_fun_sig = cinfo.get_function_sig(p.cfg, tainted_sstores[sstore_ins],'id')
+                other_tainted_santizers_sstores = [ins for ins in tainted_sstores.keys() if set([ins]) & set(other_access_sanitizers_sstores) and sstore_fun_sig!=cinfo.get_function_sig(p.cfg, tainted_sstores[ins],'id')]                                                                
+                if other_tainted_santizers_sstores and set(other_tainted_santizers_sstores)&set(checked_tainted_sstores)==set(other_tainted_santizers_sstores):                            
+                    if sym_validation:                                
+                        taint_valid_results= validate_path(p, tainted_sstores[sstore_ins])                                
+                        if taint_valid_results:                                    
                             checked_tainted_sstores.append(sstore_ins)
                         else: 
-                            not_tainted_sstore.append(sstore_ins)                            
+                            not_tainted_sstore.append(sstore_ins)
                     else:
-                        checked_tainted_sstores.append(sstore_ins)                
-                else:                    
-                    other_access_sanitizers =[slot for ins in sstore_path_ac_checks for slot in storage_info[ins].reads]                                                                                                                                                                                                                                                                        
-                    other_access_sanitizers_sstores = [ins for ins in storage_info if ins.name=='SSTORE' and storage_info[ins].writes & set(other_access_sanitizers)]                                         
-                    if set(other_access_sanitizers_sstores) & set(checked_tainted_sstores):                                                   
-                        if sym_validation:                            
-                            taint_valid_results = validate_path(p, tainted_sstores[sstore_ins])                                                
-                            if taint_valid_results:                                                           
-                                checked_tainted_sstores.append(sstore_ins)
-                            else: 
-                                not_tainted_sstore.append(sstore_ins)
-                        else:
-                            checked_tainted_sstores.append(sstore_ins)                        
-                        continue
-                    if set(other_access_sanitizers_sstores) & set(not_tainted_sstore): 
-                        not_tainted_sstore.append(sstore_ins)                        
-                        continue
-                    if tainted_sstores.keys() & set(other_access_sanitizers_sstores) != set(other_access_sanitizers_sstores):
-                        not_tainted_sstore.append(sstore_ins)                    
-                        continue                                            
-                    if tainted_sstores.keys() & set(other_access_sanitizers_sstores): 
-                        sstore_fun_sig = cinfo.get_function_sig(p.cfg, tainted_sstores[sstore_ins],'id')
-                        other_tainted_santizers_sstores = [ins for ins in tainted_sstores.keys() if set([ins]) & set(other_access_sanitizers_sstores) and sstore_fun_sig!=cinfo.get_function_sig(p.cfg, tainted_sstores[ins],'id')]                                                                
-                        if other_tainted_santizers_sstores and set(other_tainted_santizers_sstores)&set(checked_tainted_sstores)==set(other_tainted_santizers_sstores):                            
-                            if sym_validation:                                
-                                taint_valid_results= validate_path(p, tainted_sstores[sstore_ins])                                
-                                if taint_valid_results:                                    
-                                    checked_tainted_sstores.append(sstore_ins)
-                                else: 
-                                    not_tainted_sstore.append(sstore_ins)
-                            else:
-                                checked_tainted_sstores.append(sstore_ins)                            
-                            continue                                                                                                        
-                        else:
-                            resolve_later.append(sstore_ins)                                                
-            checked_access_paths = defaultdict(list)                                                                       
-            for i, i_path in p.extract_control_paths(slices, imap):
-                logging.debug("%s: %s", ins_type, i)
-                logging.debug("Path: %s", '->'.join('%x' % p for p in i_path))                                                                                                
-                current_ac_check_slots = [s for ins in [s['sload'] for s in ac_checks_with_sloads[i]] if ins in storage_info for s in storage_info[ins].reads]                                                                                            
-                current_ac_check_slot_sbyte = [{'slot':s,'sbyte':sload['sbyte']} for s in current_ac_check_slots if len(str(s))<5  for sload in ac_checks_with_sloads[i]]                                                                                                            
-                current_ac_check_slots_sha3_bs = [ac_sload_sha3_bases[slot] for slot in current_ac_check_slots if len(str(slot))>5 and slot in ac_sload_sha3_bases]
-                current_ac_check_slots_sstores = [ins for ins in storage_info if ins.name=='SSTORE' and storage_info[ins].writes & set(current_ac_check_slots) or set(storage_info[ins].write_sha3_bases.values()) & set(current_ac_check_slots_sha3_bs)]                
-                ac_function= cinfo.get_function_sig(p.cfg, i_path)
-                reported= False   
-                IntendedB = False                          
-                for sstore_ins in current_ac_check_slots_sstores:                                        
-                    if sstore_ins in checked_tainted_sstores: 
-                        current_sstore_slot = [s for s in storage_info[sstore_ins].writes]                                                    
-                        current_sstore_slot_sha3_bs = [storage_info[sstore_ins].write_sha3_bases[s] for s in storage_info[sstore_ins].writes if len(str(s))>5]
-                        sstore_slot = list(set(current_sstore_slot) if len(str(current_sstore_slot[0]))<=5 else set(current_sstore_slot_sha3_bs))                                                
-                        sstore_in_function= cinfo.get_function_sig(p.cfg, tainted_sstores[sstore_ins])
-                        if ac_function+'-'+ sstore_in_function+'-'+str(sstore_slot[0]) in checked_access_paths[sstore_slot[0]]:                                                     
-                            continue                                                                                    
-                        checked_access_paths[sstore_slot[0]].append(ac_function +'-'+ sstore_in_function+'-'+str(sstore_slot[0]))                                                        
-                        logging.debug("%s", sstore_ins)
-                        logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_sstores[sstore_ins]))                                                                                                            
-                        if not reported:                                                                                         
-                            print("\n{0} in function {1}".format(user_alerts[defect_type], ac_function))
-                            print("\t%s" %i)                                                                                                                                                                                  
-                            reported = True                            
-                        if mode =='FIntendedB':                                                                                    
-                            ac_checks_in_sstore_path = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainted_sstores[sstore_ins][:-1]]                            
-                            taint_valid_results =None
-                            if len(ac_checks_in_sstore_path)==0: 
-                                taint_valid_results= validate_path(p, tainted_sstores[sstore_ins], mode=mode, ac_jumpi=[s.addr for s in ac_checks_with_sloads])                                                                                                        
-                            if taint_valid_results:                                                                
-                                model, pib = taint_valid_results                                
-                                if pib:                                             
-                                    violated_ac_ib_count+=1
-                                    IntendedB = True
-                                    print("+--(Potentially Intended Behavior) Attacker can make changes to AC item {0} in function {1}".format(set(sstore_slot), sstore_in_function))                                                    
-                                    continue                                                        
-                        print("+--Attacker can make changes to AC item {0} in function {1}".format(set(sstore_slot), sstore_in_function))
-                if reported and not IntendedB:
-                    violated_ac_count+=1
-
-            print("\n")                        
-        elif defect_type in (['Missing-AC-Check']):                
-            kill_ins= p.cfg.filter_ins('SELFDESTRUCT', reachable=True)
-            call_ins= p.cfg.filter_ins('DELEGATECALL', reachable=True)
-            ins = [*kill_ins, *call_ins]             
-            if not ins:        
+                        checked_tainted_sstores.append(sstore_ins)                            
+                    continue                                                                                                        
+                else:
+                    resolve_later.append(sstore_ins)                                                
+    checked_access_paths = defaultdict(list)                                                                       
+    for i, i_path in p.extract_control_paths(slices, imap):
+        logging.debug("%s: %s", ins_type, i)
+        logging.debug("Path: %s", '->'.join('%x' % p for p in i_path))                                                                                                
+        current_ac_check_slots = [s for ins in [s['sload'] for s in ac_checks_with_sloads[i]] if ins in storage_info for s in storage_info[ins].reads]                                                                                            
+        current_ac_check_slot_sbyte = [{'slot':s,'sbyte':sload['sbyte']} for s in current_ac_check_slots if len(str(s))<5  for sload in ac_checks_with_sloads[i]]                                                                                                            
+        current_ac_check_slots_sha3_bs = [ac_sload_sha3_bases[slot] for slot in current_ac_check_slots if len(str(slot))>5 and slot in ac_sload_sha3_bases]
+        current_ac_check_slots_sstores = [ins for ins in storage_info if ins.name=='SSTORE' and storage_info[ins].writes & set(current_ac_check_slots) or set(storage_info[ins].write_sha3_bases.values()) & set(current_ac_check_slots_sha3_bs)]                
+        ac_function= cinfo.get_function_sig(p.cfg, i_path)
+        reported= False   
+        IntendedB = False                          
+        for sstore_ins in current_ac_check_slots_sstores:                                        
+            if sstore_ins in checked_tainted_sstores: 
+                current_sstore_slot = [s for s in storage_info[sstore_ins].writes]                                                    
+                current_sstore_slot_sha3_bs = [storage_info[sstore_ins].write_sha3_bases[s] for s in storage_info[sstore_ins].writes if len(str(s))>5]
+                sstore_slot = list(set(current_sstore_slot) if len(str(current_sstore_slot[0]))<=5 else set(current_sstore_slot_sha3_bs))                                                
+                sstore_in_function= cinfo.get_function_sig(p.cfg, tainted_sstores[sstore_ins])
+                if ac_function+'-'+ sstore_in_function+'-'+str(sstore_slot[0]) in checked_access_paths[sstore_slot[0]]:                                                     
+                    continue                                                                                    
+                checked_access_paths[sstore_slot[0]].append(ac_function +'-'+ sstore_in_function+'-'+str(sstore_slot[0]))                                                        
+                logging.debug("%s", sstore_ins)
+                logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_sstores[sstore_ins]))                                                                                                            
+                if not reported:                                                                                         
+                    print("\n{0} in function {1}".format(user_alerts[defect_type], ac_function))
+                    print("\t%s" %i)                                                                                                                                                                                  
+                    reported = True                            
+                if mode =='FIntendedB':                                                                                    
+                    ac_checks_in_sstore_path = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainted_sstores[sstore_ins][:-1]]                            
+                    taint_valid_results =None
+                    if len(ac_checks_in_sstore_path)==0: 
+                        taint_valid_results= validate_path(p, tainted_sstores[sstore_ins], mode=mode, ac_jumpi=[s.addr for s in ac_checks_with_sloads])                                                                                                        
+                    if taint_valid_results:                                                                
+                        model, pib = taint_valid_results                                
+                        if pib:                                             
+                            violated_ac_ib_count+=1
+                            IntendedB = True
+                            print("+--(Potentially Intended Behavior) Attacker can make changes to AC item {0} in function {1}".format(set(sstore_slot), sstore_in_function))                                                    
+                            continue                                                        
+                print("+--Attacker can make changes to AC item {0} in function {1}".format(set(sstore_slot), sstore_in_function))
+        if reported and not IntendedB:
+            violated_ac_count+=1
+
+    print("\n")                        
+    return AnalysisBugDetails(violated_ac_count, 0, violated_ac_ib_count)
+
+
+def check_missing_ac(ctx, ins_type):
+    p, ssa, storage_info = ctx.p, ctx.ssa, ctx.storage_info
+    sym_validation = ctx.sym_validation
+    user_alerts = USER_ALERTS
+    defect_type = 'Missing-AC-Check'
+    taintedBy = opcodes.potentially_user_controlled
+    ac_checks_sloads, other_ac_cehcks = ctx.ac_checks_sloads, ctx.other_ac_checks
+    missing_ac_count = 0
+
+    kill_ins= p.cfg.filter_ins('SELFDESTRUCT', reachable=True)
+    call_ins= p.cfg.filter_ins('DELEGATECALL', reachable=True)
+    ins = [*kill_ins, *call_ins]             
+    if ins_type=='acsbl_sdestruct': #accessible selfdestruct
+        args = opcodes.CRITICAL_ARGS['SELFDESTRUCT'] 
+        sub_ins = kill_ins                    
+        sinks={}                    
+        restricted=True
+    else:
+        args = opcodes.CRITICAL_ARGS[ins_type]     
+        sub_ins =set([s for s in ins if s.name == ins_type])                                                              
+        sinks={s.addr: opcodes.CRITICAL_ARGS[ins_type] for s in sub_ins}            
+        restricted=True                            
+    if taintedBy ==[]:
+        taintedBy=opcodes.potentially_user_controlled                                                                          
+    
+    tainted_ins = defaultdict(list)
+    tainting_loc= defaultdict(list)                                           
+    ins_with_preceded_ac = []
+    for j, j_ins_slot_sbyte, j_ins_struct_offset, j_path, j_r in p.extract_paths(ssa, sub_ins, sinks, taintedBy, defect_type=defect_type, args=args, restricted=restricted, memory_info=None):
+        logging.debug("%s: %s", ins_type, j)
+        logging.debug("Path: %s", '->'.join('%x' %p for p in j_path))
+        if ins_type in (['SELFDESTRUCT','DELEGATECALL']) and j_r._tainted:                                                
+            if j in ins_with_preceded_ac:
+                continue                                                                        
+            if j in tainted_ins: 
                 continue
-            ins_types= list(set(s.name for s in ins)) + ['acsbl_sdestruct']                       
-            for ins_type in ins_types :                                            
-                if ins_type=='acsbl_sdestruct': #accessible selfdestruct
-                    args = opcodes.CRITICAL_ARGS['SELFDESTRUCT'] 
-                    sub_ins = kill_ins                    
-                    sinks={}                    
-                    restricted=True
+            if any(k for i in j_r.sources for k,v in i.items() if k.split('-',1)[0]!='SLOAD'):                                                                                                                 
+                ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in j_path[:-1]]                                                                                                                                                                                                                                                    
+                if len(ins_path_ac_checks)!=0:
+                    ins_with_preceded_ac.append(j)
+                    continue                            
+                tainted_ins[j]= {"path":j_path,"type":ins_type}            
+            else:                               
+                sload_slots= [v for i in j_r.sources for k,v in i.items() if k.split('-',1)[0]=='SLOAD']                                                                                        
+                sload_sha3_bases= {i:j_r.sload_sha3_bases[i] for i in j_r.sload_sha3_bases if i in sload_slots}                                                                                                                                                    
+                sstores = p.cfg.filter_ins('SSTORE', reachable=True)                                                                                                         
+                sstore_sinks={s.addr:[1] for s in sstores}                              
+                sstore_taintedBy=opcodes.potentially_direct_user_controlled                                   
+                for js, js_sstore_slot_sbyte, js_sstore_struct_offset, js_path, js_r in p.extract_paths(ssa, sstores, sstore_sinks, sstore_taintedBy, defect_type='Storage-Tainting', args=[1], storage_slots=sload_slots,storage_sha3_bases=sload_sha3_bases, restricted=True):                                                                                                
+                    if js_r._tainted and (set([j_ins_slot_sbyte[j]])&set([js_sstore_slot_sbyte[js]])):                                                                                                                                                    
+                        ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in js_path[:-1]]                                                                                                                                                                                                                        
+                        if len(ins_path_ac_checks)!=0:
+                            ins_with_preceded_ac.append(j)
+                            continue                                    
+                        tainted_ins[j]={"path":j_path,"type":ins_type} 
+                        tainting_loc[j]=js_path 
+                        break 
+        elif ins_type in (['acsbl_sdestruct']):                                                                                                                                            
+            tainted_ins[j]={"path":j_path,"type":ins_type}                
+                    
+    checked_ins_paths = defaultdict(list)                                                                           
+    for s in tainted_ins:                    
+        logging.debug("%s", s)
+        logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_ins[s]["path"]))                                                                                                    
+        ac_function= cinfo.get_function_sig(p.cfg, tainted_ins[s]["path"],'id')                                 
+        MissingIntendedB = False
+        if ac_function+'-'+str(s.addr) in checked_ins_paths[s.addr]:                                                     
+            continue                          
+        if tainting_loc[s]:
+            if sym_validation:
+                taint_valid_results = validate_path(p, tainting_loc[s])                    
+                if not taint_valid_results:                                                                                           
+                    continue                            
+            ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainting_loc[s][:-1]]                                                                                                                                                                                                                                                
+            ins_path_other_ac_checks = [ins for ins in other_ac_cehcks if ins.bb.start in tainting_loc[s][:-1]]
+            tainting_path=tainting_loc[s]
+        else:
+            ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainted_ins[s]["path"][:-1]]
+            ins_path_other_ac_checks = [ins for ins in other_ac_cehcks if ins.bb.start in tainted_ins[s]["path"][:-1]]
+            tainting_path=tainted_ins[s]["path"]
+
+        if len(ins_path_ac_checks)==0 and len(ins_path_other_ac_checks)==0:                        
+            checked_ins_paths[s.addr].append(ac_function+'-'+str(s.addr))                            
+            logging.debug("%s", s)
+            logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_ins[s]["path"]))                                                                                                                                    
+            logging.debug("Path: %s", '->'.join('%x' %p for p in j_path))                                    
+            print("({0}) {1} in function {2}".format(user_alerts[tainted_ins[s]["type"]], user_alerts[defect_type],cinfo.get_function_sig(p.cfg, tainting_path)))  
+            print("Needed to protect following instruction in function {0}".format(cinfo.get_function_sig(p.cfg,tainted_ins[s]["path"])))
+            print("%s\n" %s)  
+            if not MissingIntendedB:
+                missing_ac_count+=1
+    
+    return AnalysisBugDetails(0, missing_ac_count, 0)
+
+
+def run_task(task):
+    """check a sink group of _context, returns (task, printed report, AnalysisBugDetails)"""
+    defect_type, ins_type = task
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        if defect_type == 'Violated-AC-Check':
+            details = check_violated_ac(_context)
+        else:
+            details = check_missing_ac(_context, ins_type)
+    return task, out.getvalue(), details
+
+
+def _terminate(signum, frame):
+    sys.exit(128 + signum)
+
+
+def preprocess(p, store=None):
+    """
+    (project, ssa, memory_info, storage_info) of p, loaded from the ArtifactStore if it has the bytecode.
+    The returned project owns the instructions memory_info and storage_info refer to.
+    """
+    artifacts = store.get(p.code) if store is not None else None
+    if artifacts is not None:
+        logging.info("Loaded artifacts of %s", code_hash(p.code))
+        return Project(artifacts.code, artifacts.cfg), artifacts.ssa, artifacts.memory_info, artifacts.storage_info
+    ##convert_to_ssa
+    ssa = rattle.Recover(bytes.hex(p.code).encode(), edges=p.cfg.edges(), split_functions=False)      
+    memory_info = resolve_all_memory(p.cfg, p.code)        
+    storage_info = resolve_all_storage(p.cfg, p.code, memory_info)                                      
+    if store is not None:
+        store.put(Artifacts(p.code, p.cfg, ssa, memory_info, storage_info))
+    return p, ssa, memory_info, storage_info
+
+
+def analysis(p, initial_storage=dict(), sym_validation= None,
+                    mode=None, initial_balance=None,
+                    max_calls=3, controlled_addrs=set(), flags=None, jobs=1, store=None):
+    global _context
+    flags = flags or set(opcodes.CRITICAL)    
+    sys.setrecursionlimit(10000)
+    p, ssa, memory_info, storage_info = preprocess(p, store)
+    _context = AnalysisContext(p, ssa, memory_info, storage_info, sym_validation=sym_validation, mode=mode)
+    tasks = _context.tasks()
+
+    pool = None
+    if jobs > 1 and len(tasks) > 1:
+        # fork after the context is built, the workers share it copy-on-write
+        previous_handler = signal.signal(signal.SIGTERM, _terminate)
+        pool = multiprocessing.get_context('fork').Pool(min(jobs, len(tasks)))
+        results = pool.imap(run_task, tasks)
+    else:
+        results = map(run_task, tasks)
+
+    bug_details = AnalysisBugDetails(0, 0, 0)
+    try:
+        # tasks are ordered by defect type, reports are printed in that order
+        for defect_type in DEFECT_TYPES:
+            print("Checking contract for \033[4m{0}\033[0m ".format(defect_type))
+            print("------------------")
+            for _ in [t for t in tasks if t[0] == defect_type]:
+                task, report, details = next(results)
+                sys.stdout.write(report)
+                bug_details = bug_details.merge(details)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+            signal.signal(signal.SIGTERM, previous_handler)
+        _context = None
+    return bug_details
+
+
+def read_manifest(path, bytecode=False):
+    """
+    (source, contract name, runtime bytecode) of the entries of a manifest.
+    One entry per line: a solidity file, a bytecode file with -b, or an inline hex bytecode.
+    """
+    with open(path) as f:
+        lines = [l.strip() for l in f]
+    for line in lines:
+        if not line or line.startswith('#'):
+            continue
+        if not os.path.exists(line) and re.fullmatch(r'(0x)?[0-9a-fA-F]+', line):
+            try:
+                code = bytes.fromhex(line[2:] if line.startswith('0x') else line)
+            except ValueError:
+                code = None
+            yield line[:16], None, code
+        elif bytecode:
+            # a bad entry is reported like a failed compilation, it must not stop the batch
+            try:
+                with open(line) as infile:
+                    code = bytes.fromhex(infile.read().rstrip())
+            except (OSError, ValueError):
+                code = None
+            yield line, None, code
+        else:
+            try:
+                # get_evm prints and exits when solc fails
+                with contextlib.redirect_stdout(io.StringIO()):
+                    contracts = get_evm(line)
+            except (SystemExit, OSError):
+                yield line, None, None
+                continue
+            for cname, bin_str in contracts:
+                yield line, cname, bytes.fromhex(bin_str)
+
+
+def _alarm(signum, frame):
+    raise TimeoutException("Timed out!")
+
+
+def _analyze_worker(conn, code, timeout, store, initial_storage, mode):
+    """forked per bytecode, the memory limit of the batch process is inherited"""
+    signal.signal(signal.SIGALRM, _alarm)
+    signal.alarm(timeout)
+    result = {'status': 'ok'}
+    out = io.StringIO()
+    start = time.time()
+    try:
+        with contextlib.redirect_stdout(out):
+            details = analysis(Project(code), initial_storage, sym_validation=True, mode=mode, store=store)
+        result.update(violated_ac_checks=details.violated_ac_checks, missing_ac_checks=details.missing_ac_checks,
+                      violated_ac_checks_ib=details.violated_ac_checks_ib)
+    except TimeoutException:
+        result['status'] = 'timeout'
+    except MemoryError:
+        result['status'] = 'memory'
+    except Exception as e:
+        logging.exception('Analysis failed')
+        result.update(status='error', error=repr(e))
+    signal.alarm(0)
+    result['seconds'] = round(time.time() - start, 3)
+    result['report'] = out.getvalue()
+    conn.send(result)
+    conn.close()
+
+
+def run_batch(manifest, out_path, bytecode=False, jobs=1, timeout=1800, store=None, initial_storage=dict(),
+              mode=None):
+    """
+    Analyze the contracts of a manifest in forked workers, one JSON line per contract appended to out_path.
+    Identical runtime bytecode is analyzed once, bytecodes already in out_path are skipped.
+    """
+    done = set()
+    # sources that failed to compile, not appended again
+    failed = set()
+    if os.path.exists(out_path):
+        with open(out_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('code_hash') is not None:
+                    done.add(record['code_hash'])
+                elif 'source' in record:
+                    failed.add(record['source'])
+    out = open(out_path, 'a')
+
+    def emit(record):
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+
+    # entries are compiled one at a time while the workers analyze the previous ones
+    entries = read_manifest(manifest, bytecode)
+    # code hash => [(source, contract name)] of the bytecodes being analyzed
+    sources = dict()
+    # code hash => result, of the bytecodes analyzed by this run
+    results = dict()
+    skipped = 0
+
+    ctx = multiprocessing.get_context('fork')
+    running = dict()  # connection => (code hash, process, deadline)
+    try:
+        while entries is not None or running:
+            while entries is not None and len(running) < jobs:
+                entry = next(entries, None)
+                if entry is None:
+                    entries = None
+                    break
+                source, cname, code = entry
+                if code is None:
+                    if source not in failed:
+                        failed.add(source)
+                        emit({'source': source, 'contract': cname, 'code_hash': None, 'status': 'compile-error'})
+                    continue
+                h = code_hash(code)
+                if h in done:
+                    skipped += 1
+                elif h in results:
+                    emit(dict({'source': source, 'contract': cname, 'code_hash': h}, **results[h]))
+                elif h in sources:
+                    sources[h].append((source, cname))
                 else:
-                    args = opcodes.CRITICAL_ARGS[ins_type]     
-                    sub_ins =set([s for s in ins if s.name == ins_type])                                                              
-                    sinks={s.addr: opcodes.CRITICAL_ARGS[ins_type] for s in sub_ins}            
-                    restricted=True                            
-                if taintedBy ==[]:
-                    taintedBy=opcodes.potentially_user_controlled                                                                          
-                
-                tainted_ins = defaultdict(list)
-                tainting_loc= defaultdict(list)                                           
-                ins_with_preceded_ac = []
-                for j, j_ins_slot_sbyte, j_ins_struct_offset, j_path, j_r in p.extract_paths(ssa, sub_ins, sinks, taintedBy, defect_type=defect_type, args=args, restricted=restricted, memory_info=None):
-                    logging.debug("%s: %s", ins_type, j)
-                    logging.debug("Path: %s", '->'.join('%x' %p for p in j_path))
-                    if ins_type in (['SELFDESTRUCT','DELEGATECALL']) and j_r._tainted:                                                
-                        if j in ins_with_preceded_ac:
-                            continue                                                                        
-                        if j in tainted_ins: 
-                            continue
-                        if any(k for i in j_r.sources for k,v in i.items() if k.split('-',1)[0]!='SLOAD'):                                                                                                                 
-                            ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in j_path[:-1]]                                                                                                                                                                                                                                                    
-                            if len(ins_path_ac_checks)!=0:
-                                ins_with_preceded_ac.append(j)
-                                continue                            
-                            tainted_ins[j]= {"path":j_path,"type":ins_type}            
-                        else:                               
-                            sload_slots= [v for i in j_r.sources for k,v in i.items() if k.split('-',1)[0]=='SLOAD']                                                                                        
-                            sload_sha3_bases= {i:j_r.sload_sha3_bases[i] for i in j_r.sload_sha3_bases if i in sload_slots}                                                                                                                                                    
-                            sstores = p.cfg.filter_ins('SSTORE', reachable=True)                                                                                                         
-                            sstore_sinks={s.addr:[1] for s in sstores}                              
-                            sstore_taintedBy=opcodes.potentially_direct_user_controlled                                   
-                            for js, js_sstore_slot_sbyte, js_sstore_struct_offset, js_path, js_r in p.extract_paths(ssa, sstores, sstore_sinks, sstore_taintedBy, defect_type='Storage-Tainting', args=[1], storage_slots=sload_slots,storage_sha3_bases=sload_sha3_bases, restricted=True):                                                                                                
-                                if js_r._tainted and (set([j_ins_slot_sbyte[j]])&set([js_sstore_slot_sbyte[js]])):                                                                                                                                                    
-                                    ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in js_path[:-1]]                                                                                                                                                                                                                        
-                                    if len(ins_path_ac_checks)!=0:
-                                        ins_with_preceded_ac.append(j)
-                                        continue                                    
-                                    tainted_ins[j]={"path":j_path,"type":ins_type} 
-                                    tainting_loc[j]=js_path 
-                                    break 
-                    elif ins_type in (['acsbl_sdestruct']):                                                                                                                                            
-                        tainted_ins[j]={"path":j_path,"type":ins_type}                
-                                
-                checked_ins_paths = defaultdict(list)                                                                           
-                for s in tainted_ins:                    
-                    logging.debug("%s", s)
-                    logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_ins[s]["path"]))                                                                                                    
-                    ac_function= cinfo.get_function_sig(p.cfg, tainted_ins[s]["path"],'id')                                 
-                    MissingIntendedB = False
-                    if ac_function+'-'+str(s.addr) in checked_ins_paths[s.addr]:                                                     
-                        continue                          
-                    if tainting_loc[s]:
-                        if sym_validation:
-                            taint_valid_results = validate_path(p, tainting_loc[s])                    
-                            if not taint_valid_results:                                                                                           
-                                continue                            
-                        ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainting_loc[s][:-1]]                                                                                                                                                                                                                                                
-                        ins_path_other_ac_checks = [ins for ins in other_ac_cehcks if ins.bb.start in tainting_loc[s][:-1]]
-                        tainting_path=tainting_loc[s]
-                    else:
-                        ins_path_ac_checks = [ins for ins in storage_info if ins in ac_checks_sloads and ins.bb.start in tainted_ins[s]["path"][:-1]]
-                        ins_path_other_ac_checks = [ins for ins in other_ac_cehcks if ins.bb.start in tainted_ins[s]["path"][:-1]]
-                        tainting_path=tainted_ins[s]["path"]
-
-                    if len(ins_path_ac_checks)==0 and len(ins_path_other_ac_checks)==0:                        
-                        checked_ins_paths[s.addr].append(ac_function+'-'+str(s.addr))                            
-                        logging.debug("%s", s)
-                        logging.debug("Path: %s", '->'.join('%x' % p for p in tainted_ins[s]["path"]))                                                                                                                                    
-                        logging.debug("Path: %s", '->'.join('%x' %p for p in j_path))                                    
-                        print("({0}) {1} in function {2}".format(user_alerts[tainted_ins[s]["type"]], user_alerts[defect_type],cinfo.get_function_sig(p.cfg, tainting_path)))  
-                        print("Needed to protect following instruction in function {0}".format(cinfo.get_function_sig(p.cfg,tainted_ins[s]["path"])))
-                        print("%s\n" %s)  
-                        if not MissingIntendedB:
-                            missing_ac_count+=1
-                
-    return AnalysisBugDetails(violated_ac_count, missing_ac_count, violated_ac_ib_count)
+                    sources[h] = [(source, cname)]
+                    recv, send = ctx.Pipe(duplex=False)
+                    proc = ctx.Process(target=_analyze_worker, args=(send, code, timeout, store, initial_storage, mode))
+                    proc.start()
+                    send.close()
+                    # the worker stops itself at timeout, kill it if it is stuck in native code
+                    running[recv] = (h, proc, time.time() + timeout + 60)
+            if not running:
+                continue
+            ready = multiprocessing.connection.wait(list(running), timeout=1)
+            now = time.time()
+            for conn in list(running):
+                h, proc, deadline = running[conn]
+                if conn in ready:
+                    try:
+                        result = conn.recv()
+                    except EOFError:
+                        # killed, e.g. by the OOM killer
+                        result = {'status': 'error', 'error': 'worker exited with %s' % proc.exitcode}
+                elif now > deadline:
+                    proc.kill()
+                    result = {'status': 'timeout'}
+                else:
+                    continue
+                proc.join()
+                conn.close()
+                del running[conn]
+                results[h] = result
+                for source, cname in sources.pop(h):
+                    emit(dict({'source': source, 'contract': cname, 'code_hash': h}, **result))
+        logging.info("%d bytecodes analyzed, %d entries already done", len(results), skipped)
+    finally:
+        for conn, (h, proc, deadline) in running.items():
+            proc.kill()
+        out.close()
+
+
 def main():
     parser = argparse.ArgumentParser()
     grp = parser.add_mutually_exclusive_group(required=True)
     grp.add_argument("-f", "--file", type=str,
                        help="Code source file. Solidity by default. Use -b to process evm instead.")
+    grp.add_argument("--manifest", type=str,
+                       help="File listing a source file or hex bytecode per line, analyzed in batch.")
 
     parser.add_argument(
         "-b", "--bytecode", help="read EVM bytecode in source instead of solidity file.", action="store_true")
@@ -371,11 +644,24 @@ def main():
 
     parser.add_argument(
         "-sv", "--sv", help="Validation through symbolic execution", action="store_true")
+
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Worker processes checking the sink groups of a contract, each limited to --memory (default: 1)")
+
+    parser.add_argument(
+        "--cache-dir", help="Store of the CFG, SSA, memory and storage info by bytecode hash, reused across runs")
+
+    parser.add_argument(
+        "-o", "--out", default="achecker.jsonl", help="JSONL results of --manifest (default: achecker.jsonl)")
+
+    parser.add_argument(
+        "-t", "--timeout", type=int, default=1800, help="Seconds per contract in --manifest mode (default: 1800)")
     
     args = parser.parse_args()
     
-    if args.file is None:
-        print('Usage: %s  <-f file>   [--memory] [--savefile]' % \
+    if args.file is None and args.manifest is None:
+        print('Usage: %s  <-f file | --manifest file>   [--memory] [--savefile]' % \
               sys.argv[0], file=sys.stderr)
         exit(-1)
     
@@ -396,12 +682,18 @@ def main():
     #mode = 'FIntendedB' if args.fib else None
     mode = 'FIntendedB' 
     
+    store = ArtifactStore(args.cache_dir) if args.cache_dir else None
+
     initial_storage = dict()
     if args.initial_storage_file:
         with open(args.initial_storage_file, 'rb') as f:
             initial_storage = {int(k, 16): int(v, 16) for k, v in json.load(f).items()}
 
-    if not args.bytecode:
+    if args.manifest:
+        # contracts are analyzed in parallel, not their sink groups
+        run_batch(args.manifest, args.out, bytecode=args.bytecode, jobs=args.jobs, timeout=args.timeout, store=store,
+                  initial_storage=initial_storage, mode=mode)
+    elif not args.bytecode:
         contracts = get_evm(args.file)
 
         # Analyze each contract
@@ -410,13 +702,13 @@ def main():
             print("------------------\n")            
             code = bytes.fromhex(bin_str)                        
             p = Project(code)            
-            analysis(p, initial_storage, sym_validation =symbolic_validation, mode=mode)            
+            analysis(p, initial_storage, sym_validation =symbolic_validation, mode=mode, jobs=args.jobs, store=store)            
     else:
         with open(args.file)  as infile:
             inbuffer = infile.read().rstrip()            
         code = bytes.fromhex(inbuffer)                
         p = Project(code)        
-        analysis(p, initial_storage, sym_validation =symbolic_validation, mode=mode)
+        analysis(p, initial_storage, sym_validation =symbolic_validation, mode=mode, jobs=args.jobs, store=store)
             
     
 if __name__ == '__main__':
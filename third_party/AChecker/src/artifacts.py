@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import zlib
+
+# bump when the CFG, SSA, memory or storage classes change
+FORMAT_VERSION = 1
+MAGIC = b'ACHK'
+
+
+class Artifacts(object):
+    """
+    Preprocessing results of a runtime bytecode.
+    memory_info and storage_info are keyed by the instructions of cfg, they are stored together.
+    """
+    def __init__(self, code, cfg, ssa, memory_info, storage_info):
+        self.code = code
+        self.cfg = cfg
+        self.ssa = ssa
+        self.memory_info = memory_info
+        self.storage_info = storage_info
+
+
+def code_hash(code):
+    return hashlib.sha256(code).hexdigest()
+
+
+class ArtifactStore(object):
+    """
+    On-disk Artifacts keyed by the sha256 of the runtime bytecode,
+    one zlib-compressed pickle per bytecode.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, code):
+        h = code_hash(code)
+        return os.path.join(self.path, h[:2], h + '.bin')
+
+    def get(self, code):
+        path = self._file(code)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        header = MAGIC + bytes([FORMAT_VERSION])
+        try:
+            if not data.startswith(header):
+                raise ValueError('unsupported format')
+            artifacts = pickle.loads(zlib.decompress(data[len(header):]))
+            if artifacts.code != code:
+                raise ValueError('bytecode mismatch')
+        except Exception as e:
+            logging.warning('Ignoring artifacts %s: %s', path, e)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return artifacts
+
+    def put(self, artifacts):
+        path = self._file(artifacts.code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(
+            pickle.dumps(artifacts, protocol=pickle.HIGHEST_PROTOCOL))
+        # concurrent runs on the same bytecode write the same content, last rename wins
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -1,4 +1,5 @@
 import logging
+from array import array
 from collections import deque
 from src.cfg.bb import BB
 import src.cfg.rattle as rattle
@@ -9,11 +10,15 @@ import time
 from collections import defaultdict
 from src.evm.exceptions import TimeoutException
 
+UNREACHABLE = 0xffffffff
+
 
 class CFG(object):
     def __init__(self, bbs, fix_xrefs=True, fix_only_easy_xrefs=False):
         self.bbs = sorted(bbs)
         self._bb_at = {bb.start: bb for bb in self.bbs}
+        # dense BB ids for the distance arrays, kept by trim()
+        self._bb_id = {bb.start: i for i, bb in enumerate(self.bbs)}
         self._ins_at = {i.addr: i for bb in self.bbs for i in bb.ins}
         self.root = self._bb_at[0]
         self.valid_jump_targets = frozenset({bb.start for bb in self.bbs if bb.ins[0].name == 'JUMPDEST'})
@@ -24,6 +29,7 @@ class CFG(object):
                 raise TimeoutException("Timed out!")
         self._dominators = None
         self._dd = dict()
+        self._distances = dict()
 
     @property
     def bb_addrs(self):
@@ -175,6 +181,32 @@ class CFG(object):
                     bb.add_succ(succ, path)
         return cfg
 
+    def distances_to(self, bb):
+        """
+        Branch distance from every BB to bb, indexed by BB id (UNREACHABLE if bb can't be reached).
+        Reverse 0-1 BFS, an edge costs 1 if it leaves a BB with more than one successor.
+        """
+        if bb.start in self._distances:
+            return self._distances[bb.start]
+        bb_id = self._bb_id
+        dist = array('I', [UNREACHABLE]) * len(bb_id)
+        dist[bb_id[bb.start]] = 0
+        todo = deque([bb])
+        while todo:
+            b = todo.popleft()
+            d = dist[bb_id[b.start]]
+            for p in b.pred:
+                w = 1 if len(p.succ) > 1 else 0
+                pid = bb_id[p.start]
+                if d + w < dist[pid]:
+                    dist[pid] = d + w
+                    if w:
+                        todo.append(p)
+                    else:
+                        todo.appendleft(p)
+        self._distances[bb.start] = dist
+        return dist
+
     @staticmethod
     def distance_map(ins):
         dm = dict()
@@ -191,8 +223,6 @@ class CFG(object):
     """ Added code start here"""
 
     def to_ssa(self, code:bytes, minimal=False):          
-        sys.setrecursionlimit(10000)
-
         edges = []
         ssa = rattle.Recover(code, edges=edges, split_functions=False)        
         
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import binascii
+import bisect
 import copy
 
 import cbor2
@@ -16,6 +17,7 @@ class InternalRecover(object):
     functions: List[SSAFunction]
     edges: List[Tuple[int, int]]
     insns: Dict[int, EVMAsm.EVMInstruction]
+    pcs: List[int]
 
     def __init__(self, filedata: bytes, edges: List[Tuple[int, int]], optimize=False, split_functions=True) -> None:
         logger.debug(f'{len(filedata)} bytes of input data')
@@ -27,12 +29,16 @@ class InternalRecover(object):
         self.functions = [dispatch, ]
         self.edges = edges
 
-        self.recover(dispatch)
+        try:
+            self.recover(dispatch)
 
-        if optimize:
-            self.optimize()
+            if optimize:
+                self.optimize()
 
-        self.guarenteed_optimizations()
+            self.guarenteed_optimizations()
+        finally:
+            # the values are only needed by the optimizations, don't keep them alive across recoveries
+            concrete_values.clear()
 
         if split_functions:
             self.split_functions(dispatch)
@@ -109,6 +115,8 @@ class InternalRecover(object):
 
     def recover_loop(self, function: SSAFunction) -> None:
         function.clear()
+        # values of the previous attempt belong to the cleared instructions
+        concrete_values.clear()
         self.repopulate_blocks(function)
 
         for block in function:
@@ -164,6 +172,7 @@ class InternalRecover(object):
 
         insns = list(EVMAsm.disassemble_all(binascii.unhexlify(self.filedata), 0))
         self.insns = {x.pc: x for x in insns}
+        self.pcs = sorted(self.insns)
 
         blocks_set: Set[int] = set()
         blocks_set.add(0)  # First insn starts a block
@@ -187,7 +196,7 @@ class InternalRecover(object):
             else:
                 end = max_pc
 
-            for idx in [x.pc for x in insns if start <= x.pc < end]:
+            for idx in self.pcs_between(start, end):
                 block.insns.append(SSAInstruction(self.insns[idx], block))
 
             block.end = end
@@ -199,7 +208,7 @@ class InternalRecover(object):
             terminator: SSAInstruction = block.insns[-1]
 
             if terminator.insn.name == "JUMPI" or not terminator.insn.is_terminator:                                 
-                if (terminator.offset + terminator.insn.size) in blocks_list:
+                if (terminator.offset + terminator.insn.size) in blocks_set:
                     block.set_fallthrough_target(terminator.offset + terminator.insn.size)
 
     def repopulate_blocks(self, function: SSAFunction) -> None:
@@ -207,8 +216,11 @@ class InternalRecover(object):
             start = block.offset
             end = block.end
 
-            for insn in [insn for pc, insn in self.insns.items() if start <= pc < end]:
-                block.insns.append(SSAInstruction(insn, block))
+            for pc in self.pcs_between(start, end):
+                block.insns.append(SSAInstruction(self.insns[pc], block))
+
+    def pcs_between(self, start: int, end: int) -> List[int]:
+        return self.pcs[bisect.bisect_left(self.pcs, start):bisect.bisect_left(self.pcs, end)]
 
     def resolve_xrefs(self, function: SSAFunction) -> bool:
         dirty = False
@@ -479,22 +491,24 @@ class InternalRecover(object):
                 def find_exits(start: SSABasicBlock, end: SSABasicBlock) -> None:
                     blocks.add(end)
 
-                    if start.fallthrough_edge == end:
-                        return
+                    todo: List[SSABasicBlock] = [start]
+                    while todo:
+                        start = todo.pop()
 
-                    if end in start.jump_edges:
-                        return
+                        if start.fallthrough_edge == end:
+                            continue
 
-                    if start in blocks:
-                        return
+                        if end in start.jump_edges:
+                            continue
 
-                    blocks.add(start)
+                        if start in blocks:
+                            continue
 
-                    if start.fallthrough_edge:
-                        find_exits(start.fallthrough_edge, end)
+                        blocks.add(start)
 
-                    for jump in start.jump_edges:
-                        find_exits(jump, end)
+                        todo.extend(start.jump_edges)
+                        if start.fallthrough_edge:
+                            todo.append(start.fallthrough_edge)
 
                 for start in starts:
                     find_exits(start, insn.parent_block)
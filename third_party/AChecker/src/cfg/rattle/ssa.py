@@ -10,6 +10,7 @@ from .hashes import hashes
 
 logger = logging.getLogger(__name__)
 
+# ConcreteStackValues created by the running recovery, see InternalRecover
 concrete_values: List['ConcreteStackValue'] = []
 
 
@@ -43,7 +44,10 @@ class InternalCallOp(EVMAsm.EVMInstruction):
 
 
 class StackValue(object):
-    _writer: Optional['SSAInstruction'] = None
+    # there is one per stack slot and instruction, keep them small
+    __slots__ = ('value', '_writer', '_readers')
+
+    _writer: Optional['SSAInstruction']
     _readers: Set['SSAInstruction']
 
     def __init__(self, value: int) -> None:
@@ -79,11 +83,17 @@ class StackValue(object):
 
     def filtered_readers(self, filt: Callable[['SSAInstruction'], bool]) -> Set['SSAInstruction']:
         rv: Set['SSAInstruction'] = set()
-        for reader in self.readers():
-            if not filt(reader) and reader.return_value:
-                rv |= reader.return_value.filtered_readers(filt)
-            else:
-                rv.add(reader)
+        seen: Set[int] = {id(self)}
+        todo: List['StackValue'] = [self]
+        while todo:
+            for reader in todo.pop().readers():
+                value = reader.return_value
+                if not filt(reader) and value:
+                    if id(value) not in seen:
+                        seen.add(id(value))
+                        todo.append(value)
+                else:
+                    rv.add(reader)
 
         return rv
 
@@ -92,6 +102,8 @@ class StackValue(object):
 
 
 class ConcreteStackValue(StackValue):
+    __slots__ = ('concrete_value', 'coming_from')
+
     def __init__(self, value: int, insn: int= None) -> None:
         self.concrete_value = int(value)        
         self.coming_from = insn
@@ -99,9 +111,6 @@ class ConcreteStackValue(StackValue):
 
         concrete_values.append(self)
 
-    def __del__(self) -> None:
-        concrete_values.remove(self)
-
     def __repr__(self) -> str:
         return f"#{self.concrete_value:x}"
 
@@ -120,13 +129,16 @@ class ConcreteStackValue(StackValue):
 
 
 class PlaceholderStackValue(StackValue):
+    __slots__ = ('sp', 'block', 'resolving')
+
     sp: int
     block: 'SSABasicBlock'
-    resolving: bool = False
+    resolving: bool
 
     def __init__(self, sp: int, block: 'SSABasicBlock') -> None:
         self.sp = sp
         self.block = block
+        self.resolving = False
         super().__init__(-1)
 
     def __repr__(self) -> str:
@@ -141,7 +153,38 @@ class PlaceholderStackValue(StackValue):
         return hash((self.sp, self.block))
 
     def resolve(self) -> Tuple[StackValue, bool]:
-        # Resolve!
+        # Resolving a slot may need the slots of the predecessors, resolved to any depth.
+        # The frames are generators that yield the slots they need, driven with an explicit stack.
+        stack = [self._resolve()]
+        result = None
+        error = None
+        while True:
+            try:
+                if error is None:
+                    slot = stack[-1].send(result)
+                else:
+                    slot = stack[-1].throw(error)
+                    error = None
+            except StopIteration as e:
+                stack.pop()
+                if not stack:
+                    return e.value
+                result = e.value
+                continue
+            except Exception as e:
+                # raise it in the frame that asked for the slot
+                stack.pop()
+                if not stack:
+                    raise
+                error = e
+                continue
+            if isinstance(slot, PlaceholderStackValue):
+                stack.append(slot._resolve())
+                result = None
+            else:
+                result = slot.resolve()
+
+    def _resolve(self) -> Iterator[StackValue]:
         # print(f"Resolving placeholder {self}")
 
         if self.resolving:
@@ -170,7 +213,7 @@ class PlaceholderStackValue(StackValue):
                 return self, False
 
             if isinstance(new_slot, PlaceholderStackValue):
-                rv = new_slot.resolve()
+                rv = yield new_slot
                 self.resolving = False
                 return rv
 
@@ -197,7 +240,7 @@ class PlaceholderStackValue(StackValue):
                 edge_stack: List[StackValue] = edge.stack
                 try:
                     new_slot = edge_stack[self.sp]
-                    new_slot, _ = new_slot.resolve()  # Resolve it as far as you can
+                    new_slot, _ = yield new_slot  # Resolve it as far as you can
                 except IndexError:
                     ''' 
                     Parent block doesn't have enough stack slots so i guess it should go higher up the call stack,
@@ -234,12 +277,14 @@ class PlaceholderStackValue(StackValue):
 
 
 class SSAInstruction(object):
+    __slots__ = ('insn', 'offset', 'arguments', 'parent_block', '_return_value', 'comment')
+
     insn: EVMAsm.EVMInstruction
     offset: int
     arguments: List[StackValue]
     parent_block: 'SSABasicBlock'
     _return_value: Optional[StackValue]
-    comment = None
+    comment: Optional[str]
 
     def __init__(self, evminsn: EVMAsm.EVMInstruction, parent_block: 'SSABasicBlock') -> None:
         self.insn = evminsn
@@ -247,6 +292,7 @@ class SSAInstruction(object):
         self._return_value = None
         self.offset = evminsn.pc
         self.parent_block = parent_block
+        self.comment = None
 
     def __repr__(self) -> str:
         rv: str = ''
@@ -612,14 +658,17 @@ class SSAFunction(object):
             extracted = set()
 
         extracted.add(start)
-        if start.fallthrough_edge and start.fallthrough_edge not in extracted:
-            extracted.add(start.fallthrough_edge)
-            extracted |= self.trace_blocks(start.fallthrough_edge, extracted)
-
-        for BB in start.jump_edges:
-            if BB not in extracted:
-                extracted.add(BB)
-                extracted |= self.trace_blocks(BB, extracted)
+        todo: List[SSABasicBlock] = [start]
+        while todo:
+            block = todo.pop()
+            if block.fallthrough_edge and block.fallthrough_edge not in extracted:
+                extracted.add(block.fallthrough_edge)
+                todo.append(block.fallthrough_edge)
+
+            for BB in block.jump_edges:
+                if BB not in extracted:
+                    extracted.add(BB)
+                    todo.append(BB)
 
         return extracted
 
@@ -102,22 +102,135 @@ def symread_substitute(x, subst):
         return new_symread
 
 
-def check_model_and_resolve(constraints, sha_constraints):
+class SolverSession(object):
+    """
+    Incremental solver shared by the path validations of a contract.
+    A query is a sequence of constraint groups, e.g. background, path and exploit constraints.
+    The push levels asserted for an earlier query are kept as long as they are a prefix of the
+    next one, so shared constraints are only asserted once.
+    Every constraint is tracked by a literal, the unsat cores of failed queries are kept and
+    a later query containing one of them is rejected without a solve.
+    """
+
+    def __init__(self, max_tracked=50000):
+        self.max_tracked = max_tracked
+        self.checks = 0
+        self.pruned = 0
+        self.reset()
+
+    def reset(self):
+        self.solver = z3.SolverFor("QF_ABV")
+        # constraint ids asserted at each push level
+        self._levels = []
+        # constraint id -> (literal, constraint), holding the constraint keeps its id from being reused
+        self._tracked = dict()
+        self._literals = dict()
+        # smallest constraint id of a core -> cores
+        self._cores = defaultdict(list)
+
+    def _track(self, c):
+        if not z3.is_expr(c):
+            c = z3.BoolVal(c)
+        cid = c.get_id()
+        if cid not in self._tracked:
+            literal = z3.Bool('track!%d' % cid)
+            self._tracked[cid] = (literal, c)
+            self._literals[literal.get_id()] = cid
+        return cid
+
+    def _known_unsat(self, ids):
+        for cid in ids:
+            for core in self._cores.get(cid, ()):
+                if core <= ids:
+                    return True
+        return False
+
+    def _push(self, level):
+        self.solver.push()
+        for cid in level:
+            literal, c = self._tracked[cid]
+            self.solver.add(z3.Implies(literal, c))
+        self._levels.append(level)
+
+    def check(self, *groups):
+        if len(self._tracked) > self.max_tracked:
+            self.reset()
+        ids = []
+        bounds = []
+        seen = set()
+        for group in groups:
+            for c in group:
+                cid = self._track(c)
+                if cid not in seen:
+                    seen.add(cid)
+                    ids.append(cid)
+            bounds.append(len(ids))
+
+        if self._known_unsat(seen):
+            self.pruned += 1
+            return z3.unsat
+
+        # keep the levels that are a prefix of the query
+        pos = 0
+        keep = 0
+        for level in self._levels:
+            if tuple(ids[pos:pos + len(level)]) != level:
+                break
+            pos += len(level)
+            keep += 1
+        if keep < len(self._levels):
+            # and the common part of the first one that is not
+            level = self._levels[keep]
+            common = 0
+            while common < len(level) and pos + common < len(ids) and level[common] == ids[pos + common]:
+                common += 1
+            self.solver.pop(len(self._levels) - keep)
+            del self._levels[keep:]
+            if common:
+                self._push(level[:common])
+                pos += common
+        for bound in bounds:
+            if bound > pos:
+                self._push(tuple(ids[pos:bound]))
+                pos = bound
+
+        self.checks += 1
+        result = self.solver.check(*[self._tracked[cid][0] for cid in ids])
+        if result == z3.unsat:
+            core = frozenset(self._literals[literal.get_id()] for literal in self.solver.unsat_core())
+            if core:
+                self._cores[min(core)].append(core)
+        return result
+
+    def model(self):
+        return self.solver.model()
+
+
+def check_model_and_resolve(constraints, sha_constraints, session=None, background=()):
     try:
-        return check_model_and_resolve_inner(constraints, sha_constraints)
+        return check_model_and_resolve_inner(constraints, sha_constraints, session=session, background=background)
     except UnresolvedConstraints:
         sha_ids = {sha.get_id() for sha in sha_constraints.keys()}
         constraints = [simplify_non_const_hashes(c, sha_ids) for c in constraints]
-        return check_model_and_resolve_inner(constraints, sha_constraints, second_try=True)
+        return check_model_and_resolve_inner(constraints, sha_constraints, second_try=True, session=session,
+                                             background=background)
 
-def check_model_and_resolve_inner(constraints, sha_constraints, second_try=False):    
+
+def check_sat(constraints, session=None, background=(), extra=()):
+    if session is None:
+        s = z3.SolverFor("QF_ABV")
+        s.add(list(background) + list(constraints) + list(extra))
+        return s.check(), s
+    return session.check(background, constraints, extra), session
+
+
+def check_model_and_resolve_inner(constraints, sha_constraints, second_try=False, session=None, background=()):
     # logging.debug('-' * 32)
     extra_constraints = []
-    s = z3.SolverFor("QF_ABV")
-    s.add(constraints)        
-    if s.check() != z3.sat:                
+    check_result, s = check_sat(constraints, session, background)
+    if check_result != z3.sat:
         raise IntractablePath("CHECK", "MODEL")
-    else:                
+    else:
         if not sha_constraints:
             return s.model()
     while True:       
@@ -127,10 +240,9 @@ def check_model_and_resolve_inner(constraints, sha_constraints, second_try=False
                     sha_constraints[a].size() != sha_constraints[b].size()):
                 ne_constraints.append(a != b)
                 continue
-            s = z3.SolverFor("QF_ABV")
-            s.add(constraints + ne_constraints + extra_constraints + [a != b, symread_neq(sha_constraints[a],
-                                                                                          sha_constraints[b])])
-            check_result = s.check()
+            check_result, _ = check_sat(constraints, session, background,
+                                        ne_constraints + extra_constraints + [a != b, symread_neq(sha_constraints[a],
+                                                                                                  sha_constraints[b])])
             # logging.debug("Checking hashes %s and %s: %s", a, b, check_result)
             if check_result == z3.unsat:
                 # logging.debug("Hashes MUST be equal: %s and %s", a, b)
@@ -151,7 +263,8 @@ def check_model_and_resolve_inner(constraints, sha_constraints, second_try=False
         else:
             break
 
-    return check_and_model(constraints + extra_constraints, sha_constraints, ne_constraints, second_try=second_try)
+    return check_and_model(list(background) + constraints + extra_constraints, sha_constraints, ne_constraints,
+                           second_try=second_try)
 
 
 def check_and_model(constraints, sha_constraints, ne_constraints, second_try=False):
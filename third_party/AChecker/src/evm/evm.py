@@ -9,6 +9,7 @@ from z3 import z3
 import src.util.utils
 from src.evm.exceptions import ExternalData, SymbolicError, IntractablePath, VMException
 from src.evm.results import SymbolicResult, gen_exec_id
+from src.evm.snapshot import Snapshot
 from src.evm.state import SymRead, EVMState, SymbolicEVMState
 from src.util.z3_extra_util import concrete, is_true
 
@@ -296,13 +297,50 @@ def ctx_or_symbolic(v, ctx, xid):
 def addr(expr):
     return expr & (2 ** 160 - 1)
 
-def run_symbolic(program, path, code=None, state=None, ctx=None, inclusive=False, mode=None, code_path=None, ac_jumpi=None):
+def prefix_keys(program, path, inclusive=False, mode=None, code_path=None, ac_jumpi=None):
+    """
+    Snapshot keys of the path prefixes ending at a block with a JUMPI, by prefix length.
+    The state at the entry of a block only depends on the blocks before it, the jump into it
+    and, for FIntendedB, on which of these blocks are in code_path.
+    """
+    base = (inclusive, mode, tuple(sorted(ac_jumpi or ())))
+    code_path = set(code_path or ())
+    keys = dict()
+    prefix = []
+    for pc in path[:-1]:
+        prefix.append((pc, pc in code_path))
+        if pc in program and program[pc].bb is not None and program[pc].bb.ins[-1].name == 'JUMPI':
+            keys[len(prefix)] = (base, tuple(prefix))
+    return keys
+
+
+def run_symbolic(program, path, code=None, state=None, ctx=None, inclusive=False, mode=None, code_path=None, ac_jumpi=None, snapshots=None):
     MAX_CALLDATA_SIZE = 256
-    xid = gen_exec_id()
-    state = state or SymbolicEVMState(xid=xid, code=code)
+    snapshot_keys = dict()
+    snapshot = None
+    if snapshots is not None and state is None and ctx is None:
+        snapshot_keys = prefix_keys(program, path, inclusive, mode, code_path, ac_jumpi)
+        length, snapshot = snapshots.longest_prefix(sorted(snapshot_keys.items()))
+    path_length = len(path)
+    if snapshot is None:
+        xid = gen_exec_id()
+        state = state or SymbolicEVMState(xid=xid, code=code)
+        constraints = []
+        sha_constraints = dict()
+        calldata_accesses = [0]
+        instruction_count = 0
+        pib = False
+    else:
+        # resume at the entry of the last block of the prefix
+        xid = snapshot.xid
+        state = snapshot.state
+        constraints = snapshot.constraints
+        sha_constraints = snapshot.sha_constraints
+        calldata_accesses = snapshot.calldata_accesses
+        instruction_count = snapshot.instruction_count
+        pib = snapshot.pib
+        path = path[length - 1:]
     storage = state.storage
-    constraints = []
-    sha_constraints = dict()
     ctx = ctx or dict()
     min_timestamp = (datetime.datetime.now() - datetime.datetime(1970, 1, 1)).total_seconds()    
     # make sure we can exploit it in the foreseable future
@@ -310,14 +348,17 @@ def run_symbolic(program, path, code=None, state=None, ctx=None, inclusive=False
     ctx['CODESIZE-ADDRESS'] = len(code)
     calldata = z3.Array('CALLDATA_%d' % xid, z3.BitVecSort(256), z3.BitVecSort(8))
     calldatasize = z3.BitVec('CALLDATASIZE_%d' % xid, 256)
-    calldata_accesses = [0]
-    instruction_count = 0
-    state.balance += ctx_or_symbolic('CALLVALUE', ctx, xid)
-    pib=False
+    if snapshot is None:
+        state.balance += ctx_or_symbolic('CALLVALUE', ctx, xid)
     target_op = program[path[-1]].name
     #traget_fun = code_info(program,path)
 
     while state.pc in program:
+        if snapshot_keys and path and state.pc == path[0]:
+            key = snapshot_keys.get(path_length - len(path) + 1)
+            if key is not None and key not in snapshots:
+                snapshots.put(key, Snapshot(xid, state, constraints, sha_constraints, calldata_accesses,
+                                            instruction_count, pib))
         state.trace.append(state.pc)
         instruction_count += 1
 
@@ -581,11 +622,7 @@ def run_symbolic(program, path, code=None, state=None, ctx=None, inclusive=False
                 mstart, dstart, size = stk.pop(), stk.pop(), stk.pop()
                 if concrete(mstart) and concrete(dstart) and concrete(size):
                     mem.extend(mstart, size)
-                    for i in range(size):
-                        if dstart + i < len(state.code):
-                            mem[mstart + i] = state.code[dstart + i]
-                        else:
-                            mem[mstart + i] = 0
+                    mem.write(mstart, size, bytes(state.code[dstart:dstart + size]).ljust(size, b'\x00'))
                 else:
                     raise SymbolicError('Symbolic code index @ %s' % ins)
             elif op == 'RETURNDATACOPY':
@@ -634,27 +671,11 @@ def run_symbolic(program, path, code=None, state=None, ctx=None, inclusive=False
             elif op == 'MLOAD':
                 s0 = stk.pop()
                 mem.extend(s0, 32)
-                mm = [mem[s0 + i] for i in range(32)]
-                if all(concrete(m) for m in mm):
-                    stk.append(src.util.utils.bytes_to_int(mem.read(s0, 32)))
-                else:
-                    v = z3.simplify(z3.Concat([m if not concrete(m) else z3.BitVecVal(m, 8) for m in mm]))
-                    if z3.is_bv_value(v):
-                        stk.append(v.as_long())
-                    else:
-                        stk.append(v)
+                stk.append(mem.read_word(s0))
             elif op == 'MSTORE':
                 s0, s1 = stk.pop(), stk.pop()
                 mem.extend(s0, 32)
-                if concrete(s1):
-                    mem.write(s0, 32, src.util.utils.encode_int32(s1))
-                else:
-                    for i in range(32):
-                        m = z3.simplify(z3.Extract((31 - i) * 8 + 7, (31 - i) * 8, s1))
-                        if z3.is_bv_value(m):
-                            mem[s0 + i] = m.as_long()
-                        else:
-                            mem[s0 + i] = m
+                mem.write_word(s0, s1)
             elif op == 'MSTORE8':
                 s0, s1 = stk.pop(), stk.pop()
                 mem.extend(s0, 1)
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+
+class Snapshot(object):
+    def __init__(self, xid, state, constraints, sha_constraints, calldata_accesses, instruction_count, pib):
+        self.xid = xid
+        self.state = state
+        self.constraints = constraints
+        self.sha_constraints = sha_constraints
+        self.calldata_accesses = calldata_accesses
+        self.instruction_count = instruction_count
+        self.pib = pib
+
+    def clone(self):
+        return Snapshot(self.xid, self.state.clone(), list(self.constraints), dict(self.sha_constraints),
+                        list(self.calldata_accesses), self.instruction_count, self.pib)
+
+
+class SnapshotCache(object):
+    """
+    LRU of symbolic execution states at the entry of branching basic blocks,
+    keyed by the path prefix that led there.
+
+    Paths to different sinks share the dispatcher and modifiers, replaying a path
+    resumes from the deepest cached prefix instead of pc 0.
+    Results resumed from a snapshot keep the execution id (xid) of the run that took it,
+    they must not be combined with each other.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        snapshot = self._entries.get(key)
+        if snapshot is None:
+            return None
+        self._entries.move_to_end(key)
+        return snapshot.clone()
+
+    def put(self, key, snapshot):
+        self._entries[key] = snapshot.clone()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def longest_prefix(self, keys):
+        """(length, snapshot) of the longest cached prefix, keys are ordered by length"""
+        for length, key in reversed(keys):
+            snapshot = self.get(key)
+            if snapshot is not None:
+                self.hits += 1
+                return length, snapshot
+        self.misses += 1
+        return 0, None
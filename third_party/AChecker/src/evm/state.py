@@ -55,24 +55,85 @@ class Memory(object):
 
 class SymbolicMemory(object):
     MAX_SYMBOLIC_WRITE_SIZE = 256
+    # concrete addresses below are kept in a bytearray, the others in the sparse overlay
+    MAX_CONCRETE_SIZE = 1 << 20
 
     def __init__(self):
-        self.memory = z3.K(z3.BitVecSort(256), z3.BitVecVal(0, 8))
+        # concrete layer: dense bytes + sparse overlay of symbolic bytes (and far addresses),
+        # the z3 array is only used once an address is symbolic
+        self._dense = bytearray()
+        self._sparse = dict()
+        self._array = None
+        self._array_cache = None
         self.write_count = 0
         self.read_count = 0
 
+    @property
+    def memory(self):
+        """The memory as a z3 array"""
+        if self._array is not None:
+            return self._array
+        if self._array_cache is None:
+            array = z3.K(z3.BitVecSort(256), z3.BitVecVal(0, 8))
+            for i, b in enumerate(self._dense):
+                if b and i not in self._sparse:
+                    array = z3.Store(array, i, b)
+            for i, v in sorted(self._sparse.items()):
+                array = z3.Store(array, i, v)
+            self._array_cache = array
+        return self._array_cache
+
+    @memory.setter
+    def memory(self, array):
+        self._array = array
+        self._array_cache = None
+        self._dense = bytearray()
+        self._sparse = dict()
+
+    def _to_array(self):
+        if self._array is None:
+            self.memory = self.memory
+
+    def _dense_writable(self, start, size):
+        return self._array is None and concrete(start) and start + size <= self.MAX_CONCRETE_SIZE
+
+    def _in_dense(self, start, size):
+        """Whether [start, start + size) only has concrete bytes of the dense layer"""
+        if self._array is not None or not concrete(start) or start + size > self.MAX_CONCRETE_SIZE:
+            return False
+        if self._sparse:
+            return not any(i in self._sparse for i in range(start, start + size))
+        return True
+
     def __getitem__(self, index):
         if isinstance(index, slice):
             if index.stop is None:
                 raise ValueError("Need upper memory address!")
             if (index.start is not None and not concrete(index.start)) or not concrete(index.stop):
                 raise SymbolicError("Use mem.read for symbolic range reads")
+            start = index.start or 0
+            if (index.step or 1) == 1 and self._in_dense(start, index.stop - start):
+                self.read_count += index.stop - start
+                r = list(self._dense[start:index.stop])
+                return r + [0] * (index.stop - start - len(r))
             r = []
-            for i in range(index.start or 0, index.stop, index.step or 1):
+            for i in range(start, index.stop, index.step or 1):
                 r.append(self[i])
             return r
         else:
             self.read_count += 1
+            index = _concrete_index(index)
+            if self._array is None and concrete(index):
+                if index in self._sparse:
+                    v = self._sparse[index]
+                    if concrete(v):
+                        return v
+                    v = z3.simplify(v)
+                    if z3.is_bv_value(v):
+                        v = v.as_long()
+                    self._sparse[index] = v
+                    return v
+                return self._dense[index] if index < len(self._dense) else 0
             v = z3.simplify(self.memory[index])
             if z3.is_bv_value(v):
                 return v.as_long()
@@ -85,19 +146,52 @@ class SymbolicMemory(object):
                 raise ValueError("Need upper memory address!")
             if (index.start is not None and not concrete(index.start)) or not concrete(index.stop):
                 raise SymbolicError("Use mem.write for symbolic range writes")
-            for j, i in enumerate(range(index.start or 0, index.stop, index.step or 1)):
+            start = index.start or 0
+            if (index.step or 1) == 1 and self._dense_writable(start, index.stop - start):
+                if isinstance(v, (bytes, bytearray)):
+                    self._write_dense(start, v)
+                    return
+                if all(concrete(b) for b in v):
+                    self._write_dense(start, bytes(b & 0xff for b in v))
+                    return
+            for j, i in enumerate(range(start, index.stop, index.step or 1)):
                 self[i] = v[j]
         else:
             self.write_count += 1
             if isinstance(v, str):
                 v = ord(v)
-
-            if concrete(v):
-                old_v = self[index]
-                if not concrete(old_v) or old_v != v:
-                    self.memory = z3.Store(self.memory, index, v)
+            index = _concrete_index(index)
+            if not concrete(index):
+                self._to_array()
+            if self._array is not None:
+                if concrete(v):
+                    old_v = self[index]
+                    if not concrete(old_v) or old_v != v:
+                        self._array = z3.Store(self._array, index, v)
+                else:
+                    self._array = z3.Store(self._array, index, v)
+                return
+            self._array_cache = None
+            if concrete(v) and index < self.MAX_CONCRETE_SIZE:
+                self._sparse.pop(index, None)
+                if index >= len(self._dense):
+                    if not v:
+                        return
+                    self._dense.extend(bytes(index + 1 - len(self._dense)))
+                self._dense[index] = v & 0xff
             else:
-                self.memory = z3.Store(self.memory, index, v)
+                self._sparse[index] = v & 0xff if concrete(v) else v
+
+    def _write_dense(self, start, data):
+        self.write_count += len(data)
+        self._array_cache = None
+        end = start + len(data)
+        if self._sparse:
+            for i in range(start, end):
+                self._sparse.pop(i, None)
+        if end > len(self._dense):
+            self._dense.extend(bytes(end - len(self._dense)))
+        self._dense[start:end] = data
 
     def read(self, start, size):
         if concrete(start) and concrete(size):
@@ -110,6 +204,37 @@ class SymbolicMemory(object):
             return SymRead(sym_mem, start, size)
             # raise SymbolicError("Read of symbolic length")
 
+    def read_word(self, start):
+        """MLOAD, the 32 bytes at start as an int if they are concrete, otherwise a simplified expression"""
+        start = _concrete_index(start)
+        if self._in_dense(start, 32):
+            self.read_count += 32
+            return int.from_bytes(self._dense[start:start + 32].ljust(32, b'\x00'), 'big')
+        mm = [self[start + i] for i in range(32)]
+        if all(concrete(m) for m in mm):
+            return int.from_bytes(bytes(mm), 'big')
+        v = z3.simplify(z3.Concat([m if not concrete(m) else z3.BitVecVal(m, 8) for m in mm]))
+        if z3.is_bv_value(v):
+            return v.as_long()
+        return v
+
+    def write_word(self, start, v):
+        """MSTORE, a concrete value is written to the dense layer at once"""
+        start = _concrete_index(start)
+        if concrete(v):
+            data = (v % 2 ** 256).to_bytes(32, 'big')
+            if self._dense_writable(start, 32):
+                self._write_dense(start, data)
+            else:
+                self.write(start, 32, data)
+        else:
+            for i in range(32):
+                m = z3.simplify(z3.Extract((31 - i) * 8 + 7, (31 - i) * 8, v))
+                if z3.is_bv_value(m):
+                    self[start + i] = m.as_long()
+                else:
+                    self[start + i] = m
+
     def copy(self, istart, ilen, ostart, olen):
         if concrete(ilen) and concrete(olen):
             self.write(ostart, olen, self.read(istart, min(ilen, olen)) + [0] * max(olen - ilen, 0))
@@ -137,6 +262,24 @@ class SymbolicMemory(object):
     def extend(self, start, size):
         pass
 
+    def clone(self):
+        new_memory = SymbolicMemory()
+        new_memory._dense = bytearray(self._dense)
+        new_memory._sparse = dict(self._sparse)
+        new_memory._array = self._array
+        new_memory._array_cache = self._array_cache
+        new_memory.write_count = self.write_count
+        new_memory.read_count = self.read_count
+        return new_memory
+
+
+def _concrete_index(index):
+    if concrete(index):
+        return index % 2 ** 256
+    if z3.is_bv_value(index):
+        return index.as_long()
+    return index
+
 
 class SymRead(object):
     def __init__(self, memory, start, size):
@@ -184,6 +327,14 @@ class SymbolicStorage(object):
     def all(self):
         return [a for t, a in self.accesses]
 
+    def clone(self):
+        # same execution, the z3 terms are shared
+        new_storage = SymbolicStorage.__new__(SymbolicStorage)
+        new_storage.base = self.base
+        new_storage.storage = self.storage
+        new_storage.accesses = list(self.accesses)
+        return new_storage
+
     def copy(self, new_xid):
         new_storage = SymbolicStorage(new_xid)
         new_storage.base = translate(self.base, new_xid)
@@ -232,6 +383,21 @@ class SymbolicEVMState(AbstractEVMState):
         new_state.balance = translate(self.balance, new_xid)
         return new_state
 
+    def clone(self):
+        # Make a deep copy of this state in the same execution (same xid),
+        # to resume it later from a snapshot
+        new_state = SymbolicEVMState.__new__(SymbolicEVMState)
+        new_state.code = self.code
+        new_state.pc = self.pc
+        new_state.stack = Stack(self.stack)
+        new_state.memory = self.memory.clone()
+        new_state.storage = self.storage.clone()
+        new_state.trace = list(self.trace)
+        new_state.gas = self.gas
+        new_state.start_balance = self.start_balance
+        new_state.balance = self.balance
+        return new_state
+
 
 class LazySubstituteState(object):
     def __init__(self, state, substitutions):
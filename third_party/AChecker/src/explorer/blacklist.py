@@ -0,0 +1,87 @@
+from collections import deque
+
+
+class PathBlacklist(object):
+    """
+    Aho-Corasick automaton over sequences of BB addresses.
+    A path is blacklisted if it contains one of the added sequences as a substring.
+
+    Paths are matched incrementally, one BB at a time, with step().
+    Adding a sequence bumps version, a node obtained under an older version must be
+    recomputed with scan() since the failure links have changed.
+    """
+
+    def __init__(self):
+        self._goto = [dict()]
+        self._fail = [0]
+        self._out = [False]
+        self._paths = set()
+        self._dirty = False
+        self.version = 0
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, path):
+        return tuple(path) in self._paths
+
+    def add(self, path):
+        path = tuple(path)
+        if not path or path in self._paths:
+            return False
+        self._paths.add(path)
+        node = 0
+        for bb in path:
+            nxt = self._goto[node].get(bb)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append(dict())
+                self._fail.append(0)
+                self._out.append(False)
+                self._goto[node][bb] = nxt
+            node = nxt
+        self._out[node] = True
+        self._dirty = True
+        self.version += 1
+        return True
+
+    def _build(self):
+        todo = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            todo.append(nxt)
+        while todo:
+            node = todo.popleft()
+            for bb, nxt in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and bb not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(bb, 0)
+                # a terminal suffix makes every longer match terminal
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+                todo.append(nxt)
+        self._dirty = False
+
+    def step(self, node, bb):
+        """node after appending bb to a path that ended in node"""
+        if self._dirty:
+            self._build()
+        goto = self._goto
+        while node and bb not in goto[node]:
+            node = self._fail[node]
+        return goto[node].get(bb, 0)
+
+    def matches(self, node):
+        return self._out[node]
+
+    def scan(self, path):
+        """(node, hit) of a whole path"""
+        node = 0
+        hit = False
+        for bb in path:
+            node = self.step(node, bb)
+            hit = hit or self._out[node]
+        return node, hit
@@ -1,7 +1,9 @@
+import heapq
 import logging
-from queue import PriorityQueue
+from array import array
 
-from src.util.utils import is_subseq, is_substr
+from src.explorer.blacklist import PathBlacklist
+from src.util.utils import is_subseq
 
 
 class ForwardExplorerState(object):
@@ -56,18 +58,38 @@ class ForwardExplorerState(object):
 
 class ForwardExplorer(object):
     def __init__(self, cfg, avoid=frozenset()):
+        # frozenset of target BBs => minimal distance to any of them, indexed by BB id
         self.dist_map = dict()
         self.cfg = cfg
-        self.blacklist = set()
+        self.blacklist = PathBlacklist()
 
     def add_to_blacklist(self, path):
-        self.blacklist.add(tuple(path))
+        self.blacklist.add(path)
+
+    def match_blacklist(self, state, parent=None):
+        """advance the blacklist automaton of state, rescan its path if the blacklist changed since"""
+        blacklist = self.blacklist
+        if parent is not None and parent.bl_version == blacklist.version:
+            state.bl_node = blacklist.step(parent.bl_node, state.bb.start)
+            state.bl_hit = parent.bl_hit or blacklist.matches(state.bl_node)
+        else:
+            state.bl_node, state.bl_hit = blacklist.scan(state.path)
+        state.bl_version = blacklist.version
+
+    def distances(self, targets):
+        dist = self.dist_map.get(targets)
+        if dist is None:
+            dists = [self.cfg.distances_to(self.cfg._bb_at[t]) for t in targets]
+            dist = dists[0] if len(dists) == 1 else array('I', map(min, *dists))
+            self.dist_map[targets] = dist
+        return dist
 
     def weight(self, state):
         if state.finished:
             return state.branches
         else:
-            return state.branches + min(self.dist_map[s[0].bb.start][state.bb] for s in state.slices)
+            targets = frozenset(s[0].bb.start for s in state.slices)
+            return state.branches + self.distances(targets)[self.cfg._bb_id[state.bb.start]]
 
     def find(self, slices, looplimit=2, avoid=frozenset(), prefix=None):    
         avoid = frozenset(avoid)
@@ -76,26 +98,20 @@ class ForwardExplorer(object):
         if not slices:            
             #raise StopIteration
             return 
-        # distance from a BB to instruction
-        for slice in slices:                        
-            for i in slice:               
-                if i.bb.start not in self.dist_map:
-                    self.dist_map[i.bb.start] = self.cfg.distance_map(i)
-                #print('%x' %i.bb.start)
-                #print(['%x' %d.start for d in self.dist_map[i.bb.start]])
-       
         if prefix is None:
             state = ForwardExplorerState(self.cfg.root, [], 0, slices)                        
         else:
             state = ForwardExplorerState(self.cfg._ins_at[prefix].bb, prefix, 0, slices)
         state.weight = self.weight(state)
+        self.match_blacklist(state)
         
-        todo = PriorityQueue()
-        todo.put(state)
+        todo = [state]
           
-        while not todo.empty():                                                
-            state = todo.get()            
-            if any(is_substr(pth, state.path) for pth in self.blacklist):
+        while todo:
+            state = heapq.heappop(todo)
+            if state.bl_version != self.blacklist.version:
+                self.match_blacklist(state)
+            if state.bl_hit:
                 logging.info("BLACKLIST hit for %s" % (', '.join('%x' % i for i in state.path)))
                 continue            
             if set(i.name for i in state.bb.ins) & avoid:                            
@@ -111,4 +127,5 @@ class ForwardExplorer(object):
                 continue
             for next_state in state.next_states():
                 next_state.weight = self.weight(next_state)
-                todo.put(next_state)
+                self.match_blacklist(next_state, state)
+                heapq.heappush(todo, next_state)
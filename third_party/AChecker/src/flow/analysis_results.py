@@ -28,6 +28,9 @@ class AnalysisBugDetails(object):
     def __init__(self,violated_ac_checks,missing_ac_checks,violated_ac_checks_ib):        
         self.violated_ac_checks = violated_ac_checks
         self.missing_ac_checks=missing_ac_checks
-        self.violated_ac_checks_ib = violated_ac_checks_ib        
-        
- 
\ No newline at end of file
+        self.violated_ac_checks_ib = violated_ac_checks_ib
+
+    def merge(self, other):
+        return AnalysisBugDetails(self.violated_ac_checks + other.violated_ac_checks,
+                                  self.missing_ac_checks + other.missing_ac_checks,
+                                  self.violated_ac_checks_ib + other.violated_ac_checks_ib)
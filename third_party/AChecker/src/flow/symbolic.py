@@ -63,7 +63,6 @@ def exploit_constraints_call(r, ctx):
     total_spent = None
     for res in r.results:
         callvalue = z3.BitVec('CALLVALUE_%d' % res.xid, 256)
-        extra_constraints.append(z3.ULE(callvalue, 10 * (10 ** 18)))  # keep it semi-reasonable: at most 10 Eth per call
         if total_spent is None:
             total_spent = callvalue
         else:
@@ -71,12 +70,21 @@ def exploit_constraints_call(r, ctx):
 
     extra_constraints.append(z3.ULT(total_spent, amount))
 
+    return extra_constraints
+
+
+def background_constraints_call(r, ctx):
+    background = []
+    for res in r.results:
+        callvalue = z3.BitVec('CALLVALUE_%d' % res.xid, 256)
+        background.append(z3.ULE(callvalue, 10 * (10 ** 18)))  # keep it semi-reasonable: at most 10 Eth per call
+
     # also, ensure the contract does not require a unreasonable start-balance (>100 Eth)
     if not ctx.initial_balance:
         start_balance = z3.BitVec('BALANCE_%d' % r.results[0].xid, 256)
-        extra_constraints.append(z3.ULE(start_balance, 100 * (10 ** 18)))
+        background.append(z3.ULE(start_balance, 100 * (10 ** 18)))
 
-    return extra_constraints
+    return background
 
 
 def exploit_constraints_callcode(r, ctx):
@@ -129,6 +137,12 @@ EXPLOIT_CONSTRAINTS = {
 }
 
 
+# bounds on the transactions themselves, the same for all the paths run in them
+BACKGROUND_CONSTRAINTS = {
+    'CALL': background_constraints_call,
+}
+
+
 def get_exploit_constraints(r, ctx):
     target_op = r.results[-1].target_op    
     if target_op in EXPLOIT_CONSTRAINTS:
@@ -137,6 +151,14 @@ def get_exploit_constraints(r, ctx):
         return []
 
 
+def get_background_constraints(r, ctx):
+    target_op = r.results[-1].target_op
+    if target_op in BACKGROUND_CONSTRAINTS:
+        return BACKGROUND_CONSTRAINTS[target_op](r, ctx)
+    else:
+        return []
+
+
 def control_address_constraints(sym_addr, controlled_addrs):
     sub_exprs = [sym_addr == controlled_addr for controlled_addr in controlled_addrs]
     expr = sub_exprs[0]
@@ -144,13 +166,14 @@ def control_address_constraints(sym_addr, controlled_addrs):
         expr = z3.Or(expr, sub_expr)    
     return expr
 
-def attempt_exploit(results, ctx):
+def attempt_exploit(results, ctx, session=None):
     c = CombinedSymbolicResult()
     for r in results[::-1]:        
         c.prepend(r)
     c.combine(ctx.initial_storage, ctx.initial_balance)
     c.simplify()
     extra_constraints = get_exploit_constraints(c, ctx)
+    background = get_background_constraints(c, ctx)
 
     for res in c.results:
         origin = z3.BitVec('ORIGIN_%d' % res.xid, 256)
@@ -160,7 +183,8 @@ def attempt_exploit(results, ctx):
         # and ensure the caller is either the origin or the shellcode address
         #extra_constraints.append(control_address_constraints(caller, {origin, ctx.shellcode_addr}))
     try:
-        model = check_model_and_resolve(c.constraints + extra_constraints, c.sha_constraints)
+        model = check_model_and_resolve(c.constraints + extra_constraints, c.sha_constraints, session=session,
+                                        background=background)
                 
         # enforce we control all ORIGIN-addresses
         if any(model[v].as_long() not in ctx.controlled_addrs for v in model if v.name().startswith('ORIGIN')):
@@ -203,14 +227,14 @@ def validate_path(p, path, mode=None, ac_jumpi=None):
     ctx = ExploitContext(target_addr, shellcode_addr, target_amount, amount_check, initial_balance, initial_storage,
                          controlled_addrs)
     try:        
-        symbolic_constr =p.run_symbolic(path, mode=mode, code_path=code_path, ac_jumpi=ac_jumpi)                                                                      
+        symbolic_constr =p.run_symbolic(path, mode=mode, code_path=code_path, ac_jumpi=ac_jumpi, share_prefix=True)                                                                      
     except TimeoutException:                
             raise TimeoutException("Timed out!")
     except Exception:
         return 'error', None
     critical_paths = []
     try:        
-        results = attempt_exploit([symbolic_constr], ctx)        
+        results = attempt_exploit([symbolic_constr], ctx, session=p.solver)
         if results:
             call, r, model = results
 
@@ -1,3 +1,4 @@
+import bisect
 import datetime
 import logging
 from collections import defaultdict
@@ -10,15 +11,67 @@ from src.evm.state import  EVMState, AbstractEVMState
 
 from src.cfg import opcodes
 
+class TaintedMemory(object):
+    """
+    Sorted disjoint byte ranges [start, end) of memory with the taint bits of their bytes.
+    The first taint of a byte is kept, later taints only fill the untainted gaps.
+    """
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._bits = []
+
+    def add(self, start, end, bits):
+        i = bisect.bisect_right(self._ends, start)
+        pos = start
+        gaps = []
+        while pos < end:
+            if i < len(self._starts) and self._starts[i] <= pos:
+                pos = self._ends[i]
+                i += 1
+                continue
+            gap_end = min(end, self._starts[i]) if i < len(self._starts) else end
+            gaps.append((pos, gap_end))
+            pos = gap_end
+        for gap_start, gap_end in gaps:
+            j = bisect.bisect_right(self._ends, gap_start)
+            self._starts.insert(j, gap_start)
+            self._ends.insert(j, gap_end)
+            self._bits.insert(j, bits)
+
+    def get(self, loc):
+        i = bisect.bisect_right(self._ends, loc)
+        if i < len(self._starts) and self._starts[i] <= loc:
+            return self._bits[i]
+        return None
+
+    def overlaps(self, start, end):
+        i = bisect.bisect_right(self._ends, start)
+        return i < len(self._starts) and self._starts[i] < end
+
+    def union(self, start, end):
+        bits = 0
+        i = bisect.bisect_right(self._ends, start)
+        while i < len(self._starts) and self._starts[i] < end:
+            bits |= self._bits[i]
+            i += 1
+        return bits
+
+
 class taint(object):
     def __init__(self):
-        self.tRegisters = []
-        self.tMemory = []
-        self.tStorage = []
+        # taint sources ({op: value} dicts) are interned, a taint is the bitset of their indices
+        self.sources = []
+        self._source_bits = {}
+        # register => bits, memory ranges => bits, storage slot => bits
+        self.tRegisters = {}
+        self.tMemory = TaintedMemory()
+        self.tStorage = {}
+        self._from_storage = 0
         self.memory = {}
         self.storage = {}
         self.registers = {}    
-        self.signed_memory =[]
+        self.signed_memory = set()
         self.sha3_bases = {}        
         self.slot_types ={}
         self.balance = dict()
@@ -35,151 +88,121 @@ class taint(object):
         self.blockhash = 0
         self.number = 0
         self.difficulty = 0
+
+    def source_bits(self, sources):
+        bits = 0
+        for source in sources:
+            key = tuple(source.items())
+            bit = self._source_bits.get(key)
+            if bit is None:
+                bit = 1 << len(self.sources)
+                self._source_bits[key] = bit
+                self.sources.append(source)
+                if any(k.split('-', 1)[0] == 'SLOAD' for k in source):
+                    self._from_storage |= bit
+            bits |= bit
+        return bits
+
+    def sources_of(self, bits):
+        sources = []
+        i = 0
+        while bits:
+            if bits & 1:
+                sources.append(self.sources[i])
+            bits >>= 1
+            i += 1
+        return sources
         
     def get_mem(self, start, size):        
-        tmp = []        
-        for k in range(start,size):            
-            tmp.append(self.memory.get(k,0))        
-        return tmp
+        memory = self.memory
+        return [memory.get(k, 0) for k in range(start, size)]
 
     def isTainted_register(self, reg, from_storage=False):        
         if reg._writer is None:
             return False        
-        
-        if not from_storage:            
-            if (reg._writer._return_value in [regs[0] for regs in self.tRegisters]):
-                return True
-            else:            
-                return False            
-        else:            
-            if (reg._writer._return_value in [regs[0] for regs in self.tRegisters if regs[1]!={} and 'SLOAD' in regs[1]]):
-                return True
-            else:            
-                return False            
+        bits = self.tRegisters.get(reg._writer._return_value)
+        if bits is None:
+            return False
+        return not from_storage or bool(bits & self._from_storage)
 
     def isTainted_memory(self, loc, size=1):
-        loc_range=range(loc, loc+size)                    
-        if len([locs[0] for locs in self.tMemory if locs[0] in loc_range])!=0:     
-            return True
-        else:
-            return False
+        return self.tMemory.overlaps(loc, loc + size)
         
     def isSha3_based(self, reg):                    
         if reg._writer is None:
             return False        
-
-        if (reg._writer._return_value in self.sha3_bases):     
-            return True
-        else:
-            return False
+        return reg._writer._return_value in self.sha3_bases
     
     def taint_register(self, reg, sources=[]):
-        self.tRegisters.append([reg,sources])        
+        self.taint_register_bits(reg, self.source_bits(sources))
+
+    def taint_register_bits(self, reg, bits):
+        # the first taint of a register is kept
+        self.tRegisters.setdefault(reg, bits)
+
+    def taint_memory(self, start, size, bits):
+        self.tMemory.add(start, start + size, bits)
+
+    def taint_storage(self, slot, bits):
+        self.tStorage.setdefault(slot, bits)
+
+    def get_reg_taint_bits(self, reg):
+        return self.tRegisters.get(reg._writer._return_value, 0)
 
     def get_reg_taint_source(self, reg):                     
-        try:
-            return [treg[1] for treg in self.tRegisters if treg[0]==reg._writer._return_value][0]
-        except IndexError:
-            return []
+        return self.sources_of(self.get_reg_taint_bits(reg))
 
     def get_mem_taint_source(self, loc,size=1):        
-        loc_range=range(loc, loc+size)
         if size==1:
-            return [tmem[1] for tmem in self.tMemory if tmem[0] in loc_range][0]
-        else:
-            t = [tmem[1] for tmem in self.tMemory if tmem[0] in loc_range]
-            return [j for i in t for j in i]
-
+            return self.sources_of(self.tMemory.get(loc))
+        return self.sources_of(self.tMemory.union(loc, loc + size))
 
     def get_reg_sha3_bases(self, reg):            
-        try:
-            return [base for treg, base in self.sha3_bases.items() if treg==reg._writer._return_value][0]
-        except IndexError:
-            return []
+        return self.sha3_bases.get(reg._writer._return_value, [])
 
     def get_reg_slot_type(self, reg):            
-        try:
-            return [stype for treg, stype in self.slot_types.items() if treg==reg._writer._return_value][0]
-        except IndexError:
-            return []
+        return self.slot_types.get(reg._writer._return_value, [])
+
+    def _tainted_args(self, is_tainted, arg1, arg2, arg3):
+        """the arguments whose taint goes to the result: all three, the first two or the first tainted"""
+        t1 = is_tainted(arg1)
+        t2 = arg2 is not None and is_tainted(arg2)
+        t3 = arg3 is not None and is_tainted(arg3)
+        if t1 and t2 and t3:
+            return (arg1, arg2, arg3)
+        if t1 and t2:
+            return (arg1, arg2)
+        if t1:
+            return (arg1,)
+        if t2:
+            return (arg2,)
+        if t3:
+            return (arg3,)
+        return ()
 
     def propagate_sha3_bases(self, reg, arg1, arg2=None, arg3=None):               
-        if arg3 is not None:
-            arg3_Sha3_based = self.isSha3_based(arg3)
-        else:
-            arg3_Sha3_based =False
-        if arg2 is not None:
-            arg2_Sha3_based = self.isSha3_based(arg2)
-        else:
-            arg2_Sha3_based=False
-        arg1_Sha3_based = self.isSha3_based(arg1)
-
-        if arg1_Sha3_based and arg2_Sha3_based and arg3_Sha3_based:                                        
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg1)+self.get_reg_sha3_bases(arg2)+self.get_reg_sha3_bases(arg3)                
-        elif arg1_Sha3_based and arg2_Sha3_based:                                                   
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg1)+self.get_reg_sha3_bases(arg2)
-        elif arg1_Sha3_based:                                        
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg1)
-        elif arg2_Sha3_based:                                        
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg2)
-        elif arg1_Sha3_based and arg3_Sha3_based:                                        
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg1)+self.get_reg_sha3_bases(arg3)
-        elif arg2_Sha3_based and arg3_Sha3_based:                                        
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg2)+self.get_reg_sha3_bases(arg3)
-        elif arg3_Sha3_based:                                        
-            self.sha3_bases[reg]=self.get_reg_sha3_bases(arg3)
+        args = self._tainted_args(self.isSha3_based, arg1, arg2, arg3)
+        if args:
+            bases = []
+            for arg in args:
+                bases = bases + self.get_reg_sha3_bases(arg)
+            self.sha3_bases[reg] = bases
         
     def propagate_slot_types(self, reg, arg1, arg2=None, arg3=None):               
-        if arg3 is not None:
-            arg3_Sha3_based = self.isSha3_based(arg3)
-        else:
-            arg3_Sha3_based =False
-        if arg2 is not None:
-            arg2_Sha3_based = self.isSha3_based(arg2)
-        else:
-            arg2_Sha3_based=False
-        arg1_Sha3_based = self.isSha3_based(arg1)
-
-        if arg1_Sha3_based and arg2_Sha3_based and arg3_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg1)+self.get_reg_slot_type(arg2)+self.get_reg_slot_type(arg3)                
-        elif arg1_Sha3_based and arg2_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg1)+self.get_reg_slot_type(arg2)
-        elif arg1_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg1)
-        elif arg2_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg2)
-        elif arg1_Sha3_based and arg3_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg1)+self.get_reg_slot_type(arg3)
-        elif arg2_Sha3_based and arg3_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg2)+self.get_reg_slot_type(arg3)
-        elif arg3_Sha3_based:                                        
-            self.slot_types[reg]=self.get_reg_slot_type(arg3)
+        args = self._tainted_args(self.isSha3_based, arg1, arg2, arg3)
+        if args:
+            slot_type = self.get_reg_slot_type(args[0])
+            for arg in args[1:]:
+                slot_type = slot_type + self.get_reg_slot_type(arg)
+            self.slot_types[reg] = slot_type
 
     def propagate_taint(self, reg, arg1, arg2=None, arg3=None):                    
-        if arg3 is not None:
-            arg3_tainted = self.isTainted_register(arg3)
-        else:
-            arg3_tainted=False
-        if arg2 is not None:
-            arg2_tainted = self.isTainted_register(arg2)
-        else:
-            arg2_tainted=False
-        arg1_tainted = self.isTainted_register(arg1)
-
-        if arg1_tainted and arg2_tainted and arg3_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg1)+(self.get_reg_taint_source(arg2))+(self.get_reg_taint_source(arg3)))               
-        elif arg1_tainted and arg2_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg1)+(self.get_reg_taint_source(arg2)))                
-        elif arg1_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg1))
-        elif arg2_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg2))
-        elif arg1_tainted and arg3_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg1)+(self.get_reg_taint_source(arg3)))                
-        elif arg2_tainted and arg3_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg2)+(self.get_reg_taint_source(arg3)))                
-        elif arg3_tainted:                                        
-            self.taint_register(reg,self.get_reg_taint_source(arg3))
+        args = self._tainted_args(self.isTainted_register, arg1, arg2, arg3)
+        if args:
+            bits = 0
+            for arg in args:
+                bits |= self.get_reg_taint_bits(arg)
+            self.taint_register_bits(reg, bits)
             
         self.propagate_sha3_bases(reg, arg1, arg2,arg3)
         self.propagate_slot_types(reg, arg1, arg2,arg3)
@@ -192,6 +215,24 @@ def addr(expr):
     return expr & (2 ** 160 - 1)
 
 
+def ssa_index(function):
+    """Instructions of the SSA function by block offset, and by offset within the block
+
+    Built once and kept on the function, it is released with it.
+    """
+    index = getattr(function, "_ssa_index", None)
+    if index is None:
+        block_insns = defaultdict(list)
+        block_insns_at = defaultdict(dict)
+        for block in function:
+            block_insns[block.offset].extend(block.insns)
+            for ssa_i in block.insns:
+                block_insns_at[block.offset].setdefault(ssa_i.offset, []).append(ssa_i)
+        ssa_offsets = frozenset(ssa_i.offset for insns in block_insns.values() for ssa_i in insns)
+        index = function._ssa_index = (block_insns, block_insns_at, ssa_offsets)
+    return index
+
+
 def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclusive=False, defect_type=None,storage_slots=None, storage_sha3_bases=None):    
     tnt =taint()
     state = state or AbstractEVMState(code=code) 
@@ -212,13 +253,15 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
     storage_slot_type ={}
     target_sink=program[path[-1]].name
     ssa_block =[]    
+    ssa_block_at = {}
     ssa_visited_blocks =[]
     all_visited_blocks =[]
     current_ssa_block =None
     current_block =None
     function = [f for f in ssa.functions][0]    
+    block_insns, block_insns_at, ssa_offsets = ssa_index(function)
 
-    path_ssa_ins_args=[arg for b in path for block in function if block.offset ==b for ins in block.insns for arg in ins.arguments if arg.writer is not None]                                                        
+    path_ssa_ins_args=[arg for b in path for ins in block_insns.get(b, ()) for arg in ins.arguments if arg.writer is not None]                                                        
 
     while state.pc in program:                        
         state.trace.append(state.pc)        
@@ -227,7 +270,7 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
         # have we reached the end of our path?
         if ((inclusive and len(path) == 0)
                 or (not inclusive and path == [state.pc])):                                                
-            ssa_ins =[s for s in ssa_block if s.offset ==state.pc]                             
+            ssa_ins = ssa_block_at.get(state.pc, [])                             
             
             if state.pc in sinks.keys():                                                                            
                 if defect_type in set(['Storage-Tainting']):                                                                                
@@ -258,7 +301,8 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
         # if not, have we reached another step of our path
         elif state.pc == path[0]:               
             ##get_ssa_block
-            ssa_block=[ins for block in function if block.offset ==path[0] for ins in block.insns]                                                                    
+            ssa_block = block_insns.get(path[0], [])
+            ssa_block_at = block_insns_at.get(path[0], {})                                                                    
             if current_ssa_block is not None:
                 ssa_visited_blocks.append(current_ssa_block)
             if current_block is not None:
@@ -270,7 +314,8 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
             current_block=path[0]
             path = path[1:]                            
         elif state.pc in path and program[state.pc].bb.start==state.pc:            
-            ssa_block=[ins for block in function if block.offset ==state.pc for ins in block.insns]                                                                    
+            ssa_block = block_insns.get(state.pc, [])
+            ssa_block_at = block_insns_at.get(state.pc, {})                                                                    
             if current_ssa_block is not None:
                 ssa_visited_blocks.append(current_ssa_block)
             if current_block is not None:
@@ -290,9 +335,9 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
         opcode = ins.op 
         op = ins.name        
         ##get_ssa_ins               
-        ssa_ins =[ins for ins in ssa_block if ins.offset ==state.pc]     
+        ssa_ins = ssa_block_at.get(state.pc, [])     
         if len(ssa_ins) ==0 and op not in (['POP','JUMP','JUMPDEST']) and op[:3]!='DUP' and  op[:4]!='SWAP' and not (0x60 <= opcode <= 0x7f):            
-            if len([ins for block in function for ins in block.insns if ins.offset ==state.pc])==0:                
+            if state.pc not in ssa_offsets:                
                 state.success = False                        
                 return TainitAnalysisResult(state,defect_type,target_sink,tainted,sources,sload_bases, sstore_bases,sstore_slots,slot_live_access,slot_access_trace, storage_slot_type)                   
         # Valid operations        
@@ -823,10 +868,9 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
                 for i in range(size):
                     if dstart + i < len(tnt.calldata):                                                
                         tnt.memory[mstart+i]=tnt.calldata[dstart + i]
-                        tnt.tMemory.append([mstart+i, [{op:None}]])  
                     else:
                         tnt.memory[mstart+i]=0
-                        tnt.tMemory.append([mstart+i, [{op:None}]])  
+                tnt.taint_memory(mstart, size, tnt.source_bits([{op:None}]))
             elif op == 'CODESIZE':                
                 tnt.registers[ssa_ins[0]._return_value]=1  
             elif op == 'CODECOPY':
@@ -879,8 +923,7 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
                 else:
                     arg0 = tnt.registers[ssa_ins[0].arguments[0]]
                                     
-                for i in range(arg2):                    
-                    tnt.tMemory.append([arg0+i, [{op:None}]])  
+                tnt.taint_memory(arg0, arg2, tnt.source_bits([{op:None}]))
         
         elif opcode < 0x50:
             if op == 'BLOCKHASH':                
@@ -925,7 +968,7 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
                 else:
                     arg1= tnt.registers[ssa_ins[0].arguments[1]]
                 if arg1<0:
-                    tnt.signed_memory.append(arg0)
+                    tnt.signed_memory.add(arg0)
                     arg1=abs(arg1)                            
                 tmp=src.util.utils.encode_int32(arg1)                                
                 t=0
@@ -935,8 +978,7 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
                         
                 if ssa_ins[0].arguments[1]._writer is not None:
                     if tnt.isTainted_register(ssa_ins[0].arguments[1]):                        
-                        for i in range(arg0,arg0+32):
-                            tnt.tMemory.append([i,tnt.get_reg_taint_source(ssa_ins[0].arguments[1])])                   
+                        tnt.taint_memory(arg0, 32, tnt.get_reg_taint_bits(ssa_ins[0].arguments[1]))
             elif op == 'MSTORE8':                
                 if ssa_ins[0].arguments[0]._writer is None:
                     arg0=ssa_ins[0].arguments[0].concrete_value
@@ -951,7 +993,7 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
                 
                 if ssa_ins[0].arguments[1]._writer is not None:
                     if tnt.isTainted_register(ssa_ins[0].arguments[1]):                        
-                        tnt.tMemory.append([arg0,tnt.get_reg_taint_source(ssa_ins[0].arguments[1])])                                                     
+                        tnt.taint_memory(arg0, 1, tnt.get_reg_taint_bits(ssa_ins[0].arguments[1]))                                                     
             elif op == 'SLOAD': 
                 if ssa_ins[0].arguments[0]._writer is None:                    
                     arg0 = ssa_ins[0].arguments[0].concrete_value
@@ -987,7 +1029,7 @@ def run_static(program, ssa, path, sinks, code=None, state=None, ctx=None, inclu
                                 
                 if ssa_ins[0].arguments[1]._writer is not None:
                     if tnt.isTainted_register(ssa_ins[0].arguments[1]):
-                        tnt.tStorage.append([arg0,tnt.get_reg_taint_source(ssa_ins[0].arguments[1])])                                                        
+                        tnt.taint_storage(arg0, tnt.get_reg_taint_bits(ssa_ins[0].arguments[1]))                                                        
 
                 slot_live_access[arg0]=0
                 slot_access_trace[arg0].append(ins)                                            
@@ -8,7 +8,9 @@ from requests import post
 from src.cfg.cfg import CFG
 from src.cfg.disassembly import generate_BBs
 from src.cfg.opcodes import external_data
+from src.constraints import SolverSession
 from src.evm.evm import run, run_symbolic
+from src.evm.snapshot import SnapshotCache
 from src.evm.exceptions import IntractablePath, ExternalData, TimeoutException
 from src.explorer.forward import ForwardExplorer
 from src.slicing import interesting_slices, slice_to_program
@@ -32,6 +34,20 @@ class Project(object):
         self._prg = None
         self._cfg = cfg
         self._writes = None
+        self._snapshots = None
+        self._solver = None
+
+    @property
+    def snapshots(self):
+        if self._snapshots is None:
+            self._snapshots = SnapshotCache()
+        return self._snapshots
+
+    @property
+    def solver(self):
+        if self._solver is None:
+            self._solver = SolverSession()
+        return self._solver
 
     @property
     def writes(self):
@@ -67,9 +83,12 @@ class Project(object):
     def run(self, program):
         return run(program, code=self.code)
 
-    def run_symbolic(self, path, inclusive=False, mode=None, code_path=None, ac_jumpi=None):        
+    def run_symbolic(self, path, inclusive=False, mode=None, code_path=None, ac_jumpi=None, share_prefix=False):
         #return run_symbolic(self.prg, path, self.code, inclusive=inclusive)
-        return run_symbolic(self.prg, path, self.code, inclusive=inclusive, code_path=code_path, mode=mode, ac_jumpi=ac_jumpi)
+        # results resumed from a shared prefix keep the xid of an earlier run, don't combine them
+        snapshots = self.snapshots if share_prefix else None
+        return run_symbolic(self.prg, path, self.code, inclusive=inclusive, code_path=code_path, mode=mode, ac_jumpi=ac_jumpi,
+                            snapshots=snapshots)
 
     
     def get_constraints(self, instructions, args=None, inclusive=False, find_sstore=False):